@@ -1,10 +1,29 @@
 import json
 import sys
 import os
+import heapq
+import argparse
+import itertools
+import functools
+import tempfile
 from datetime import datetime
+import numpy as np
+import pandas as pd
+from columnar import HAS_ARROW, is_parquet, iter_records, load_signal_file, write_signals_parquet
+
+if HAS_ARROW:
+    import pyarrow as pa
+    import pyarrow.compute as pc
 
 CANONICAL_SERVER_REPORT = "weekly_security_summary"
 OVERRIDES_FILE = "overrides.json"
+DEFAULT_INTENT = "General Administration"
+HIGH_RISK_THRESHOLD = 0.5
+FRAME_COLUMNS = ["id", "intent", "risk_score", "status", "hostname", "recommendation", "timestamp"]
+
+# Streaming mode: signals per sorted temp run, and runs merged at once
+RUN_SIZE = 50000
+MAX_FAN_IN = 256
 
 def load_overrides():
     """Phase 2: Human-in-the-loop controls. Loads analyst overrides."""
@@ -16,27 +35,71 @@ def load_overrides():
             return {}
     return {}
 
-def aggregate_fleet_summary(server_summaries, all_signals, overrides):
+def signals_frame(signals):
     """
-    Aggregates multiple per-server weekly security reports into a single fleet-level weekly summary.
-    Follows Sentra v0.3 deterministic logic.
+    The signal fields the fleet aggregation reads, as columns, built in one
+    pass over the signal dicts. Row i is signals[i].
     """
+    if not signals:
+        return pd.DataFrame({column: pd.Series(dtype=object) for column in FRAME_COLUMNS})
+    frame = pd.DataFrame.from_records(signals, columns=FRAME_COLUMNS)
+    # Missing keys get the defaults the report has always used; an explicit
+    # intent of None stays None
+    has_intent = np.fromiter(('intent' in s for s in signals), dtype=bool, count=len(signals))
+    frame["intent"] = frame["intent"].astype(object).mask(frame["intent"].isna().to_numpy() & ~has_intent, DEFAULT_INTENT)
+    frame["risk_score"] = pd.to_numeric(frame["risk_score"], errors="coerce").fillna(0)
+    frame["timestamp"] = frame["timestamp"].fillna('')
+    return frame
+
+def apply_overrides(signals, frame, overrides):
+    """Phase 2: analyst overrides, applied to the signals that have one (and to their frame rows)."""
+    if not overrides or frame.empty:
+        return
+    for i in np.flatnonzero(frame["id"].isin(list(overrides)).to_numpy()):
+        s = apply_override(signals[i], overrides)
+        frame.at[i, "status"] = s['status']
+        frame.at[i, "risk_score"] = s['risk_score']
+
+def apply_override(s, overrides):
+    sig_id = s.get('id')
+    if sig_id in overrides:
+        override = overrides[sig_id]
+        s['status'] = override.get('status', s['status'])
+        s['analyst_note'] = override.get('note', '')
+        # If resolved/reviewed, we might choose to lower the risk score weight
+        if s['status'] in ['RESOLVED', 'REVIEWED']:
+            s['risk_score'] = 0.0
+    return s
+
+def count_in_order(column):
+    """{value: count} in order of first appearance, like the dict-counting loop it replaces."""
+    codes, uniques = pd.factorize(column, use_na_sentinel=False)
+    counts = np.bincount(codes, minlength=len(uniques))
+    return {(None if pd.isna(value) else value): int(count) for value, count in zip(uniques, counts)}
+
+def timeline_order(timestamps):
+    """Stable sort order of the ISO timestamp strings (Arrow's sort, with a NumPy fallback)."""
+    if HAS_ARROW:
+        return pc.sort_indices(pa.array(timestamps.to_numpy(dtype=object), type=pa.string())).to_numpy()
+    return np.argsort(timestamps.to_numpy(dtype=object), kind="stable")
+
+def signal_statistics(frame):
+    """Every per-signal fleet statistic, computed column-wise from signals_frame()."""
+    risk = frame["risk_score"].to_numpy()
+    high_risk = risk >= HIGH_RISK_THRESHOLD
+    recommendations = frame["recommendation"][high_risk]
+    recommendations = recommendations[(recommendations.notna() & (recommendations != "")).to_numpy()]
+    return {
+        "intent_summary": count_in_order(frame["intent"]),
+        "high_risk_count": int(high_risk.sum()),
+        "open_count": int((frame["status"] == 'open').sum()),
+        "servers_affected": frame["hostname"].nunique(dropna=False),
+        "priority_recommendations": recommendations.drop_duplicates().head(3).tolist(),
+        "timeline_order": timeline_order(frame["timestamp"]),
+    }
 
-    if not server_summaries:
-        return None
-
-    # Apply Overrides to signals first
-    for s in all_signals:
-        sig_id = s.get('id')
-        if sig_id in overrides:
-            override = overrides[sig_id]
-            s['status'] = override.get('status', s['status'])
-            s['analyst_note'] = override.get('note', '')
-            # If resolved/reviewed, we might choose to lower the risk score weight
-            if s['status'] in ['RESOLVED', 'REVIEWED']:
-                s['risk_score'] = 0.0
-
-    total_stats = {
+def new_fleet_totals():
+    return {
         "access_patterns": 0,
         "multi_ip_instances": 0,
         "privileged_sessions": 0,
@@ -47,24 +110,46 @@ def aggregate_fleet_summary(server_summaries, all_signals, overrides):
         "avg_risk_scores": []
     }
 
+def add_server_summary(total_stats, summary):
+    """Folds one per-server weekly summary into the fleet totals."""
+    highlights = summary.get("highlights", {})
+    total_stats["access_patterns"] += highlights.get("access_patterns", 0)
+    total_stats["multi_ip_instances"] += highlights.get("multi_ip_instances", 0)
+    total_stats["privileged_sessions"] += highlights.get("privileged_sessions", 0)
+    total_stats["high_risk_changes"] += highlights.get("high_risk_changes", 0)
+    total_stats["iam_changes"] += highlights.get("iam_changes", 0)
+    total_stats["ssh_brute_force"] += highlights.get("ssh_brute_force_attempts", 0)
+    total_stats["failed_auth"] += highlights.get("failed_auth_attempts", 0)
+    if "avg_risk_score" in summary:
+        total_stats["avg_risk_scores"].append(summary["avg_risk_score"])
+
+def aggregate_fleet_summary(server_summaries, all_signals, overrides, frame=None):
+    """
+    Aggregates multiple per-server weekly security reports into a single fleet-level weekly summary.
+    Follows Sentra v0.3 deterministic logic.
+    frame is signals_frame(all_signals), built here if not given.
+    """
+
+    if not server_summaries:
+        return None
+
+    # Apply Overrides to signals first
+    if frame is None:
+        frame = signals_frame(all_signals)
+    apply_overrides(all_signals, frame, overrides)
+
+    total_stats = new_fleet_totals()
     for summary in server_summaries:
-        highlights = summary.get("highlights", {})
-        total_stats["access_patterns"] += highlights.get("access_patterns", 0)
-        total_stats["multi_ip_instances"] += highlights.get("multi_ip_instances", 0)
-        total_stats["privileged_sessions"] += highlights.get("privileged_sessions", 0)
-        total_stats["high_risk_changes"] += highlights.get("high_risk_changes", 0)
-        total_stats["iam_changes"] += highlights.get("iam_changes", 0)
-        total_stats["ssh_brute_force"] += highlights.get("ssh_brute_force_attempts", 0)
-        total_stats["failed_auth"] += highlights.get("failed_auth_attempts", 0)
-        if "avg_risk_score" in summary:
-            total_stats["avg_risk_scores"].append(summary["avg_risk_score"])
+        add_server_summary(total_stats, summary)
 
     # Phase 3: Aggregate Intents
-    intent_counts = {}
-    for s in all_signals:
-        intent = s.get('intent', 'General Administration')
-        intent_counts[intent] = intent_counts.get(intent, 0) + 1
+    intent_counts = count_in_order(frame["intent"])
 
+    action_recommended = any(s["overall_risk"] == "Action Recommended" for s in server_summaries)
+    return build_fleet_summary(total_stats, intent_counts, len(server_summaries), action_recommended)
+
+def build_fleet_summary(total_stats, intent_counts, server_count, action_recommended):
+    """Fleet risk level and narrative from the folded totals (Sentra v0.3 deterministic logic)."""
     # Calculate fleet-wide average risk
     fleet_avg_score = 0
     if total_stats["avg_risk_scores"]:
@@ -75,7 +160,7 @@ def aggregate_fleet_summary(server_summaries, all_signals, overrides):
     # 2. Low (Reviewed) if high-risk changes or IAM changes exist
     # 3. Low otherwise
 
-    if any(s["overall_risk"] == "Action Recommended" for s in server_summaries):
+    if action_recommended:
         fleet_risk = "Action Recommended"
     elif total_stats["high_risk_changes"] > 0 or total_stats["iam_changes"] > 0:
         fleet_risk = "Low (Reviewed)"
@@ -127,7 +212,7 @@ def aggregate_fleet_summary(server_summaries, all_signals, overrides):
         risk_context = "No security-sensitive changes were detected."
 
     narrative = (
-        f"This week, security activity across your fleet of {len(server_summaries)} servers remained stable. "
+        f"This week, security activity across your fleet of {server_count} servers remained stable. "
         f"{access_desc} {multi_ip_desc} {iam_desc} {priv_desc} {failure_desc} {risk_context}"
     )
 
@@ -136,20 +221,14 @@ def aggregate_fleet_summary(server_summaries, all_signals, overrides):
         "timestamp": datetime.now().isoformat(),
         "overall_risk": fleet_risk,
         "fleet_risk_score": fleet_avg_score,
-        "server_count": len(server_summaries),
+        "server_count": server_count,
         "fleet_highlights": total_stats,
         "intent_summary": intent_counts,
         "narrative": narrative
     }
 
-def generate_markdown_report(fleet_summary, signals):
-    """
-    Generates a human-readable analyst report in Markdown format.
-    Focuses on narratives, timelines, and confidence scores per PRD Phase 1.
-    """
-    # Sort signals by timestamp
-    sorted_signals = sorted(signals, key=lambda x: x.get('timestamp', ''))
-    
+def report_header(fleet_summary):
+    """Report lines up to and including the timeline introduction."""
     risk_color = {
         "Low": "🟢",
         "Low (Reviewed)": "🟡",
@@ -188,102 +267,332 @@ def generate_markdown_report(fleet_summary, signals):
         ""
     ])
 
-    for s in sorted_signals:
-        ts = s.get('timestamp', 'N/A')
-        # Format timestamp for readability if it's ISO
-        try:
-            ts = datetime.fromisoformat(ts).strftime('%Y-%m-%d %H:%M')
-        except:
-            pass
-
-        sig_type = s.get('signal', 'unknown').replace('_', ' ').title()
-        host = s.get('hostname', 'unknown')
-        user = s.get('user', 'unknown')
-        conf = s.get('confidence', 'medium').upper()
-        score = s.get('risk_score', 0.0)
-        status = s.get('status', 'open').upper()
-        sig_id = s.get('id', 'n/a')
-        
-        # Confidence visual aid
-        conf_icon = "🛡️" if conf == "HIGH" else "🔍"
-        
-        md.append(f"### {ts} | {sig_type} on `{host}`")
-        md.append(f"- **ID**: `{sig_id}` | **Intent**: `{s.get('intent', 'N/A')}`")
-        md.append(f"- **User**: `{user}`")
-        md.append(f"- **Risk Score**: `{score}` | **Confidence**: {conf_icon} `{conf}` | **Status**: `{status}`")
-        
-        mitre = s.get('mitre_tags', [])
-        compliance = s.get('compliance_tags', [])
-        if mitre:
-            md.append(f"- **MITRE ATT&CK**: `{', '.join(mitre)}`")
-        if compliance:
-            md.append(f"- **Compliance**: `{', '.join(compliance)}`")
-            
-        md.append(f"- **Narrative**: {s.get('narrative', 'No narrative available.')}")
+    return md
+
+def timeline_entry(s):
+    """Report lines for one signal of the incident timeline."""
+    md = []
+    ts = s.get('timestamp', 'N/A')
+    # Format timestamp for readability if it's ISO
+    try:
+        ts = datetime.fromisoformat(ts).strftime('%Y-%m-%d %H:%M')
+    except:
+        pass
+
+    sig_type = s.get('signal', 'unknown').replace('_', ' ').title()
+    host = s.get('hostname', 'unknown')
+    user = s.get('user', 'unknown')
+    conf = s.get('confidence', 'medium').upper()
+    score = s.get('risk_score', 0.0)
+    status = s.get('status', 'open').upper()
+    sig_id = s.get('id', 'n/a')
+    
+    # Confidence visual aid
+    conf_icon = "🛡️" if conf == "HIGH" else "🔍"
+    
+    md.append(f"### {ts} | {sig_type} on `{host}`")
+    md.append(f"- **ID**: `{sig_id}` | **Intent**: `{s.get('intent', 'N/A')}`")
+    md.append(f"- **User**: `{user}`")
+    md.append(f"- **Risk Score**: `{score}` | **Confidence**: {conf_icon} `{conf}` | **Status**: `{status}`")
+    
+    mitre = s.get('mitre_tags', [])
+    compliance = s.get('compliance_tags', [])
+    if mitre:
+        md.append(f"- **MITRE ATT&CK**: `{', '.join(mitre)}`")
+    if compliance:
+        md.append(f"- **Compliance**: `{', '.join(compliance)}`")
         
-        # Phase 4: AI Recommendations
-        if s.get('recommendation'):
-            md.append(f"- **🤖 AI Recommendation**: *{s['recommendation']}*")
-            
-        # Phase 4: Outcome & Justification
-        if s.get('status') in ['RESOLVED', 'REVIEWED']:
-            note = s.get('analyst_note', 'No analyst notes provided.')
-            md.append(f"- **Outcome**: ✅ `{s['status']}` | **Justification**: {note}")
-
-        if s.get('signal') == 'privilege_escalation' and 'commands' in s:
-            md.append("- **Audit Details**:")
-            for cmd in s['commands']:
-                risk = " [HIGH RISK]" if cmd.get('risk') == 'high' else ""
-                md.append(f"  - `{cmd.get('command')}`{risk}")
+    md.append(f"- **Narrative**: {s.get('narrative', 'No narrative available.')}")
+    
+    # Phase 4: AI Recommendations
+    if s.get('recommendation'):
+        md.append(f"- **🤖 AI Recommendation**: *{s['recommendation']}*")
         
-        md.append("")
+    # Phase 4: Outcome & Justification
+    if s.get('status') in ['RESOLVED', 'REVIEWED']:
+        note = s.get('analyst_note', 'No analyst notes provided.')
+        md.append(f"- **Outcome**: ✅ `{s['status']}` | **Justification**: {note}")
+
+    if s.get('signal') == 'privilege_escalation' and 'commands' in s:
+        md.append("- **Audit Details**:")
+        for cmd in s['commands']:
+            risk = " [HIGH RISK]" if cmd.get('risk') == 'high' else ""
+            md.append(f"  - `{cmd.get('command')}`{risk}")
+    
+    md.append("")
+    return md
 
+def handover_notes(stats):
+    """Closing report section; stats as returned by signal_statistics()."""
+    md = []
     # Section 4: AI Handover Notes (Phase 2)
     md.append("## 4. AI Handover Notes")
     md.append("Summarizing critical state for shift continuity:")
     
     # Phase 4: Actionable Recommendations Summary
-    critical_recs = [s.get('recommendation') for s in signals if s.get('risk_score', 0) >= 0.5 and s.get('recommendation')]
+    critical_recs = stats["priority_recommendations"]
     if critical_recs:
         md.append("### 🤖 Priority Playbooks")
-        for rec in list(set(critical_recs))[:3]: # Show top 3 unique recommendations
+        for rec in critical_recs: # Show top 3 unique recommendations
             md.append(f"- **Suggested Action**: {rec}")
         md.append("")
 
-    high_risk_signals = [s for s in signals if s.get('risk_score', 0) >= 0.5]
-    if high_risk_signals:
-        md.append(f"- **High Risk Focus**: There are {len(high_risk_signals)} signals with a risk score ≥ 0.5. These primarily involve sensitive administrative changes.")
+    if stats["high_risk_count"]:
+        md.append(f"- **High Risk Focus**: There are {stats['high_risk_count']} signals with a risk score ≥ 0.5. These primarily involve sensitive administrative changes.")
     else:
         md.append("- **High Risk Focus**: No high-risk signals (≥ 0.5) were detected this period.")
     
-    open_signals = [s for s in signals if s.get('status') == 'open']
-    md.append(f"- **Incident Status**: {len(open_signals)} signals remain in `OPEN` status and require validation against your team's maintenance schedule.")
+    md.append(f"- **Incident Status**: {stats['open_count']} signals remain in `OPEN` status and require validation against your team's maintenance schedule.")
     
-    servers_affected = len(set(s.get('hostname') for s in signals))
-    md.append(f"- **Scope**: Activity is distributed across {servers_affected} server(s).")
+    md.append(f"- **Scope**: Activity is distributed across {stats['servers_affected']} server(s).")
     md.append("")
 
     md.append("---")
     md.append("Generated by Sentra AI-Native Control Plane v0.1")
     
+    return md
+
+def generate_markdown_report(fleet_summary, signals, frame=None):
+    """
+    Generates a human-readable analyst report in Markdown format.
+    Focuses on narratives, timelines, and confidence scores per PRD Phase 1.
+    """
+    stats = signal_statistics(signals_frame(signals) if frame is None else frame)
+
+    md = report_header(fleet_summary)
+    # Sort signals by timestamp
+    for i in stats["timeline_order"]:
+        md.extend(timeline_entry(signals[i]))
+    md.extend(handover_notes(stats))
     return "\n".join(md)
 
+# ---- Streaming mode: memory stays flat in the number of signals ----
+
+def timeline_key(s):
+    """The timestamp the timeline sorts on, as signals_frame() fills it in."""
+    ts = s.get('timestamp')
+    return '' if ts is None else ts
+
+def _risk_value(value):
+    """risk_score as signals_frame() reads it: 0 when missing or not a number."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if value != value else value
+
+class FleetAccumulator:
+    """
+    Running fleet totals: per-server summaries and per-signal statistics are
+    folded in one record at a time instead of being held in memory.
+    statistics() matches signal_statistics() and fleet_summary() matches
+    aggregate_fleet_summary() for the same records.
+    """
+    def __init__(self):
+        self.total_stats = new_fleet_totals()
+        self.server_count = 0
+        self.action_recommended = False
+        self.intent_counts = {}
+        self.high_risk_count = 0
+        self.open_count = 0
+        self.hostnames = set()
+        self.priority_recommendations = []
+
+    def copy(self):
+        other = FleetAccumulator()
+        other.total_stats = dict(self.total_stats, avg_risk_scores=list(self.total_stats["avg_risk_scores"]))
+        other.server_count = self.server_count
+        other.action_recommended = self.action_recommended
+        other.intent_counts = dict(self.intent_counts)
+        other.high_risk_count = self.high_risk_count
+        other.open_count = self.open_count
+        other.hostnames = set(self.hostnames)
+        other.priority_recommendations = list(self.priority_recommendations)
+        return other
+
+    def add_summary(self, summary):
+        add_server_summary(self.total_stats, summary)
+        self.server_count += 1
+        if summary.get("overall_risk") == "Action Recommended":
+            self.action_recommended = True
+
+    def add_signal(self, s):
+        intent = s['intent'] if 'intent' in s else DEFAULT_INTENT
+        self.intent_counts[intent] = self.intent_counts.get(intent, 0) + 1
+        if _risk_value(s.get('risk_score')) >= HIGH_RISK_THRESHOLD:
+            self.high_risk_count += 1
+            rec = s.get('recommendation')
+            if rec is not None and rec != "" and len(self.priority_recommendations) < 3 \
+                    and rec not in self.priority_recommendations:
+                self.priority_recommendations.append(rec)
+        if s.get('status') == 'open':
+            self.open_count += 1
+        self.hostnames.add(s.get('hostname'))
+
+    def statistics(self):
+        return {
+            "intent_summary": self.intent_counts,
+            "high_risk_count": self.high_risk_count,
+            "open_count": self.open_count,
+            "servers_affected": len(self.hostnames),
+            "priority_recommendations": self.priority_recommendations,
+        }
+
+    def fleet_summary(self):
+        if not self.server_count:
+            return None
+        return build_fleet_summary(self.total_stats, self.intent_counts, self.server_count, self.action_recommended)
+
+def scan_fleet_files(paths, overrides):
+    """
+    Streaming pass 1: folds every file into a FleetAccumulator, record by
+    record. A file that fails to load is skipped as a whole, as in batch mode.
+    Returns (fleet, files) where files lists (path, first_seq, is_sorted):
+    the position of the file's first signal in the fleet order and whether
+    its signals are already in timestamp order.
+    """
+    fleet = FleetAccumulator()
+    files = []
+    seq = 0
+    for path in paths:
+        staged = fleet.copy()
+        count, is_sorted, last_ts = 0, True, ''
+        try:
+            for data in iter_records(path):
+                if "report_type" in data:
+                    if data.get("report_type") == CANONICAL_SERVER_REPORT:
+                        staged.add_summary(data)
+                elif "signal" in data:
+                    s = apply_override(data, overrides)
+                    staged.add_signal(s)
+                    ts = timeline_key(s)
+                    if ts < last_ts:
+                        is_sorted = False
+                    last_ts = ts
+                    count += 1
+        except Exception as e:
+            print(f"Error loading {path}: {e}", file=sys.stderr)
+            continue
+        fleet = staged
+        files.append((path, seq, is_sorted))
+        seq += count
+    return fleet, files
+
+def iter_timeline(path, first_seq, overrides):
+    """A file's signals, overrides applied, as (timestamp, seq, signal) in file order."""
+    seq = first_seq
+    for data in iter_records(path):
+        if "report_type" not in data and "signal" in data:
+            s = apply_override(data, overrides)
+            yield (timeline_key(s), seq, s)
+            seq += 1
+
+def _write_run(lines, tmp_dir):
+    fd, path = tempfile.mkstemp(suffix=".jsonl", dir=tmp_dir)
+    with os.fdopen(fd, "w") as f:
+        f.writelines(lines)
+    return path
+
+def _run_line(ts, seq, signal_json):
+    # The key and the signal are kept apart so a run can be sorted on the
+    # key while its signals stay serialized
+    return f"{json.dumps([ts, seq])}\t{signal_json}\n"
+
+def _read_run(path):
+    with open(path, "r") as f:
+        for line in f:
+            key, signal_json = line.split("\t", 1)
+            ts, seq = json.loads(key)
+            yield (ts, seq, json.loads(signal_json))
+    os.remove(path)
+
+def spill_sorted_runs(entries, tmp_dir, run_size=RUN_SIZE):
+    """Cuts a stream of timeline entries into sorted temp files of at most run_size entries."""
+    runs = []
+    encoded = ((ts, seq, json.dumps(s)) for ts, seq, s in entries)
+    for chunk in iter(lambda: list(itertools.islice(encoded, run_size)), []):
+        chunk.sort(key=lambda e: (e[0], e[1]))
+        runs.append(_write_run(itertools.starmap(_run_line, chunk), tmp_dir))
+    return runs
+
+def merge_timeline(sources, tmp_dir, max_fan_in=MAX_FAN_IN):
+    """
+    External k-way merge of sorted timeline sources (callables returning
+    iterators of (timestamp, seq, signal)). At most max_fan_in sources are
+    open at once; beyond that they are merged into intermediate runs first.
+    seq is unique, so ties on the timestamp keep the fleet order, like the
+    stable sort of batch mode.
+    """
+    while len(sources) > max_fan_in:
+        merged = []
+        for start in range(0, len(sources), max_fan_in):
+            group = sources[start:start + max_fan_in]
+            merged_entries = heapq.merge(*(source() for source in group))
+            run = _write_run((_run_line(ts, seq, json.dumps(s)) for ts, seq, s in merged_entries), tmp_dir)
+            merged.append(functools.partial(_read_run, run))
+        sources = merged
+    return heapq.merge(*(source() for source in sources))
+
+def write_streamed_report(report_path, fleet_summary, fleet, files, overrides,
+                          run_size=RUN_SIZE, max_fan_in=MAX_FAN_IN):
+    """
+    Streaming pass 2: writes the same report as generate_markdown_report(),
+    section by section. Files already in timestamp order are merged as they
+    are read; the others are first spilled to sorted temp runs.
+    """
+    with tempfile.TemporaryDirectory(prefix="sentra_timeline_") as tmp_dir:
+        sources = []
+        for path, first_seq, is_sorted in files:
+            if is_sorted:
+                sources.append(functools.partial(iter_timeline, path, first_seq, overrides))
+            else:
+                runs = spill_sorted_runs(iter_timeline(path, first_seq, overrides), tmp_dir, run_size)
+                sources.extend(functools.partial(_read_run, run) for run in runs)
+
+        with open(report_path, "w") as f:
+            first = True
+            def write(lines):
+                nonlocal first
+                for line in lines:
+                    f.write(line if first else "\n" + line)
+                    first = False
+
+            write(report_header(fleet_summary))
+            for _, _, s in merge_timeline(sources, tmp_dir, max_fan_in):
+                write(timeline_entry(s))
+            write(handover_notes(fleet.statistics()))
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sentra fleet weekly aggregation")
+    parser.add_argument("files", nargs="+", help="Per-server parser outputs (JSON lines or .parquet)")
+    parser.add_argument("--export", help="Also write the fleet signals (overrides applied) and summaries to this .parquet or JSON lines file")
+    parser.add_argument("--stream", action="store_true", help="Fold the inputs record by record and merge the timeline on disk, keeping memory flat")
+    args = parser.parse_args()
+    if args.stream and args.export:
+        parser.error("--export is not supported with --stream")
+
+    if args.stream:
+        # Phase 2: Load analyst overrides
+        overrides = load_overrides()
+        fleet, files = scan_fleet_files(args.files, overrides)
+        fleet_summary = fleet.fleet_summary()
+        if fleet_summary is None:
+            print("No valid weekly_security_summary inputs found.", file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(fleet_summary, indent=2))
+        write_streamed_report("FLEET_REPORT.md", fleet_summary, fleet, files, overrides)
+        print("\nAnalyst report generated: FLEET_REPORT.md", file=sys.stderr)
+        sys.exit(0)
+
     summaries = []
     all_signals = []
 
     # Load canonical per-server weekly summaries and individual signals
-    for file_path in sys.argv[1:]:
+    for file_path in args.files:
         try:
-            with open(file_path, "r") as f:
-                for line in f:
-                    if not line.strip():
-                        continue
-                    data = json.loads(line)
-                    if data.get("report_type") == CANONICAL_SERVER_REPORT:
-                        summaries.append(data)
-                    elif "signal" in data:
-                        all_signals.append(data)
+            signals, reports = load_signal_file(file_path)
+            summaries.extend(r for r in reports if r.get("report_type") == CANONICAL_SERVER_REPORT)
+            all_signals.extend(signals)
         except Exception as e:
             print(f"Error loading {file_path}: {e}", file=sys.stderr)
 
@@ -294,13 +603,25 @@ if __name__ == "__main__":
     # Phase 2: Load analyst overrides
     overrides = load_overrides()
 
-    fleet_summary = aggregate_fleet_summary(summaries, all_signals, overrides)
+    frame = signals_frame(all_signals)
+    fleet_summary = aggregate_fleet_summary(summaries, all_signals, overrides, frame)
     
     # Output JSON for machine consumption
     print(json.dumps(fleet_summary, indent=2))
 
     # Generate Analyst Markdown Report
-    report_md = generate_markdown_report(fleet_summary, all_signals)
+    report_md = generate_markdown_report(fleet_summary, all_signals, frame)
     with open("FLEET_REPORT.md", "w") as f:
         f.write(report_md)
     print("\nAnalyst report generated: FLEET_REPORT.md", file=sys.stderr)
+
+    if args.export and is_parquet(args.export):
+        write_signals_parquet(args.export, all_signals, summaries + [fleet_summary])
+        print(f"Fleet signals exported: {args.export}", file=sys.stderr)
+    elif args.export:
+        with open(args.export, "w") as f:
+            for s in all_signals:
+                f.write(json.dumps(s) + "\n")
+            for summary in summaries + [fleet_summary]:
+                f.write(json.dumps(summary) + "\n")
+        print(f"Fleet signals exported: {args.export}", file=sys.stderr)
@@ -1,9 +1,16 @@
 import os
+import re
+import ipaddress
 import json
 import time
+import asyncio
+import hashlib
+import threading
 from datetime import datetime
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load local environment variables
@@ -22,11 +29,24 @@ except ImportError:
 CHROMA_PATH = "sentra_vector_db"
 DEFAULT_MODEL = "gpt-4o"
 
+# Batched enrichment: signals packed per prompt, prompts in flight, seconds per prompt
+AI_BATCH_SIZE = 8
+AI_MAX_CONCURRENCY = 4
+AI_REQUEST_TIMEOUT = 20.0
+
+# Narrative cache: in-memory LRU entries, on-disk entries and their lifetime
+NARRATIVE_CACHE_DIR = "sentra_narrative_cache"
+NARRATIVE_CACHE_MEMORY_SIZE = 1024
+NARRATIVE_CACHE_DISK_SIZE = 50000
+NARRATIVE_CACHE_TTL = 7 * 24 * 3600
+RISK_BUCKET = 0.1
+
 class UsageTracker:
     """Tracks token usage and latency for mSOC billing groundwork."""
     def __init__(self, drift_log_path: str = "model_drift.log"):
         self.logs = []
         self.drift_log_path = drift_log_path
+        self.cache_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "tokens_saved": 0}
 
     @property
     def total_tokens(self) -> int:
@@ -37,6 +57,20 @@ class UsageTracker:
         # Simple estimate: $0.01 per 1k tokens
         return (self.total_tokens / 1000.0) * 0.01
 
+    @property
+    def cache_hit_rate(self) -> float:
+        hits = self.cache_stats["memory_hits"] + self.cache_stats["disk_hits"]
+        lookups = hits + self.cache_stats["misses"]
+        return round(hits / lookups, 4) if lookups else 0.0
+
+    def log_cache_lookup(self, tier: Optional[str], tokens_saved: int = 0):
+        """Counts a narrative cache lookup; tier is "memory", "disk" or None for a miss."""
+        if tier:
+            self.cache_stats[f"{tier}_hits"] += 1
+            self.cache_stats["tokens_saved"] += tokens_saved
+        else:
+            self.cache_stats["misses"] += 1
+
     def log_usage(self, tenant_id: str, provider: str, model: str, usage: Dict[str, int], latency: float, confidence: float = 0.0):
         entry = {
             "timestamp": datetime.utcnow().isoformat(),
@@ -66,6 +100,10 @@ class BaseLLMProvider(ABC):
     def generate_narrative(self, tenant_id: str, signal_type: str, context: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], float, Dict[str, Any]]:
         pass
 
+    def generate_narratives_batch(self, tenant_id: str, items: List[Tuple[str, Dict[str, Any]]], timeout: Optional[float] = None) -> List[Tuple[Optional[str], Optional[str], float, Dict[str, Any]]]:
+        """Enriches several (signal_type, context) items. Providers that can pack a prompt override this."""
+        return [self.generate_narrative(tenant_id, signal_type, context) for signal_type, context in items]
+
 class OpenAIProvider(BaseLLMProvider):
     def __init__(self, api_key: str, tracker: UsageTracker):
         self.client = OpenAI(api_key=api_key) if api_key else None
@@ -119,6 +157,270 @@ class OpenAIProvider(BaseLLMProvider):
             print(f"OpenAI Error: {e}")
             return None, None, 0.0, {}
 
+    def generate_narratives_batch(self, tenant_id: str, items: List[Tuple[str, Dict[str, Any]]], timeout: Optional[float] = None) -> List[Tuple[Optional[str], Optional[str], float, Dict[str, Any]]]:
+        """Packs several signals into a single prompt and maps the answers back by index."""
+        empty = [(None, None, 0.0, {}) for _ in items]
+        if not self.client or not items:
+            return empty
+
+        events = [{"index": i, "type": signal_type, "data": context} for i, (signal_type, context) in enumerate(items)]
+        prompt = f"""
+        You are a security analyst for Sentra, an AI-native security control plane.
+        Analyze each of the following security events independently and provide, per event:
+        1. A calm, non-alarmist narrative for a non-technical customer.
+        2. A specific, actionable recommendation for a technical team.
+        3. A confidence score (0.0 to 1.0) on how certain you are of this analysis.
+
+        Events:
+        {json.dumps(events, default=str)}
+
+        Response Format (JSON), one entry per event index:
+        {{
+            "results": [
+                {{"index": 0, "narrative": "...", "recommendation": "...", "confidence": 0.85}}
+            ]
+        }}
+        """
+
+        start_time = time.time()
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "system", "content": "You are a helpful security analyst."},
+                          {"role": "user", "content": prompt}],
+                response_format={"type": "json_object"},
+                timeout=timeout
+            )
+            latency = time.time() - start_time
+            results = json.loads(response.choices[0].message.content).get("results", [])
+
+            usage = {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens
+            }
+            confidences = [r.get("confidence", 0.0) for r in results] or [0.0]
+            self.tracker.log_usage(tenant_id, "openai", self.model, usage, latency, round(sum(confidences) / len(confidences), 2))
+
+            # Each item is charged its share of the packed prompt
+            item_usage = {k: v // len(items) for k, v in usage.items()}
+            for result in results:
+                index = result.get("index")
+                if isinstance(index, int) and 0 <= index < len(items):
+                    empty[index] = (result.get("narrative"), result.get("recommendation"), result.get("confidence", 0.0), item_usage)
+            return empty
+        except Exception as e:
+            print(f"OpenAI Error: {e}")
+            return empty
+
+class NarrativeCache:
+    """
+    Content-addressed cache of LLM narratives. Signals with the same type,
+    intent, pattern and risk bucket share an entry, so routine logins and
+    package updates cost one LLM call instead of one each. The user, host,
+    source IP and auth source of the signal are swapped for placeholders
+    when an answer is stored and filled back in on a hit. Counts are part
+    of the fingerprint instead, and answers still naming an IP address
+    (e.g. one of several unique_ips) are not cached.
+    Entries live in an in-memory LRU and, as one JSON file per fingerprint,
+    on disk; disk entries expire after ttl seconds and the oldest are
+    evicted beyond disk_size.
+    """
+    ENTITY_FIELDS = ("user", "hostname", "ip", "source")
+    COUNT_FIELDS = ("failure_count", "ip_count")
+    ADDRESS_TOKEN = re.compile(r"[0-9A-Fa-f:.]*[:.][0-9A-Fa-f:.]*")
+    # Purely alphabetic entity values shorter than this, or in this set, are
+    # also ordinary words, so only their quoted mentions are generalized
+    MIN_WORD_ENTITY_LENGTH = 6
+    COMMON_WORD_ENTITIES = frozenset({
+        "admin", "root", "test", "user", "guest", "backup", "operator", "support", "service",
+        "system", "daemon", "nobody", "deploy", "staff", "master", "server", "mail", "www"
+    })
+
+    def __init__(self, cache_dir: Optional[str] = NARRATIVE_CACHE_DIR, memory_size: int = NARRATIVE_CACHE_MEMORY_SIZE,
+                 disk_size: int = NARRATIVE_CACHE_DISK_SIZE, ttl: int = NARRATIVE_CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.ttl = ttl
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.disk_writes = 0
+
+    @staticmethod
+    def fingerprint(signal_type: str, context: Dict[str, Any]) -> str:
+        risk = context.get("risk_score") or 0.0
+        key = {
+            "type": signal_type,
+            "intent": context.get("intent"),
+            "pattern": context.get("pattern"),
+            "risk_bucket": int(risk / RISK_BUCKET),
+            "counts": [context.get(f) for f in NarrativeCache.COUNT_FIELDS]
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def _entities(self, context: Dict[str, Any]) -> Dict[str, str]:
+        entities = {f: str(context[f]) for f in self.ENTITY_FIELDS if context.get(f)}
+        unique_ips = context.get("unique_ips") or []
+        if "ip" not in entities and len(unique_ips) == 1:
+            entities["ip"] = str(unique_ips[0])
+        return entities
+
+    def _names_address(self, text: str) -> bool:
+        for token in self.ADDRESS_TOKEN.findall(text):
+            # Trailing punctuation, e.g. "from 10.0.0.1."
+            for candidate in (token, token.rstrip(".:")):
+                try:
+                    ipaddress.ip_address(candidate)
+                    return True
+                except ValueError:
+                    continue
+        return False
+
+    def _entity_pattern(self, value: str) -> str:
+        return rf"(?<![\w.-]){re.escape(value)}(?![\w-])"
+
+    def _unambiguous(self, value: str) -> bool:
+        """Whether every mention of the value can be taken to be the entity."""
+        if not value.isalpha():
+            return True  # 10.0.0.1, web-01, svc_backup
+        return len(value) >= self.MIN_WORD_ENTITY_LENGTH and value.lower() not in self.COMMON_WORD_ENTITIES
+
+    def _generalize(self, text: Optional[str], entities: Dict[str, str]) -> Optional[str]:
+        if not text:
+            return text
+        for field, value in entities.items():
+            placeholder = "{{" + field + "}}"
+            if self._unambiguous(value):
+                text = re.sub(self._entity_pattern(value), placeholder, text)
+            else:
+                # "root cause", "admin privileges": only quoted mentions are the entity
+                text = re.sub(rf"(['\"]){re.escape(value)}\1", lambda m: m.group(1) + placeholder + m.group(1), text)
+        return text
+
+    def _names_ambiguous_entity(self, text: str, entities: Dict[str, str]) -> bool:
+        return any(not self._unambiguous(value) and re.search(self._entity_pattern(value), text)
+                   for value in entities.values())
+
+    def _render(self, text: Optional[str], entities: Dict[str, str]) -> Optional[str]:
+        if not text:
+            return text
+        for field in self.ENTITY_FIELDS:
+            text = text.replace("{{" + field + "}}", entities.get(field, "unknown"))
+        return text
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, entry: Dict[str, Any]):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self.disk_writes += 1
+        if self.disk_writes % 1000 == 0:
+            self.evict()
+
+    def evict(self):
+        """Drops expired disk entries, then the oldest ones beyond disk_size."""
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return
+        now = time.time()
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    mtime = os.path.getmtime(path)
+                except OSError:
+                    continue
+                if now - mtime > self.ttl:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                else:
+                    entries.append((mtime, path))
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.disk_size)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get(self, signal_type: str, context: Dict[str, Any]) -> Tuple[Optional[Tuple[Optional[str], Optional[str], float]], Optional[str], int]:
+        """Returns ((narrative, recommendation, confidence) or None, tier hit, tokens the entry cost)."""
+        key = self.fingerprint(signal_type, context)
+        with self.lock:
+            entry = self.memory.get(key)
+            tier = "memory"
+            if entry is not None and time.time() - entry["stored_at"] > self.ttl:
+                del self.memory[key]
+                entry = None
+            if entry is None:
+                entry = self._read_disk(key)
+                tier = "disk"
+                if entry is not None:
+                    self._remember(key, entry)
+            else:
+                self.memory.move_to_end(key)
+        if entry is None:
+            return None, None, 0
+
+        entities = self._entities(context)
+        answer = (self._render(entry["narrative"], entities), self._render(entry["recommendation"], entities), entry["confidence"])
+        return answer, tier, entry.get("total_tokens", 0)
+
+    def put(self, signal_type: str, context: Dict[str, Any], narrative: Optional[str], recommendation: Optional[str],
+            confidence: float, total_tokens: int = 0):
+        if not narrative:
+            return
+        entities = self._entities(context)
+        narrative = self._generalize(narrative, entities)
+        recommendation = self._generalize(recommendation, entities)
+        # Another signal with this fingerprint would be shown this signal's
+        # addresses, or a name that may or may not be its user or host
+        if any(self._names_address(text) or self._names_ambiguous_entity(text, entities)
+               for text in (narrative, recommendation) if text):
+            return
+        key = self.fingerprint(signal_type, context)
+        entry = {
+            "narrative": narrative,
+            "recommendation": recommendation,
+            "confidence": confidence,
+            "total_tokens": total_tokens,
+            "stored_at": time.time()
+        }
+        with self.lock:
+            self._remember(key, entry)
+            self._write_disk(key, entry)
+
 class VectorDB:
     def __init__(self, path: str):
         if not HAS_AI_DEPS:
@@ -188,6 +490,7 @@ class AIEngine:
     def _init(self):
         self.tracker = UsageTracker()
         self.vector_db = VectorDB(CHROMA_PATH)
+        self.narrative_cache = NarrativeCache()
         
         # Default to OpenAI
         api_key = os.environ.get("OPENAI_API_KEY", "")
@@ -199,10 +502,109 @@ class AIEngine:
     def index_signal(self, tenant_id: str, signal_data: Dict[str, Any]):
         self.vector_db.index_signal(tenant_id, signal_data)
 
+    def _cached_answer(self, signal_type: str, context: Dict[str, Any]) -> Optional[Tuple[Optional[str], Optional[str], float]]:
+        answer, tier, tokens = self.narrative_cache.get(signal_type, context)
+        self.tracker.log_cache_lookup(tier, tokens)
+        return answer
+
+    def _store_answer(self, signal_type: str, context: Dict[str, Any], narrative, recommendation, confidence, usage):
+        self.narrative_cache.put(signal_type, context, narrative, recommendation, confidence, usage.get("total_tokens", 0))
+
     def consult_ai(self, tenant_id: str, signal_type: str, context: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], float]:
+        cached = self._cached_answer(signal_type, context)
+        if cached:
+            return cached
         narrative, recommendation, confidence, usage = self.provider.generate_narrative(tenant_id, signal_type, context)
+        self._store_answer(signal_type, context, narrative, recommendation, confidence, usage)
         return narrative, recommendation, confidence
 
+    def consult_ai_batch(self, tenant_id: str, items: List[Tuple[str, Dict[str, Any]]],
+                         batch_size: int = AI_BATCH_SIZE, max_concurrency: int = AI_MAX_CONCURRENCY,
+                         timeout: float = AI_REQUEST_TIMEOUT) -> List[Tuple[Optional[str], Optional[str], float]]:
+        """
+        Blocking wrapper around consult_ai_batch_async for synchronous callers.
+        """
+        return asyncio.run(self.consult_ai_batch_async(tenant_id, items, batch_size, max_concurrency, timeout))
+
+    async def consult_ai_batch_async(self, tenant_id: str, items: List[Tuple[str, Dict[str, Any]]],
+                                     batch_size: int = AI_BATCH_SIZE, max_concurrency: int = AI_MAX_CONCURRENCY,
+                                     timeout: float = AI_REQUEST_TIMEOUT) -> List[Tuple[Optional[str], Optional[str], float]]:
+        """
+        Enriches many (signal_type, context) items with few LLM round trips.
+        Items are packed batch_size per prompt and at most max_concurrency
+        prompts are in flight; the rest wait in the executor queue, which is
+        the backpressure on a slow provider. A prompt that has not answered
+        within timeout seconds of being submitted (queue time included) is
+        abandoned, and its items come back as (None, None, 0.0) so the caller
+        can use its deterministic fallback. Items that share a fingerprint
+        with a miss wait for its answer and are sent in a second round when
+        it was not cached.
+        """
+        results = [(None, None, 0.0)] * len(items)
+        if not items:
+            return results
+
+        # Only cache misses are sent to the provider, one item per fingerprint;
+        # the items sharing it are answered from the cache afterwards.
+        misses = []
+        followers = {}
+        for i, (signal_type, context) in enumerate(items):
+            cached, tier, tokens = self.narrative_cache.get(signal_type, context)
+            key = self.narrative_cache.fingerprint(signal_type, context)
+            if cached:
+                results[i] = cached
+                self.tracker.log_cache_lookup(tier, tokens)
+            elif key in followers:
+                followers[key].append(i)
+            else:
+                followers[key] = []
+                misses.append(i)
+                self.tracker.log_cache_lookup(None)
+        if not misses:
+            return results
+
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+        async def run_batch(indexes: List[int]):
+            chunk = [items[i] for i in indexes]
+            future = loop.run_in_executor(executor, self.provider.generate_narratives_batch, tenant_id, chunk, timeout)
+            try:
+                answers = await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                print(f"[AI] Batch of {len(chunk)} signals missed its {timeout}s deadline, using fallback narratives")
+                return
+            except Exception as e:
+                print(f"[AI] Batch enrichment failed: {e}")
+                return
+            for i, (narrative, recommendation, confidence, usage) in zip(indexes, answers):
+                results[i] = (narrative, recommendation, confidence)
+                self._store_answer(items[i][0], items[i][1], narrative, recommendation, confidence, usage)
+
+        async def run_batches(indexes: List[int]):
+            await asyncio.gather(*(run_batch(indexes[start:start + batch_size])
+                                   for start in range(0, len(indexes), batch_size)))
+
+        try:
+            await run_batches(misses)
+            # A follower gets nothing from the cache when its leader's answer was
+            # not cached (it named an address) or its batch failed; those are sent
+            # in a second round of their own.
+            unanswered = []
+            for indexes in followers.values():
+                for j in indexes:
+                    cached = self._cached_answer(*items[j])
+                    if cached:
+                        results[j] = cached
+                    else:
+                        unanswered.append(j)
+            if unanswered:
+                await run_batches(unanswered)
+        finally:
+            # Abandoned prompts are not waited for; queued ones are cancelled
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
     def classify_intent(self, tenant_id: str, query: str) -> Tuple[str, float]:
         """
         Uses LLM to classify query intent for the QRE.
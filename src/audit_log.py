@@ -0,0 +1,166 @@
+import os
+import sys
+import gzip
+import json
+import time
+import atexit
+import shutil
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any
+
+# Audit writer: records held in memory, seconds a record waits before its
+# batch is written, and when the active file is rotated (bytes or seconds)
+AUDIT_BUFFER_SIZE = 100000
+AUDIT_FLUSH_INTERVAL = 0.5
+AUDIT_MAX_BYTES = 50 * 1024 * 1024
+AUDIT_MAX_AGE = 24 * 3600
+
+class AuditWriter:
+    """
+    Append-only JSON lines audit log written off the request path. write()
+    only serializes the record into an in-memory ring buffer; a background
+    thread appends everything buffered in one write and fsync (group commit)
+    at most every flush_interval seconds. The active file is rotated to
+    <path>.<timestamp> once it exceeds max_bytes or is older than max_age
+    seconds (its creation time is kept in <path>.created), and rotated
+    files are gzipped when compress is set. close() (also run at exit)
+    writes out every buffered record. If the disk stalls long enough to
+    fill the buffer, the oldest records are dropped and counted.
+    """
+    def __init__(self, path: str, buffer_size: int = AUDIT_BUFFER_SIZE, flush_interval: float = AUDIT_FLUSH_INTERVAL,
+                 max_bytes: int = AUDIT_MAX_BYTES, max_age: float = AUDIT_MAX_AGE, compress: bool = False):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compress = compress
+        self.buffer = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.writing = False
+        self.stats = {"written": 0, "batches": 0, "rotations": 0, "dropped": 0, "errors": 0}
+        self.file = None
+        self.opened_at = None
+        self.worker = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self.worker.start()
+        atexit.register(self.close)
+
+    def write(self, record: Dict[str, Any]):
+        """Queues one record; never touches the disk."""
+        line = json.dumps(record) + "\n"
+        with self.cond:
+            if self.closed:
+                raise ValueError("audit log is closed")
+            if len(self.buffer) >= self.buffer_size:
+                self.buffer.popleft()
+                self.stats["dropped"] += 1
+            self.buffer.append(line)
+            if len(self.buffer) == 1:
+                self.cond.notify_all()
+
+    def flush(self):
+        """Blocks until every record written so far is on disk."""
+        with self.cond:
+            self.cond.notify_all()
+            while self.buffer or self.writing:
+                self.cond.wait(0.1)
+
+    def close(self):
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.cond.notify_all()
+        self.worker.join()
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def _open(self):
+        self.file = open(self.path, "a")
+        # The creation time is kept beside the file, so a file left by an
+        # earlier run keeps its age (mtime only tells the last append)
+        created_path = self.path + ".created"
+        self.opened_at = None
+        if self.file.tell():
+            try:
+                with open(created_path, "r") as f:
+                    self.opened_at = float(f.read())
+            except (OSError, ValueError):
+                pass
+        if self.opened_at is None:
+            self.opened_at = time.time()
+            with open(created_path, "w") as f:
+                f.write(repr(self.opened_at))
+
+    def _rotate(self):
+        self.file.close()
+        self.file = None
+        try:
+            os.remove(self.path + ".created")
+        except OSError:
+            pass
+        rotated = f"{self.path}.{datetime.now().strftime('%Y%m%dT%H%M%S%f')}"
+        os.replace(self.path, rotated)
+        self.stats["rotations"] += 1
+        if self.compress:
+            with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+
+    def _commit(self, lines):
+        """Appends lines, removing them from the list once they are on disk."""
+        while lines:
+            if self.file is None:
+                self._open()
+            # Fill the active file up to max_bytes, rotating mid-batch if needed
+            size = self.file.tell()
+            end = 0
+            while end < len(lines) and (end == 0 or size + len(lines[end]) <= self.max_bytes):
+                size += len(lines[end])
+                end += 1
+            self.file.write("".join(lines[:end]))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.stats["written"] += end
+            del lines[:end]
+            if self.file.tell() >= self.max_bytes or time.time() - self.opened_at >= self.max_age:
+                self._rotate()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                # Let a batch gather unless we are closing
+                if not self.closed and self.buffer:
+                    self.cond.wait(self.flush_interval)
+                while not self.buffer and not self.closed:
+                    self.cond.wait()
+                if not self.buffer and self.closed:
+                    return
+                lines = list(self.buffer)
+                self.buffer.clear()
+                self.writing = True
+            try:
+                self._commit(lines)
+                self.stats["batches"] += 1
+            except OSError as e:
+                self.stats["errors"] += 1
+                if self.closed:
+                    print(f"[Audit] Error writing {self.path}, {len(lines)} records lost: {e}", file=sys.stderr)
+                    self.stats["dropped"] += len(lines)
+                    continue
+                print(f"[Audit] Error writing {self.path}, will retry: {e}", file=sys.stderr)
+                with self.cond:
+                    # Put the batch back in front of newer records
+                    room = max(0, self.buffer_size - len(self.buffer))
+                    keep = lines[len(lines) - room:] if room < len(lines) else lines
+                    self.stats["dropped"] += len(lines) - len(keep)
+                    self.buffer.extendleft(reversed(keep))
+                time.sleep(self.flush_interval)
+            finally:
+                with self.cond:
+                    self.writing = False
+                    self.cond.notify_all()
@@ -0,0 +1,185 @@
+import os
+import re
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from parse_auth_log import parse_line, parse_timestamp, iter_parsed_events
+
+# Representative auth.log mix: most lines are cron/systemd noise that the
+# parser must reject quickly, the rest exercise every extractor.
+LINE_TEMPLATES = [
+    (40, "{ts} {host} CRON[{pid}]: pam_unix(cron:session): session opened for user root by (uid=0)"),
+    (25, "{ts} {host} systemd-logind[{pid}]: New session {pid} of user {user}."),
+    (10, "{ts} {host} systemd[1]: Started Session {pid} of User {user}."),
+    (6, "{ts} {host} sshd[{pid}]: Accepted publickey for {user} from {ip} port 52344 ssh2: RSA SHA256:abc"),
+    (6, "{ts} {host} sshd[{pid}]: Failed password for invalid user {user} from {ip} port 40022 ssh2"),
+    (3, "{ts} {host} sshd[{pid}]: Invalid user {user} from {ip} port 40022"),
+    (4, "{ts} {host} sudo: {user} : TTY=pts/0 ; PWD=/home/{user} ; USER=root ; COMMAND=/usr/bin/apt update"),
+    (2, "{ts} {host} sudo: {user} : pam_unix(sudo:auth): authentication failure; logname={user} uid=1000 euid=0 tty=/dev/pts/0 ruser={user} rhost=  user={user}"),
+    (2, "{ts} {host} su[{pid}]: pam_unix(su:session): session opened for user root by {user}(uid=1000)"),
+    (1, "{ts} {host} su[{pid}]: pam_unix(su:auth): authentication failure; logname={user} uid=1000 euid=0 tty=pts/0 ruser={user} rhost=  user=root"),
+    (1, "{ts} {host} useradd[{pid}]: new user: name=svc-{user}, UID=1001, GID=1001, home=/home/svc-{user}, shell=/bin/bash"),
+]
+USERS = ["stpi", "root", "admin", "deploy", "oracle", "test"]
+HOSTS = ["braoucloud1", "braoucloud2", "edge-proxy"]
+
+def legacy_parse_line(line):
+    """Pre-engine parse_line, kept verbatim as the equivalence and speed baseline."""
+    line = line.strip()
+    if not line:
+        return None
+
+    syslog_pattern = re.compile(
+        r'^(?P<timestamp>\S+)\s+'
+        r'(?P<hostname>\S+)\s+'
+        r'(?P<program>[^\[:]+)(?:\[\d+\])?:\s+'
+        r'(?P<message>.*)$'
+    )
+
+    match = syslog_pattern.match(line)
+    if not match:
+        return None
+
+    data = match.groupdict()
+    program = data['program'].strip()
+    message = data['message']
+
+    dt = parse_timestamp(data['timestamp'])
+    if not dt:
+        return None
+
+    if program == 'sshd':
+        if 'Accepted publickey' in message:
+            match = re.search(r'for\s+(\S+)\s+from\s+(\S+)', message)
+            if match:
+                return {"type": "ssh_login", "timestamp": dt, "hostname": data['hostname'],
+                        "user": match.group(1), "ip": match.group(2)}
+        elif 'Failed password' in message or 'Invalid user' in message:
+            match = re.search(r'for\s+(?:invalid user\s+)?(\S+)\s+from\s+(\S+)', message)
+            if not match:
+                match = re.search(r'Invalid user\s+(\S+)\s+from\s+(\S+)', message)
+            if match:
+                return {"type": "ssh_failure", "timestamp": dt, "hostname": data['hostname'],
+                        "user": match.group(1), "ip": match.group(2)}
+
+    if program == 'sudo':
+        if 'COMMAND=' in message and 'USER=root' in message:
+            user_match = re.search(r'^\s*(\S+)\s+:', message)
+            cmd_match = re.search(r'COMMAND=(.*)', message)
+            if user_match and cmd_match:
+                return {"type": "privilege_escalation", "timestamp": dt, "hostname": data['hostname'],
+                        "user": user_match.group(1), "command": cmd_match.group(1).strip()}
+        elif 'authentication failure' in message or 'conversation failed' in message:
+            user_match = re.search(r'user=(\S+)', message)
+            if not user_match:
+                user_match = re.search(r'^\s*(\S+)\s+:', message)
+            if user_match:
+                return {"type": "auth_failure", "timestamp": dt, "hostname": data['hostname'],
+                        "user": user_match.group(1), "source": "sudo", "confidence": "high"}
+
+    if program == 'su':
+        if 'session opened for user' in message:
+            match = re.search(r'user\s+(\S+)\s+by\s+(\S+)\(', message)
+            if match:
+                return {"type": "privilege_escalation", "timestamp": dt, "hostname": data['hostname'],
+                        "user": match.group(2), "target_user": match.group(1),
+                        "command": f"su to {match.group(1)}", "source": "su", "confidence": "medium"}
+        elif 'authentication failure' in message:
+            user_match = re.search(r'user=(\S+)', message)
+            if user_match:
+                return {"type": "auth_failure", "timestamp": dt, "hostname": data['hostname'],
+                        "user": user_match.group(1), "source": "su", "confidence": "high"}
+
+    iam_programs = ['useradd', 'usermod', 'userdel', 'groupadd', 'groupmod', 'groupdel', 'chage']
+    if program in iam_programs:
+        return {"type": "iam_change", "timestamp": dt, "hostname": data['hostname'], "user": "root",
+                "program": program, "message": message, "confidence": "high"}
+
+    return None
+
+def generate_synthetic_log(path, size_mb, seed=42):
+    """Writes a synthetic auth.log of roughly size_mb megabytes."""
+    rng = random.Random(seed)
+    weights = [w for w, _ in LINE_TEMPLATES]
+    templates = [t for _, t in LINE_TEMPLATES]
+    target = size_mb * 1024 * 1024
+    ts = datetime(2026, 2, 9, 0, 0, 0)
+    written = 0
+    with open(path, 'w') as f:
+        while written < target:
+            batch = []
+            for template in rng.choices(templates, weights=weights, k=10000):
+                ts += timedelta(milliseconds=rng.randint(1, 500))
+                batch.append(template.format(
+                    ts=ts.isoformat(timespec='microseconds') + "+00:00",
+                    host=rng.choice(HOSTS),
+                    pid=rng.randint(100, 65000),
+                    user=rng.choice(USERS),
+                    ip=f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+                ))
+            chunk = "\n".join(batch) + "\n"
+            f.write(chunk)
+            written += len(chunk)
+
+def run_parser(parse_fn, path, max_lines=None):
+    lines = 0
+    events = 0
+    start = time.perf_counter()
+    with open(path, 'r') as f:
+        for line in f:
+            if parse_fn(line):
+                events += 1
+            lines += 1
+            if max_lines and lines >= max_lines:
+                break
+    return lines, events, time.perf_counter() - start
+
+def run_reader(path, total_lines):
+    """Times the mmap/prefilter reader path, which only decodes auth-program lines."""
+    start = time.perf_counter()
+    events = sum(1 for _ in iter_parsed_events(path))
+    return total_lines, events, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentra auth.log parser benchmark (lines/sec)")
+    parser.add_argument("--input", help="Existing auth.log to benchmark (skips generation)")
+    parser.add_argument("--size-mb", type=int, default=2048, help="Size of the synthetic log to generate")
+    parser.add_argument("--path", default="synthetic_auth.log", help="Where to write the synthetic log")
+    parser.add_argument("--verify-lines", type=int, default=200000, help="Lines compared against the legacy parser")
+    parser.add_argument("--skip-legacy", action="store_true", help="Do not time the legacy parser over the full log")
+    args = parser.parse_args()
+
+    path = args.input or args.path
+    if not args.input and not os.path.exists(path):
+        print(f"Generating {args.size_mb} MB synthetic log at {path}...", file=sys.stderr)
+        generate_synthetic_log(path, args.size_mb)
+
+    # 1. Equivalence check on a prefix of the log
+    with open(path, 'r') as f:
+        for i, line in enumerate(f):
+            if i >= args.verify_lines:
+                break
+            if parse_line(line) != legacy_parse_line(line):
+                print(f"MISMATCH at line {i + 1}: {line!r}", file=sys.stderr)
+                sys.exit(1)
+    print(f"Verified {min(i + 1, args.verify_lines)} lines produce identical events.")
+
+    # 2. Throughput
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    results = [("engine", run_parser(parse_line, path))]
+    results.append(("reader", run_reader(path, results[0][1][0])))
+    if not args.skip_legacy:
+        results.append(("legacy", run_parser(legacy_parse_line, path)))
+
+    for name, (lines, events, elapsed) in results:
+        print(f"{name:>7}: {lines} lines ({size_mb:.0f} MB), {events} events in {elapsed:.2f}s "
+              f"-> {lines / elapsed:,.0f} lines/sec, {size_mb / elapsed:.1f} MB/s")
+    if not args.skip_legacy:
+        legacy_elapsed = results[-1][1][2]
+        for name, (_, _, elapsed) in results[:-1]:
+            print(f"Speedup ({name} vs legacy): {legacy_elapsed / elapsed:.2f}x")
+
+if __name__ == "__main__":
+    main()
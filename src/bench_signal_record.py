@@ -0,0 +1,117 @@
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+from schema import (
+    SecuritySignal, SignalRecord, UserEntity, HostEntity, ProcessEntity, NetworkEntity, ComplianceTag,
+    severity_for_risk
+)
+from storage import flatten_signal
+
+USERS = ["stpi", "root", "admin", "deploy", "oracle", "test"]
+HOSTS = ["braoucloud1", "braoucloud2", "edge-proxy"]
+
+def generate_signal_data(n, seed=42):
+    """Aggregated signal dicts shaped like parse_auth_log.build_window_signal output."""
+    rng = random.Random(seed)
+    ts = datetime(2026, 2, 9, 0, 0, 0)
+    signals = []
+    for i in range(n):
+        ts += timedelta(seconds=rng.randint(1, 60))
+        base = {"id": f"{i:012x}", "timestamp": ts.isoformat(), "hostname": rng.choice(HOSTS),
+                "user": rng.choice(USERS), "narrative": "A standard login was recorded.",
+                "recommendation": "No action required.", "risk_score": round(rng.random(), 2)}
+        if i % 2:
+            ip = f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+            base.update(signal="ssh_access_pattern", unique_ips=[ip], ip_count=1, pattern="single_ip_access",
+                        mitre_tags=["T1078"], compliance_tags=["CC6.1"])
+        else:
+            base.update(signal="privilege_escalation", intent="Software Management", source="sudo",
+                        commands=[{"command": "/usr/bin/apt update", "intent": "Software Management"}],
+                        mitre_tags=["T1548.003"], compliance_tags=["CC6.1", "CC7.2"])
+        signals.append(base)
+    return signals
+
+def legacy_to_security_signal(tenant_id, signal_data):
+    """Pre-record StreamProcessor.to_security_signal, kept verbatim as the baseline."""
+    commands = signal_data.get("commands") or []
+    ip = signal_data.get("ip")
+    if not ip and signal_data.get("ip_count") == 1:
+        ip = signal_data["unique_ips"][0]
+
+    return SecuritySignal(
+        id=signal_data["id"],
+        tenant_id=tenant_id,
+        timestamp=datetime.fromisoformat(signal_data["timestamp"]),
+        signal_type=signal_data["signal"],
+        severity=severity_for_risk(signal_data.get("risk_score", 0.0)),
+        risk_score=signal_data.get("risk_score", 0.0),
+        user=UserEntity(username=signal_data["user"]),
+        host=HostEntity(hostname=signal_data["hostname"]),
+        process=ProcessEntity(name=commands[0]["command"]) if commands else None,
+        network=NetworkEntity(source_ip=ip) if ip else None,
+        narrative=signal_data.get("narrative"),
+        recommendation=signal_data.get("recommendation"),
+        compliance_tags=[ComplianceTag(framework="SOC2", control_id=c) for c in signal_data.get("compliance_tags", [])],
+        mitre_ttps=signal_data.get("mitre_tags", []),
+        extra_data={k: v for k, v in signal_data.items() if k in ("pattern", "unique_ips", "failure_count", "intent", "source", "program")}
+    )
+
+def model_path(tenant_id, signal_data):
+    """Previous ingest path: build the Pydantic model, then serialize it for each engine."""
+    signal = legacy_to_security_signal(tenant_id, signal_data)
+    return flatten_signal(signal), signal.model_dump_json()
+
+def record_path(tenant_id, signal_data):
+    record = SignalRecord.from_signal_data(tenant_id, signal_data)
+    return record.to_row(), record.to_json()
+
+def measure(path_fn, build_fn, signals, tenant_id):
+    """CPU seconds for the whole ingest path, and bytes held per in-memory signal object."""
+    start = time.process_time()
+    for signal_data in signals:
+        path_fn(tenant_id, signal_data)
+    cpu = time.process_time() - start
+
+    sample = signals[:1000]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build_fn(tenant_id, signal_data) for signal_data in sample]
+    retained = (tracemalloc.get_traced_memory()[0] - before) / len(kept)
+    tracemalloc.stop()
+    return cpu, retained
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentra signal representation benchmark (Pydantic vs SignalRecord)")
+    parser.add_argument("--signals", type=int, default=100000, help="Number of synthetic signals")
+    parser.add_argument("--tenant-id", default="bench-tenant")
+    args = parser.parse_args()
+
+    signals = generate_signal_data(args.signals)
+
+    # 1. Equivalence: the record must serialize exactly like the model
+    for signal_data in signals[:10000]:
+        if SignalRecord.from_signal_data(args.tenant_id, signal_data).to_model() != legacy_to_security_signal(args.tenant_id, signal_data):
+            print(f"MISMATCH converting signal {signal_data['id']} back to the model", file=sys.stderr)
+            sys.exit(1)
+        model_row, model_doc = model_path(args.tenant_id, signal_data)
+        record_row, record_doc = record_path(args.tenant_id, signal_data)
+        if model_row != record_row or json.loads(model_doc) != json.loads(record_doc):
+            print(f"MISMATCH for signal {signal_data['id']}:\n{model_doc}\n{record_doc}", file=sys.stderr)
+            sys.exit(1)
+    print(f"Verified {min(10000, len(signals))} signals serialize identically.")
+
+    # 2. CPU and allocations
+    results = [("pydantic", measure(model_path, legacy_to_security_signal, signals, args.tenant_id)),
+               ("record", measure(record_path, SignalRecord.from_signal_data, signals, args.tenant_id))]
+    for name, (cpu, retained) in results:
+        print(f"{name:>8}: {cpu:.2f}s CPU for {len(signals)} signals -> {cpu / len(signals) * 1e6:.1f} us/signal, "
+              f"{retained:,.0f} bytes/signal in memory")
+    (_, (model_cpu, model_mem)), (_, (record_cpu, record_mem)) = results
+    print(f"Speedup: {model_cpu / record_cpu:.2f}x CPU, {model_mem / record_mem:.2f}x less memory per signal")
+
+if __name__ == "__main__":
+    main()
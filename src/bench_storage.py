@@ -0,0 +1,137 @@
+import sys
+import time
+import argparse
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from schema import SignalRecord
+from storage import ClickHouseStorage
+from bench_signal_record import generate_signal_data
+
+class StubClickHouse(ThreadingHTTPServer):
+    """
+    Stand-in for the ClickHouse HTTP interface on a free local port. Each
+    POST is answered with the next queued status (200 once the queue is
+    empty); the row counts of the accepted INSERTs are recorded.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.statuses = deque()
+        self.requests = 0
+        self.inserts = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def reset(self, statuses=()):
+        with self.lock:
+            self.statuses = deque(statuses)
+            self.requests = 0
+            self.inserts = []
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            status = server.statuses.popleft() if server.statuses else 200
+            if status == 200:
+                server.inserts.append(len(body.splitlines()))
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def records(n, tenant_id="bench-tenant"):
+    return [SignalRecord.from_signal_data(tenant_id, s) for s in generate_signal_data(n)]
+
+def storage_for(stub, **kwargs):
+    kwargs.setdefault("retry_backoff", 0.01)
+    return ClickHouseStorage("127.0.0.1", stub.server_port, **kwargs)
+
+def check(name, ok, detail):
+    if not ok:
+        print(f"FAILED {name}: {detail}", file=sys.stderr)
+        sys.exit(1)
+    print(f"ok: {name}")
+
+def run_checks(stub):
+    """Batching, retries and flushing of the buffered writer against the stub."""
+    # Full batches go out as they fill; the remainder only on close
+    stub.reset()
+    storage = storage_for(stub, batch_size=100, flush_interval=60)
+    for record in records(250):
+        storage.ingest(record)
+    time.sleep(0.5)
+    before_close = list(stub.inserts)
+    delivered = storage.close()
+    check("batches of batch_size, remainder flushed on close", before_close == [100, 100] and
+          stub.inserts == [100, 100, 50] and delivered, f"before close {before_close}, after {stub.inserts}")
+
+    # A partial batch is sent once its oldest row is flush_interval old
+    stub.reset()
+    storage = storage_for(stub, batch_size=100, flush_interval=0.2)
+    for record in records(5):
+        storage.ingest(record)
+    time.sleep(1.0)
+    aged = list(stub.inserts)
+    storage.close()
+    check("partial batch flushed after flush_interval", aged == [5], f"inserts {aged}")
+
+    # 5xx is retried with backoff until it succeeds
+    stub.reset([503, 502])
+    storage = storage_for(stub, batch_size=10, max_retries=3)
+    for record in records(10):
+        storage.ingest(record)
+    delivered = storage.close()
+    check("5xx retried", stub.requests == 3 and stub.inserts == [10] and storage.stats["retries"] == 2 and delivered,
+          f"{stub.requests} requests, inserts {stub.inserts}, stats {storage.stats}")
+
+    # 5xx past max_retries: the batch is given up and reported as not delivered
+    stub.reset([503] * 3)
+    storage = storage_for(stub, batch_size=10, max_retries=2)
+    for record in records(10):
+        storage.ingest(record)
+    delivered = storage.close()
+    check("5xx beyond max_retries given up", stub.requests == 3 and not stub.inserts and not delivered and
+          storage.stats["rows_failed"] == 10, f"{stub.requests} requests, delivered {delivered}, stats {storage.stats}")
+
+    # 4xx rejects the batch at once, without retries
+    stub.reset([400])
+    storage = storage_for(stub, batch_size=10, max_retries=3)
+    for record in records(10):
+        storage.ingest(record)
+    storage.close()
+    check("4xx not retried", stub.requests == 1 and storage.stats["retries"] == 0 and storage.stats["rows_failed"] == 10,
+          f"{stub.requests} requests, stats {storage.stats}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentra ClickHouse writer check and benchmark against a stub server")
+    parser.add_argument("--signals", type=int, default=200000, help="Signals ingested for the throughput run")
+    args = parser.parse_args()
+
+    stub = StubClickHouse()
+    # 1. Behaviour of the buffered writer
+    run_checks(stub)
+
+    # 2. Throughput, from the first ingest until close() returns
+    batch = records(args.signals)
+    stub.reset()
+    storage = storage_for(stub)
+    start = time.perf_counter()
+    for record in batch:
+        storage.ingest(record)
+    storage.close()
+    elapsed = time.perf_counter() - start
+    check("every row delivered", sum(stub.inserts) == len(batch), f"{sum(stub.inserts)} of {len(batch)} rows")
+    print(f"{len(batch)} rows in {len(stub.inserts)} INSERTs in {elapsed:.2f}s -> {len(batch) / elapsed:,.0f} rows/sec")
+    stub.shutdown()
+
+if __name__ == "__main__":
+    main()
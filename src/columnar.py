@@ -0,0 +1,206 @@
+import json
+from datetime import timezone
+from schema import SignalRecord
+
+# Optional dependency for columnar (Arrow/Parquet) signal files
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+PARQUET_SUFFIX = ".parquet"
+SUMMARIES_METADATA_KEY = b"sentra.summaries"
+ROW_GROUP_SIZE = 65536
+
+# Signal dict keys with a column of their own; everything else is kept in `details`
+SPARSE_KEYS = ("narrative", "recommendation", "intent", "pattern", "status", "confidence")
+COLUMN_KEYS = {
+    "id": "id",
+    "tenant_id": "tenant_id",
+    "signal_type": "signal",
+    "timestamp": "timestamp",
+    "user_username": "user",
+    "host_hostname": "hostname",
+    "risk_score": "risk_score",
+    "mitre_ttps": "mitre_tags",
+    "compliance_controls": "compliance_tags",
+}
+
+def is_parquet(path):
+    return path.endswith(PARQUET_SUFFIX)
+
+def _require_arrow():
+    if not HAS_ARROW:
+        raise RuntimeError("pyarrow is required for Parquet signal files (pip install pyarrow)")
+
+def signal_schema():
+    """
+    The sentra.signals columns from db_setup.sql (LowCardinality -> dictionary,
+    DateTime64(3) -> timestamp[ms]) followed by the narrative fields the
+    reports need and a JSON `details` column for the rest of the signal.
+    Scores are float64 rather than Float32 so they survive a round trip.
+    """
+    _require_arrow()
+    low_cardinality = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("id", pa.string()),
+        ("tenant_id", low_cardinality),
+        ("schema_version", pa.string()),
+        ("timestamp", pa.timestamp("ms")),
+        ("signal_type", low_cardinality),
+        ("severity", low_cardinality),
+        ("risk_score", pa.float64()),
+        ("user_username", pa.string()),
+        ("host_hostname", pa.string()),
+        ("host_ip", pa.string()),
+        ("process_name", pa.string()),
+        ("network_source_ip", pa.string()),
+        ("ai_confidence", pa.float64()),
+        ("model_name", low_cardinality),
+        ("mitre_ttps", pa.list_(pa.string())),
+        ("compliance_controls", pa.list_(pa.string())),
+        ("narrative", pa.string()),
+        ("recommendation", pa.string()),
+        ("intent", low_cardinality),
+        ("pattern", low_cardinality),
+        ("status", low_cardinality),
+        ("confidence", low_cardinality),
+        ("details", pa.string()),
+    ])
+
+def _to_naive_utc(ts):
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+def _flatten(signal_data, tenant_id):
+    """One signal dict as a row of signal_schema() columns."""
+    record = SignalRecord.from_signal_data(signal_data.get("tenant_id", tenant_id), signal_data)
+    row = record.to_row()
+    row["timestamp"] = _to_naive_utc(record.timestamp)
+    row["ai_confidence"] = signal_data.get("ai_confidence", 0.0)
+    row["mitre_ttps"] = signal_data.get("mitre_tags")
+    row["compliance_controls"] = signal_data.get("compliance_tags")
+
+    details = {k: v for k, v in signal_data.items() if k not in COLUMN_KEYS.values() and k not in SPARSE_KEYS}
+    for key in SPARSE_KEYS:
+        value = signal_data.get(key)
+        row[key] = value
+        if key in signal_data and value is None:
+            details[key] = None
+    # Timestamps that do not survive millisecond precision keep their original text
+    if row["timestamp"].isoformat(timespec="milliseconds" if row["timestamp"].microsecond else "seconds") != signal_data["timestamp"]:
+        details["timestamp"] = signal_data["timestamp"]
+    if "tenant_id" not in signal_data:
+        details["_tenant_id_default"] = True
+    row["details"] = json.dumps(details) if details else None
+    return row
+
+def signals_to_record_batch(signals, tenant_id="default-tenant"):
+    """Converts aggregated signal dicts (parse_auth_log output) to one Arrow record batch."""
+    schema = signal_schema()
+    rows = [_flatten(s, tenant_id) for s in signals]
+    columns = [pa.array([row[field.name] for row in rows], type=field.type) for field in schema]
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+def write_signals_parquet(path, signals, summaries=(), tenant_id="default-tenant", row_group_size=ROW_GROUP_SIZE):
+    """
+    Writes signals as a zstd-compressed Parquet file, one row group per
+    row_group_size signals. Report lines such as weekly_security_summary
+    are stored in the file metadata so one file carries a server's output.
+    """
+    _require_arrow()
+    schema = signal_schema().with_metadata({SUMMARIES_METADATA_KEY: json.dumps(list(summaries))})
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for start in range(0, len(signals), row_group_size):
+            batch = signals_to_record_batch(signals[start:start + row_group_size], tenant_id)
+            writer.write_batch(batch.replace_schema_metadata(schema.metadata))
+
+def read_summaries(path):
+    _require_arrow()
+    metadata = pq.read_schema(path).metadata or {}
+    return json.loads(metadata.get(SUMMARIES_METADATA_KEY, b"[]"))
+
+def iter_signal_batches(path, columns=None):
+    """Yields the file's row groups as Arrow record batches, optionally only some columns."""
+    _require_arrow()
+    parquet_file = pq.ParquetFile(path)
+    for i in range(parquet_file.num_row_groups):
+        yield from parquet_file.read_row_group(i, columns=columns).to_batches()
+
+def _column_values(batch, name):
+    column = batch.column(name)
+    if pa.types.is_dictionary(column.type):
+        column = column.cast(pa.string())
+    elif pa.types.is_timestamp(column.type):
+        # Same text as datetime.isoformat() for whole seconds and milliseconds
+        column = pc.replace_substring_regex(pc.strftime(column, format="%Y-%m-%dT%H:%M:%S"), pattern=r"\.000$", replacement="")
+    return column.to_pylist()
+
+def batch_to_signals(batch):
+    """Inverse of signals_to_record_batch: the original signal dicts."""
+    loads = json.loads
+    mapped = [(key, _column_values(batch, column)) for column, key in COLUMN_KEYS.items()]
+    sparse = [(key, _column_values(batch, key)) for key in SPARSE_KEYS]
+    signals = []
+    for i, details in enumerate(_column_values(batch, "details")):
+        signal_data = loads(details) if details else {}
+        for key, values in mapped:
+            value = values[i]
+            if value is not None and key not in signal_data:
+                signal_data[key] = value
+        for key, values in sparse:
+            value = values[i]
+            if value is not None:
+                signal_data[key] = value
+        if signal_data.pop("_tenant_id_default", False):
+            del signal_data["tenant_id"]
+        signals.append(signal_data)
+    return signals
+
+def read_signal_table(path, columns=None):
+    """Reads only the given columns as an Arrow table, for columnar aggregation."""
+    _require_arrow()
+    return pq.read_table(path, columns=columns)
+
+def read_signals_parquet(path):
+    """Returns (signals, summaries) from a file written by write_signals_parquet."""
+    signals = []
+    for batch in iter_signal_batches(path):
+        signals.extend(batch_to_signals(batch))
+    return signals, read_summaries(path)
+
+def iter_records(path):
+    """
+    Streams a parser output file record by record without loading it:
+    JSON lines in file order, or for Parquet the summaries followed by the
+    signals one row group at a time.
+    """
+    if is_parquet(path):
+        yield from read_summaries(path)
+        for batch in iter_signal_batches(path):
+            yield from batch_to_signals(batch)
+        return
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def load_signal_file(path):
+    """
+    Loads (signals, summaries) from a parser output file, Parquet or JSON
+    lines. Lines/rows with a report_type are summaries, those with a
+    signal are signals.
+    """
+    if is_parquet(path):
+        return read_signals_parquet(path)
+    signals, summaries = [], []
+    for data in iter_records(path):
+        if "report_type" in data:
+            summaries.append(data)
+        elif "signal" in data:
+            signals.append(data)
+    return signals, summaries
@@ -43,6 +43,8 @@ st.sidebar.header("📊 AI Usage Metrics")
 tracker = ai_engine.get_usage_tracker()
 st.sidebar.metric("Tokens Consumed", f"{tracker.total_tokens:,}")
 st.sidebar.metric("Estimated Cost", f"${tracker.total_cost_usd:.4f}")
+st.sidebar.metric("Narrative Cache Hit Rate", f"{tracker.cache_hit_rate:.0%}",
+                  help=f"{tracker.cache_stats['tokens_saved']:,} tokens saved")
 
 # Tabs for different views
 tab1, tab2, tab3 = st.tabs(["🌩️ Signal Stream", "🔍 QRE Lab", "🧠 Model Drift"])
@@ -27,23 +27,28 @@ CREATE TABLE IF NOT EXISTS sentra.signals (
     
     -- Metadata (JSON)
     mitre_ttps Array(String),
-    compliance_controls Array(String)
+    compliance_controls Array(String),
+
+    -- Ingest time (ms); the latest row of a signal raised again under the same id wins
+    version UInt64
 ) 
-ENGINE = MergeTree()
+ENGINE = ReplacingMergeTree(version)
 PARTITION BY toYYYYMM(timestamp)
-ORDER BY (tenant_id, timestamp, signal_type)
+ORDER BY (tenant_id, timestamp, signal_type, id)
 TTL timestamp + INTERVAL 90 DAY;
 
 -- Aggregated View for Dashboards (Top failed logins)
+-- Counts distinct ids, so a signal raised again is counted once. Read with
+-- uniqMerge(total_count), avgMerge(avg_risk) ... GROUP BY tenant_id, day, signal_type
 CREATE MATERIALIZED VIEW IF NOT EXISTS sentra.daily_risk_metrics
-ENGINE = SummingMergeTree()
+ENGINE = AggregatingMergeTree()
 PARTITION BY toYYYYMM(day)
 ORDER BY (tenant_id, day, signal_type)
 AS SELECT
     tenant_id,
     toStartOfDay(timestamp) AS day,
     signal_type,
-    count() AS total_count,
-    avg(risk_score) AS avg_risk
+    uniqState(id) AS total_count,
+    avgState(risk_score) AS avg_risk
 FROM sentra.signals
 GROUP BY tenant_id, day, signal_type;
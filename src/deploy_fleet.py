@@ -2,6 +2,16 @@ import json
 import subprocess
 import sys
 import os
+import time
+import shutil
+import signal
+import argparse
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from notify import NotificationDispatcher
 
 # Fleet Configuration
 SERVERS = [
@@ -9,63 +19,265 @@ SERVERS = [
     {"host": "115.124.120.143", "port": "5522", "user": "stpi", "name": "braoucloud2"}
 ]
 
-REMOTE_PATH = "/tmp/parse_auth_log.py"
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+REMOTE_DIR = "/tmp"
 OUTPUT_DIR = "reports"
+# The parser and every local module it imports
+PARSER_MODULES = [
+    "parse_auth_log.py", "log_reader.py", "ai_engine.py", "schema.py",
+    "storage.py", "identity.py", "playbooks.py", "columnar.py"
+]
+
+MAX_PARALLEL_HOSTS = 8
+HOST_TIMEOUT = 900        # seconds for deploy + parse + collection on one host
+CONNECT_TIMEOUT = 15
+CONTROL_PERSIST = 60      # seconds an idle master connection is kept open
+
+class HostTimeout(Exception):
+    pass
+
+class FleetTransport(ABC):
+    """
+    How the fleet runner reaches one host: upload the parser, then run a
+    command and stream its stdout back line by line.
+    """
+    remote_dir = REMOTE_DIR
+    python = "python3"
+    sudo = "sudo "
+
+    def __init__(self, server):
+        self.server = server
+
+    def connect(self, timeout):
+        pass
+
+    @abstractmethod
+    def upload(self, paths, timeout):
+        """Copies the local files at paths into remote_dir."""
+        pass
+
+    @abstractmethod
+    def command_argv(self, command):
+        """The argv that runs the shell command on the host."""
+        pass
+
+    def close(self):
+        pass
+
+    def stream_lines(self, command, deadline):
+        """
+        Runs command and yields its stdout lines as they arrive. The process
+        is killed once the deadline (time.monotonic()) passes. Raises
+        HostTimeout, or RuntimeError with the stderr tail on a non-zero exit.
+        """
+        # Own process group, so a timeout also stops whatever the command spawned
+        proc = subprocess.Popen(self.command_argv(command), stdin=subprocess.DEVNULL,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                start_new_session=True)
+        kill = lambda: os.killpg(proc.pid, signal.SIGKILL)
+        stderr_tail = deque(maxlen=20)
+        drain = threading.Thread(target=lambda: stderr_tail.extend(proc.stderr), daemon=True)
+        drain.start()
+        watchdog = threading.Timer(max(0.0, deadline - time.monotonic()), kill)
+        watchdog.start()
+        try:
+            yield from proc.stdout
+            proc.wait()
+        finally:
+            watchdog.cancel()
+            if proc.poll() is None:
+                kill()
+                proc.wait()
+            drain.join(timeout=1)
+        if time.monotonic() >= deadline and proc.returncode != 0:
+            raise HostTimeout("deadline passed while the parser was running")
+        if proc.returncode != 0:
+            raise RuntimeError(f"exit {proc.returncode}: {''.join(stderr_tail).strip()}")
+
+class SSHTransport(FleetTransport):
+    """
+    One multiplexed SSH connection per host: the master connection is
+    opened once and the uploads and the parser run reuse it, so each host
+    costs a single handshake.
+    """
+    def __init__(self, server, control_dir):
+        super().__init__(server)
+        self.target = f"{server['user']}@{server['host']}"
+        self.options = [
+            "-o", "BatchMode=yes",
+            "-o", f"ConnectTimeout={CONNECT_TIMEOUT}",
+            "-o", "ControlMaster=auto",
+            "-o", f"ControlPath={os.path.join(control_dir, '%C')}",
+            "-o", f"ControlPersist={CONTROL_PERSIST}",
+        ]
+
+    def _run(self, argv, timeout):
+        # stderr goes to a file: the backgrounded master would hold a pipe open
+        with tempfile.TemporaryFile(mode="w+") as err:
+            try:
+                subprocess.run(argv, check=True, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                               stderr=err, timeout=max(0.0, timeout))
+            except subprocess.TimeoutExpired:
+                raise HostTimeout(f"{argv[0]} did not finish before the host deadline")
+            except subprocess.CalledProcessError:
+                err.seek(0)
+                raise RuntimeError(f"{argv[0]} failed: {err.read().strip()}")
+
+    def connect(self, timeout):
+        self._run(["ssh", "-p", str(self.server["port"]), *self.options, "-fN", self.target], timeout)
 
-def run_command(cmd):
-    """Executes a shell command and returns output."""
+    def upload(self, paths, timeout):
+        self._run(["scp", "-q", "-P", str(self.server["port"]), *self.options, *paths,
+                   f"{self.target}:{self.remote_dir}/"], timeout)
+
+    def command_argv(self, command):
+        return ["ssh", "-p", str(self.server["port"]), *self.options, self.target, command]
+
+    def close(self):
+        subprocess.run(["ssh", "-p", str(self.server["port"]), *self.options, "-O", "exit", self.target],
+                       stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+class LocalTransport(FleetTransport):
+    """
+    Fake transport for dry runs and tests: each "host" is a directory under
+    root on this machine and commands run through the local shell.
+    """
+    python = sys.executable
+    sudo = ""
+
+    def __init__(self, server, root):
+        super().__init__(server)
+        self.remote_dir = os.path.join(root, server["name"])
+
+    def connect(self, timeout):
+        os.makedirs(self.remote_dir, exist_ok=True)
+
+    def upload(self, paths, timeout):
+        for path in paths:
+            shutil.copy(path, self.remote_dir)
+
+    def command_argv(self, command):
+        return ["sh", "-c", command]
+
+def parser_command(transport, server):
+    """
+    The incremental parser run, with signals streamed to stdout instead of a
+    file. Fleet hosts have no storage engines; the collected reports are the output.
+    """
+    cmd = f"{transport.sudo}{transport.python} {transport.remote_dir}/parse_auth_log.py --incremental --no-store"
+    # Optional per-server overrides of the parser defaults
+    if server.get("input"):
+        cmd += f" --input {server['input']}"
+    if server.get("checkpoint"):
+        cmd += f" --checkpoint {server['checkpoint']}"
+    return cmd
+
+def collect_host(server, transport, host_timeout=HOST_TIMEOUT):
+    """
+    Deploys the parser to one host, runs it and writes the JSON lines it
+    prints to reports/<name>.json. Other stdout (usage logs) is dropped.
+    The report only replaces the previous one once the run succeeded.
+    """
+    start = time.monotonic()
+    deadline = start + host_timeout
+    local_target = os.path.join(OUTPUT_DIR, f"{server['name']}.json")
+    partial = local_target + ".part"
+    result = {"name": server["name"], "ok": False, "signals": 0, "path": local_target}
     try:
-        result = subprocess.run(cmd, shell=True, check=True, capture_output=True, text=True)
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        print(f"Error: {e.stderr}", file=sys.stderr)
-        return None
+        transport.connect(deadline - time.monotonic())
+        print(f"[{server['name']}] Deploying scripts...", file=sys.stderr)
+        transport.upload([os.path.join(SRC_DIR, m) for m in PARSER_MODULES], deadline - time.monotonic())
 
-def deploy_and_run():
+        # --incremental resumes from the remote checkpoint, so only bytes
+        # appended since the last collection are parsed and only new or
+        # updated signals come back.
+        print(f"[{server['name']}] Analyzing logs...", file=sys.stderr)
+        with open(partial, "w") as f:
+            for line in transport.stream_lines(parser_command(transport, server), deadline):
+                if not line.startswith("{"):
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                # Only the signal and summary lines
+                if "signal" in record:
+                    result["signals"] += 1
+                elif "report_type" not in record:
+                    continue
+                f.write(line if line.endswith("\n") else line + "\n")
+        os.replace(partial, local_target)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = str(e) or type(e).__name__
+        if os.path.exists(partial):
+            os.remove(partial)
+    finally:
+        transport.close()
+    result["seconds"] = round(time.monotonic() - start, 1)
+    return result
+
+def collect_fleet(servers, make_transport, max_parallel=MAX_PARALLEL_HOSTS, host_timeout=HOST_TIMEOUT):
+    """Collects every host with at most max_parallel in flight; results are in server order."""
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        futures = [pool.submit(collect_host, server, make_transport(server), host_timeout) for server in servers]
+        results = []
+        for future in futures:
+            result = future.result()
+            if result["ok"]:
+                print(f"[{result['name']}] Done. {result['signals']} signals saved to {result['path']} ({result['seconds']}s)", file=sys.stderr)
+            else:
+                print(f"[{result['name']}] FAILED after {result['seconds']}s: {result['error']}", file=sys.stderr)
+            results.append(result)
+    return results
 
-    for server in SERVERS:
-        print(f"--- Processing {server['name']} ({server['host']}) ---")
-        
-        # 1. SCP the script to the remote server
-        print(f"Deploying scripts to {server['name']}...")
-        scp_cmd = f"scp -P {server['port']} parse_auth_log.py ai_engine.py {server['user']}@{server['host']}:/tmp/"
-        run_command(scp_cmd)
-
-        # 2. Run the script via SSH with sudo
-        print(f"Analyzing logs on {server['name']}...")
-        remote_out = f"/tmp/{server['name']}.json"
-        ssh_cmd = (
-            f"ssh -p {server['port']} {server['user']}@{server['host']} "
-            f"\"sudo rm -f {remote_out} && sudo python3 /tmp/parse_auth_log.py --output {remote_out} > /dev/null\""
-        )
-        run_command(ssh_cmd)
-
-        # 3. Retrieve the resulting JSON
-        print(f"Retrieving signals from {server['name']}...")
-        local_target = os.path.join(OUTPUT_DIR, f"{server['name']}.json")
-        fetch_cmd = f"scp -P {server['port']} {server['user']}@{server['host']}:{remote_out} {local_target}"
-        run_command(fetch_cmd)
-        
-        print(f"Done. Report saved to {local_target}\n")
+def deploy_and_run(servers=SERVERS, transport="ssh", max_parallel=MAX_PARALLEL_HOSTS, host_timeout=HOST_TIMEOUT):
+    print(f"--- Collecting from {len(servers)} servers ({max_parallel} at a time) ---")
+    started = time.monotonic()
+    work_dir = tempfile.mkdtemp(prefix="sentra-")
+    try:
+        if transport == "local":
+            make_transport = lambda server: LocalTransport(server, work_dir)
+        else:
+            make_transport = lambda server: SSHTransport(server, work_dir)
+        results = collect_fleet(servers, make_transport, max_parallel, host_timeout)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    json_files = [r["path"] for r in results if r["ok"]]
+    print(f"Collected {len(json_files)}/{len(servers)} servers in {time.monotonic() - started:.1f}s")
+    if not json_files:
+        return
 
     # 4. Run Aggregation
     print("--- Generating Fleet Summary ---")
-    json_files = [os.path.join(OUTPUT_DIR, f"{s['name']}.json") for s in SERVERS]
-    agg_cmd = f"python3 aggregate_weekly.py {' '.join(json_files)}"
-    subprocess.run(agg_cmd, shell=True)
+    subprocess.run([sys.executable, os.path.join(SRC_DIR, "aggregate_weekly.py"), *json_files])
 
     # 5. Phase 4: Trigger Alerts for high-risk signals
     print("\n--- Phase 4: Checking for Priority Alerts ---")
-    for local_target in json_files:
-        if os.path.exists(local_target):
-            with open(local_target, "r") as f:
-                for line in f:
-                    signal = json.loads(line)
-                    if signal.get("risk_score", 0) >= 0.5:
-                        # Pipe high-risk signal to notify.py
-                        subprocess.run("python3 notify.py", input=line, shell=True, text=True)
+    with NotificationDispatcher() as dispatcher:
+        for local_target in json_files:
+            if os.path.exists(local_target):
+                with open(local_target, "r") as f:
+                    for line in f:
+                        record = json.loads(line)
+                        if record.get("risk_score", 0) >= 0.5:
+                            # Queue high-risk signal for batched Slack/SOAR delivery
+                            dispatcher.submit(record)
+    print(f"Alerts: {dispatcher.stats}")
 
 if __name__ == "__main__":
-    deploy_and_run()
+    parser = argparse.ArgumentParser(description="Sentra fleet collection")
+    parser.add_argument("--servers", help="JSON file with the server list (default: SERVERS)")
+    parser.add_argument("--parallel", type=int, default=MAX_PARALLEL_HOSTS, help="Hosts collected at once")
+    parser.add_argument("--host-timeout", type=float, default=HOST_TIMEOUT, help="Seconds allowed per host")
+    parser.add_argument("--transport", choices=["ssh", "local"], default="ssh",
+                        help="'local' runs each server's parser on this machine (dry runs and tests)")
+    args = parser.parse_args()
+
+    servers = SERVERS
+    if args.servers:
+        with open(args.servers, "r") as f:
+            servers = json.load(f)
+    deploy_and_run(servers, args.transport, args.parallel, args.host_timeout)
@@ -1,7 +1,27 @@
 import zipfile
 import os
 import glob
+import tempfile
 from datetime import datetime
+from columnar import HAS_ARROW, load_signal_file, write_signals_parquet
+
+def add_signal_evidence(zipf, report_paths, arcname="signals_evidence.parquet"):
+    """Merges the signals of every report into a single Parquet file inside the bundle."""
+    signals, summaries = [], []
+    for path in report_paths:
+        try:
+            file_signals, file_summaries = load_signal_file(path)
+        except Exception as e:
+            print(f"Note: could not read signals from {path}: {e}")
+            continue
+        signals.extend(file_signals)
+        summaries.extend(file_summaries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        evidence_path = os.path.join(tmp, arcname)
+        write_signals_parquet(evidence_path, signals, summaries)
+        print(f"Adding: {arcname} ({len(signals)} signals)")
+        zipf.write(evidence_path, arcname)
 
 def create_audit_bundle():
     """
@@ -21,7 +41,7 @@ def create_audit_bundle():
     ]
     
     # Raw Signal Evidence (Proof of Monitoring)
-    raw_reports = glob.glob("reports/*.json")
+    raw_reports = sorted(glob.glob("reports/*.json") + glob.glob("reports/*.parquet"))
     files_to_include.extend(raw_reports)
     
     print(f"--- Generating Audit Evidence Bundle ({bundle_name}) ---")
@@ -33,6 +53,10 @@ def create_audit_bundle():
                 zipf.write(file_path)
             else:
                 print(f"Note: {file_path} not found, skipping.")
+
+        # All evidence as one columnar file an auditor can query directly
+        if raw_reports and HAS_ARROW:
+            add_signal_evidence(zipf, raw_reports)
                 
     print(f"\nSUCCESS: Phase 3 Audit Bundle generated: {bundle_name}")
 
@@ -1,7 +1,14 @@
 import sys
 import json
-import urllib.request
 import os
+import time
+import queue
+import hashlib
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
 # Load local environment variables if present
@@ -10,17 +17,28 @@ load_dotenv()
 SLACK_WEBHOOK_URL = os.environ.get("SENTRA_SLACK_WEBHOOK", "")
 SOAR_WEBHOOK_URL = os.environ.get("SENTRA_SOAR_WEBHOOK", "")
 SOAR_API_KEY = os.environ.get("SENTRA_SOAR_API_KEY", "")
+DEAD_LETTER_FILE = os.environ.get("SENTRA_NOTIFY_DEAD_LETTER", "notify_dead_letter.jsonl")
 
-def send_soar_event(signal):
-    """
-    Phase 4+: SOAR Integration (Shuffle/Tines).
-    Sends a universal JSON payload to a SOAR platform for automated response.
-    """
-    if not SOAR_WEBHOOK_URL:
-        return
+# Dispatcher: signals per Slack message, seconds a batch waits to fill,
+# seconds between Slack posts (incoming webhooks allow about one per second)
+SLACK_BATCH_SIZE = 10
+SLACK_BATCH_WAIT = 2.0
+SLACK_MIN_INTERVAL = 1.0
+SOAR_WORKERS = 4
+NOTIFY_MAX_RETRIES = 3
+NOTIFY_TIMEOUT = 10
+# Longest wait a Retry-After header is honoured for, in seconds
+NOTIFY_MAX_RETRY_AFTER = 60
+
+# Keep-alive connections shared by every sender in this process
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_maxsize=SOAR_WORKERS + 1))
+_session.mount("http://", HTTPAdapter(pool_maxsize=SOAR_WORKERS + 1))
 
+def soar_payload(signal):
+    """Universal SOAR envelope for one signal (see integrations/SOAR_INTEGRATION.md)."""
     # Metadata for SOAR routing and orchestration
-    payload = {
+    return {
         "event_type": "sentra_security_signal",
         "timestamp_utc": signal.get("timestamp"),
         "severity": "CRITICAL" if signal.get("risk_score", 0) >= 0.7 else "HIGH",
@@ -32,15 +50,56 @@ def send_soar_event(signal):
         }
     }
 
+def slack_attachment(signal):
+    return {
+        "color": "#e01e5a" if signal.get('risk_score', 0) > 0.5 else "#ecb22e",
+        "fields": [
+            {"title": "Type", "value": signal.get('signal'), "short": True},
+            {"title": "User", "value": signal.get('user'), "short": True},
+            {"title": "Risk Score", "value": str(signal.get('risk_score')), "short": True},
+            {"title": "Narrative", "value": signal.get('narrative'), "short": False},
+            {"title": "Recommended Action", "value": signal.get('recommendation'), "short": False}
+        ],
+        "footer": "Sentra AI-Native MSOC"
+    }
+
+def slack_payload(signals):
+    """One Slack message for one or more signals, an attachment each."""
+    if len(signals) == 1:
+        text = f"🚨 *Sentra Priority Signal Detected on {signals[0].get('hostname')}*"
+    else:
+        hosts = sorted({str(s.get('hostname')) for s in signals})
+        text = f"🚨 *Sentra: {len(signals)} Priority Signals Detected on {', '.join(hosts)}*"
+    return {"text": text, "attachments": [slack_attachment(s) for s in signals]}
+
+def print_notification(signal):
+    # Fallback to stdout if no webhook is configured
+    print(f"--- NOTIFICATION ALERT ---")
+    print(f"Signal: {signal.get('signal')}")
+    print(f"Narrative: {signal.get('narrative')}")
+    print(f"Recommendation: {signal.get('recommendation')}")
+    print(f"--------------------------")
+
+def _post(url, payload, headers=None):
+    response = _session.post(url, json=payload, headers=headers, timeout=NOTIFY_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+def _soar_headers():
+    return {"X-API-Key": SOAR_API_KEY} if SOAR_API_KEY else None
+
+def send_soar_event(signal):
+    """
+    Phase 4+: SOAR Integration (Shuffle/Tines).
+    Sends a universal JSON payload to a SOAR platform for automated response.
+    """
+    if not SOAR_WEBHOOK_URL:
+        return
+
     try:
-        req = urllib.request.Request(SOAR_WEBHOOK_URL)
-        req.add_header('Content-Type', 'application/json')
-        if SOAR_API_KEY:
-            req.add_header('X-API-Key', SOAR_API_KEY)
-            
-        with urllib.request.urlopen(req, data=json.dumps(payload).encode('utf-8')) as response:
-            print(f"SOAR event sent successfully: {SOAR_WEBHOOK_URL}")
-            return response.read()
+        content = _post(SOAR_WEBHOOK_URL, soar_payload(signal), _soar_headers())
+        print(f"SOAR event sent successfully: {SOAR_WEBHOOK_URL}")
+        return content
     except Exception as e:
         print(f"Error sending SOAR event: {e}", file=sys.stderr)
 
@@ -50,45 +109,199 @@ def send_slack_notification(signal):
     Sends a formatted alert to a Slack webhook for 'Action Recommended' signals.
     """
     if not SLACK_WEBHOOK_URL:
-        # Fallback to stdout if no webhook is configured
-        print(f"--- NOTIFICATION ALERT ---")
-        print(f"Signal: {signal.get('signal')}")
-        print(f"Narrative: {signal.get('narrative')}")
-        print(f"Recommendation: {signal.get('recommendation')}")
-        print(f"--------------------------")
+        print_notification(signal)
         return
 
-    payload = {
-        "text": f"🚨 *Sentra Priority Signal Detected on {signal.get('hostname')}*",
-        "attachments": [
-            {
-                "color": "#e01e5a" if signal.get('risk_score', 0) > 0.5 else "#ecb22e",
-                "fields": [
-                    {"title": "Type", "value": signal.get('signal'), "short": True},
-                    {"title": "User", "value": signal.get('user'), "short": True},
-                    {"title": "Risk Score", "value": str(signal.get('risk_score')), "short": True},
-                    {"title": "Narrative", "value": signal.get('narrative'), "short": False},
-                    {"title": "Recommended Action", "value": signal.get('recommendation'), "short": False}
-                ],
-                "footer": "Sentra AI-Native MSOC"
-            }
-        ]
-    }
-
     try:
-        req = urllib.request.Request(SLACK_WEBHOOK_URL)
-        req.add_header('Content-Type', 'application/json')
-        with urllib.request.urlopen(req, data=json.dumps(payload).encode('utf-8')) as response:
-            return response.read()
+        return _post(SLACK_WEBHOOK_URL, slack_payload([signal]))
     except Exception as e:
         print(f"Error sending Slack notification: {e}", file=sys.stderr)
 
+def should_notify(data):
+    return data.get("overall_risk") == "Action Recommended" or data.get("risk_score", 0) >= 0.5
+
+def retry_after_seconds(value, default):
+    """
+    Seconds to wait from a Retry-After header, which holds either
+    delta-seconds or an HTTP-date; default when it is missing or unreadable.
+    """
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            return default
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        seconds = (when - datetime.now(timezone.utc)).total_seconds()
+    return min(max(0.0, seconds), NOTIFY_MAX_RETRY_AFTER)
+
+def signal_key(signal):
+    """Dedupe key: the signal id, or a hash of the signal when it has none."""
+    if signal.get("id"):
+        return signal["id"]
+    return hashlib.sha256(json.dumps(signal, sort_keys=True).encode("utf-8")).hexdigest()
+
+class NotificationDispatcher:
+    """
+    In-process notification delivery. submit() only queues the signal:
+    a Slack thread groups queued signals into one message per
+    SLACK_MIN_INTERVAL, and SOAR worker threads post one event each. Both
+    reuse keep-alive connections. Failed posts are retried with backoff
+    (honouring Retry-After on 429), then appended to the dead-letter file.
+    A signal id is only delivered once per dispatcher.
+    """
+    _STOP = object()
+
+    def __init__(self, slack_url=None, soar_url=None, batch_size=SLACK_BATCH_SIZE, batch_wait=SLACK_BATCH_WAIT,
+                 min_interval=SLACK_MIN_INTERVAL, soar_workers=SOAR_WORKERS, max_retries=NOTIFY_MAX_RETRIES,
+                 retry_backoff=1.0, dead_letter_path=DEAD_LETTER_FILE):
+        self.slack_url = SLACK_WEBHOOK_URL if slack_url is None else slack_url
+        self.soar_url = SOAR_WEBHOOK_URL if soar_url is None else soar_url
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.dead_letter_path = dead_letter_path
+        self.seen = set()
+        self.lock = threading.Lock()
+        self.stats = {"submitted": 0, "duplicates": 0, "slack_messages": 0, "soar_events": 0,
+                      "retries": 0, "dead_lettered": 0}
+        self.slack_queue = queue.Queue()
+        self.soar_queue = queue.Queue()
+        self.threads = [threading.Thread(target=self._slack_worker, daemon=True)]
+        if self.soar_url:
+            self.threads += [threading.Thread(target=self._soar_worker, daemon=True) for _ in range(soar_workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, signal):
+        """Queues a signal for delivery; returns False if its id was already submitted."""
+        key = signal_key(signal)
+        with self.lock:
+            if key in self.seen:
+                self.stats["duplicates"] += 1
+                return False
+            self.seen.add(key)
+            self.stats["submitted"] += 1
+        self.slack_queue.put(signal)
+        if self.soar_url:
+            self.soar_queue.put(signal)
+        return True
+
+    def close(self):
+        """Delivers everything queued, then stops the workers."""
+        self.slack_queue.put(self._STOP)
+        for _ in self.threads[1:]:
+            self.soar_queue.put(self._STOP)
+        for thread in self.threads:
+            thread.join()
+
+    def _count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def _deliver(self, channel, url, payload, headers=None):
+        """Posts with retries; returns True once delivered."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = _session.post(url, json=payload, headers=headers, timeout=NOTIFY_TIMEOUT)
+                if response.status_code == 429 or response.status_code >= 500:
+                    error = f"HTTP {response.status_code}"
+                    delay = retry_after_seconds(response.headers.get("Retry-After"), self.retry_backoff * (2 ** attempt))
+                else:
+                    response.raise_for_status()
+                    return True
+            except requests.HTTPError as e:
+                # Other 4xx: the payload itself was refused, retrying will not help
+                error = str(e)
+                break
+            except requests.RequestException as e:
+                error = str(e)
+                delay = self.retry_backoff * (2 ** attempt)
+            if attempt < self.max_retries:
+                self._count("retries")
+                time.sleep(delay)
+        self._dead_letter(channel, payload, error)
+        return False
+
+    def _dead_letter(self, channel, payload, error):
+        print(f"[Notify] {channel} delivery failed, written to {self.dead_letter_path}: {error}", file=sys.stderr)
+        entry = {"channel": channel, "failed_at": datetime.now().isoformat(), "error": error, "payload": payload}
+        with self.lock:
+            self.stats["dead_lettered"] += 1
+            with open(self.dead_letter_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def _next_batch(self):
+        """Blocks for one signal, then gathers more for up to batch_wait seconds."""
+        first = self.slack_queue.get()
+        if first is self._STOP:
+            return None, True
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                item = self.slack_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _slack_worker(self):
+        last_post = 0.0
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if not batch:
+                continue
+            # One bad batch must not stop the worker and strand the queue
+            try:
+                if not self.slack_url:
+                    for signal in batch:
+                        print_notification(signal)
+                    continue
+                time.sleep(max(0.0, last_post + self.min_interval - time.monotonic()))
+                if self._deliver("slack", self.slack_url, slack_payload(batch)):
+                    self._count("slack_messages")
+                last_post = time.monotonic()
+            except Exception as e:
+                print(f"[Notify] Slack batch of {len(batch)} signals failed: {e}", file=sys.stderr)
+
+    def _soar_worker(self):
+        while True:
+            signal = self.soar_queue.get()
+            if signal is self._STOP:
+                return
+            try:
+                if self._deliver("soar", self.soar_url, soar_payload(signal), _soar_headers()):
+                    self._count("soar_events")
+            except Exception as e:
+                print(f"[Notify] SOAR event for {signal_key(signal)} failed: {e}", file=sys.stderr)
+
 if __name__ == "__main__":
-    # Can be called with a JSON signal on stdin
+    # Can be called with a JSON signal, or JSON lines, on stdin
     try:
-        data = json.load(sys.stdin)
-        if data.get("overall_risk") == "Action Recommended" or data.get("risk_score", 0) >= 0.5:
-            send_slack_notification(data)
-            send_soar_event(data)
+        raw = sys.stdin.read()
+        try:
+            records = [json.loads(raw)]
+        except ValueError:
+            records = [json.loads(line) for line in raw.splitlines() if line.strip()]
+        with NotificationDispatcher() as dispatcher:
+            for data in records:
+                if should_notify(data):
+                    dispatcher.submit(data)
     except Exception as e:
         print(f"Error: {e}")
@@ -1,17 +1,22 @@
+import os
 import sys
 import json
 import re
 import argparse
+import bisect
 import hashlib
+import heapq
 from datetime import datetime
-from ai_engine import AIEngine
-from schema import (
-    SecuritySignal, UserEntity, HostEntity, 
-    ProcessEntity, NetworkEntity, ComplianceTag
-)
+from functools import lru_cache
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from ai_engine import AIEngine, AI_BATCH_SIZE, AI_MAX_CONCURRENCY, AI_REQUEST_TIMEOUT
+from schema import SignalRecord
 from storage import StorageFactory
 from identity import IdentityService
 from playbooks import PlaybookEngine
+from log_reader import iter_log_lines, is_compressed, TailCheckpoint, plan_incremental_reads
+from columnar import is_parquet, write_signals_parquet
 
 # Phase 3: Enrichment & Compliance Mapping
 COMMAND_INTENT_MAP = {
@@ -53,17 +58,58 @@ COMMAND_INTENT_MAP = {
     }
 }
 
+DEFAULT_COMMAND_INTENT = {
+    'intent': 'General Administration', 
+    'mitre': 'N/A', 
+    'compliance': 'N/A', 
+    'risk_weight': 0.0
+}
+COMMAND_CACHE_SIZE = 4096
+# JSON file of extra {pattern: metadata} rules, checked before the built-in map
+COMMAND_RULES_ENV = "SENTRA_COMMAND_RULES"
+
+class CommandClassifier:
+    """
+    All intent patterns compiled into one regex. Each rule is a lookahead
+    over the whole command and the alternatives are tried in rule order, so
+    the first rule matching anywhere wins, exactly like calling re.search
+    per pattern. Results for repeated commands come from a bounded LRU.
+    """
+    def __init__(self, rules, cache_size=COMMAND_CACHE_SIZE):
+        self.rules = list(rules.items())
+        for pattern, _ in self.rules:
+            re.compile(pattern)  # report a bad rule on its own
+        self.regex = re.compile("|".join(
+            rf"(?=[\s\S]*?(?:{pattern}))(?P<r{i}>)" for i, (pattern, _) in enumerate(self.rules)
+        ))
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    def _classify(self, command):
+        match = self.regex.match(command) if self.rules else None
+        if match is None:
+            return DEFAULT_COMMAND_INTENT
+        return self.rules[int(match.lastgroup[1:])][1]
+
+def load_command_rules(path):
+    """Extra {pattern: metadata} rules from a JSON file; they take precedence over COMMAND_INTENT_MAP."""
+    global _command_classifier
+    with open(path, "r") as f:
+        extra = json.load(f)
+    for pattern, metadata in extra.items():
+        missing = set(DEFAULT_COMMAND_INTENT) - set(metadata)
+        if missing:
+            raise ValueError(f"Command rule {pattern!r} is missing {sorted(missing)}")
+    rules = dict(extra)
+    rules.update((p, m) for p, m in COMMAND_INTENT_MAP.items() if p not in extra)
+    _command_classifier = CommandClassifier(rules)
+
+_command_classifier = CommandClassifier(COMMAND_INTENT_MAP)
+if os.environ.get(COMMAND_RULES_ENV):
+    load_command_rules(os.environ[COMMAND_RULES_ENV])
+
 def categorize_command(command):
     """Maps a command to its intent and compliance tags."""
-    for pattern, metadata in COMMAND_INTENT_MAP.items():
-        if re.search(pattern, command):
-            return metadata
-    return {
-        'intent': 'General Administration', 
-        'mitre': 'N/A', 
-        'compliance': 'N/A', 
-        'risk_weight': 0.0
-    }
+    return _command_classifier.classify(command)
 
 def parse_timestamp(ts_str):
     try:
@@ -75,238 +121,224 @@ def parse_timestamp(ts_str):
         except:
             return None
 
+# Parser engine: envelope and per-message patterns are compiled once at import
+# time, and each syslog program is dispatched straight to its extractor.
+SYSLOG_PATTERN = re.compile(
+    r'^(?P<timestamp>\S+)\s+'
+    r'(?P<hostname>\S+)\s+'
+    r'(?P<program>[^\[:]+)(?:\[\d+\])?:\s+'
+    r'(?P<message>.*)$'
+)
+SSH_FOR_FROM_PATTERN = re.compile(r'for\s+(\S+)\s+from\s+(\S+)')
+SSH_FAILURE_PATTERN = re.compile(r'for\s+(?:invalid user\s+)?(\S+)\s+from\s+(\S+)')
+SSH_INVALID_USER_PATTERN = re.compile(r'Invalid user\s+(\S+)\s+from\s+(\S+)')
+SUDO_USER_PATTERN = re.compile(r'^\s*(\S+)\s+:')
+SUDO_COMMAND_PATTERN = re.compile(r'COMMAND=(.*)')
+PAM_USER_PATTERN = re.compile(r'user=(\S+)')
+SU_SESSION_PATTERN = re.compile(r'user\s+(\S+)\s+by\s+(\S+)\(')
+
+IAM_PROGRAMS = ('useradd', 'usermod', 'userdel', 'groupadd', 'groupmod', 'groupdel', 'chage')
+
+def _extract_sshd(dt, hostname, message, program):
+    if 'Accepted publickey' in message:
+        match = SSH_FOR_FROM_PATTERN.search(message)
+        if match:
+            return {
+                "type": "ssh_login",
+                "timestamp": dt,
+                "hostname": hostname,
+                "user": match.group(1),
+                "ip": match.group(2)
+            }
+    elif 'Failed password' in message or 'Invalid user' in message:
+        match = SSH_FAILURE_PATTERN.search(message)
+        if not match:
+            match = SSH_INVALID_USER_PATTERN.search(message)
+        if match:
+            return {
+                "type": "ssh_failure",
+                "timestamp": dt,
+                "hostname": hostname,
+                "user": match.group(1),
+                "ip": match.group(2)
+            }
+    return None
+
+def _extract_sudo(dt, hostname, message, program):
+    if 'COMMAND=' in message and 'USER=root' in message:
+        user_match = SUDO_USER_PATTERN.search(message)
+        cmd_match = SUDO_COMMAND_PATTERN.search(message)
+        if user_match and cmd_match:
+            return {
+                "type": "privilege_escalation",
+                "timestamp": dt,
+                "hostname": hostname,
+                "user": user_match.group(1),
+                "command": cmd_match.group(1).strip()
+            }
+    elif 'authentication failure' in message or 'conversation failed' in message:
+        # Example: stpi : pam_unix(sudo:auth): authentication failure; logname=... user=stpi
+        # Or: stpi : pam_unix(sudo:auth): conversation failed
+        user_match = PAM_USER_PATTERN.search(message)
+        if not user_match:
+            user_match = SUDO_USER_PATTERN.search(message)
+
+        if user_match:
+            return {
+                "type": "auth_failure",
+                "timestamp": dt,
+                "hostname": hostname,
+                "user": user_match.group(1),
+                "source": "sudo",
+                "confidence": "high"
+            }
+    return None
+
+def _extract_su(dt, hostname, message, program):
+    if 'session opened for user' in message:
+        # Example: pam_unix(su:session): session opened for user root by stpi(uid=1000)
+        match = SU_SESSION_PATTERN.search(message)
+        if match:
+            return {
+                "type": "privilege_escalation",
+                "timestamp": dt,
+                "hostname": hostname,
+                "user": match.group(2),
+                "target_user": match.group(1),
+                "command": f"su to {match.group(1)}",
+                "source": "su",
+                "confidence": "medium" 
+            }
+    elif 'authentication failure' in message:
+        # Example: pam_unix(su:auth): authentication failure; logname=... user=root
+        user_match = PAM_USER_PATTERN.search(message)
+        if user_match:
+            return {
+                "type": "auth_failure",
+                "timestamp": dt,
+                "hostname": hostname,
+                "user": user_match.group(1),
+                "source": "su",
+                "confidence": "high"
+            }
+    return None
+
+def _extract_iam(dt, hostname, message, program):
+    # 3) iam_change: user and group management
+    return {
+        "type": "iam_change",
+        "timestamp": dt,
+        "hostname": hostname,
+        "user": "root", # These usually run as root/sudo
+        "program": program,
+        "message": message,
+        "confidence": "high"
+    }
+
+PROGRAM_EXTRACTORS = {
+    'sshd': _extract_sshd,
+    'sudo': _extract_sudo,
+    'su': _extract_su,
+}
+PROGRAM_EXTRACTORS.update({program: _extract_iam for program in IAM_PROGRAMS})
+
 def parse_line(line):
     line = line.strip()
     if not line:
         return None
 
-    syslog_pattern = re.compile(
-        r'^(?P<timestamp>\S+)\s+'
-        r'(?P<hostname>\S+)\s+'
-        r'(?P<program>[^\[:]+)(?:\[\d+\])?:\s+'
-        r'(?P<message>.*)$'
-    )
-
-    match = syslog_pattern.match(line)
+    match = SYSLOG_PATTERN.match(line)
     if not match:
         return None
 
-    data = match.groupdict()
-    program = data['program'].strip()
-    message = data['message']
-    
-    dt = parse_timestamp(data['timestamp'])
-    if not dt:
-        return None
+    timestamp, hostname, program, message = match.groups()
+    program = program.strip()
 
-    if program == 'sshd':
-        if 'Accepted publickey' in message:
-            match = re.search(r'for\s+(\S+)\s+from\s+(\S+)', message)
-            if match:
-                return {
-                    "type": "ssh_login",
-                    "timestamp": dt,
-                    "hostname": data['hostname'],
-                    "user": match.group(1),
-                    "ip": match.group(2)
-                }
-        elif 'Failed password' in message or 'Invalid user' in message:
-            match = re.search(r'for\s+(?:invalid user\s+)?(\S+)\s+from\s+(\S+)', message)
-            if not match:
-                match = re.search(r'Invalid user\s+(\S+)\s+from\s+(\S+)', message)
-            if match:
-                return {
-                    "type": "ssh_failure",
-                    "timestamp": dt,
-                    "hostname": data['hostname'],
-                    "user": match.group(1),
-                    "ip": match.group(2)
-                }
-
-    if program == 'sudo':
-        if 'COMMAND=' in message and 'USER=root' in message:
-            user_match = re.search(r'^\s*(\S+)\s+:', message)
-            cmd_match = re.search(r'COMMAND=(.*)', message)
-            if user_match and cmd_match:
-                return {
-                    "type": "privilege_escalation",
-                    "timestamp": dt,
-                    "hostname": data['hostname'],
-                    "user": user_match.group(1),
-                    "command": cmd_match.group(1).strip()
-                }
-
-    return None
+    # Unknown programs (cron, systemd, kernel...) are rejected before the
+    # comparatively expensive timestamp parse.
+    extractor = PROGRAM_EXTRACTORS.get(program)
+    if extractor is None:
+        return None
 
-def calculate_risk_score(signal_type, severity):
-    sev_map = {"Low": 0.1, "Medium": 0.4, "High": 0.7, "Critical": 0.9}
-    return sev_map.get(severity, 0.1)
+    dt = parse_timestamp(timestamp)
+    if not dt:
+        return None
 
-def enrich_signal_with_ai(signal: SecuritySignal):
-    engine = AIEngine()
-    pb_engine = PlaybookEngine()
-    
-    # AI Enrichment
-    context = signal.model_dump()
-    narrative, recommendation, confidence = engine.consult_ai(
-        signal.tenant_id, signal.signal_type, context
-    )
-    
-    if narrative:
-        signal.narrative = narrative
-    if recommendation:
-        signal.recommendation = recommendation
-    if confidence:
-        signal.ai_confidence = confidence
-    
-    # Playbook Recommendations (Phase 3 Prep)
-    playbooks = pb_engine.get_recommendations(signal.signal_type, signal.risk_score)
-    signal.recommended_playbooks = [pb.id for pb in playbooks]
-    
-    # Model info for drift tracking
-    signal.model_info = {"model": "gpt-4o", "provider": "openai"}
-    
-    # Vector Indexing
-    engine.index_signal(signal.tenant_id, signal.model_dump())
-    
-    return signal
+    return extractor(dt, hostname, message, program)
 
-def main():
-    parser = argparse.ArgumentParser(description="Sentra Security Log Parser - Phase 0 mSOC")
-    parser.add_argument("--input", default="/var/log/auth.log", help="Path to auth.log file")
-    parser.add_argument("--tenant-id", default="default-tenant", help="Tenant ID for mSOC isolation")
-    parser.add_argument("--output", help="Optional path to save JSON signals")
-    args = parser.parse_args()
+def generate_signal_id(signal_type, timestamp, hostname, user, detail=None):
+    """
+    Deterministic signal id so re-runs over the same window map to the same signal.
+    detail separates signals that share the rest of the key (the attacking ip
+    of a brute-force burst, the source of an auth failure).
+    """
+    key = f"{signal_type}|{timestamp}|{hostname}|{user}"
+    if detail:
+        key += f"|{detail}"
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return digest[:12]
 
-    signals = []
-    
-    # Initialize Storage Engines
-    ch_storage = StorageFactory.get_storage("ClickHouse")
-    es_storage = StorageFactory.get_storage("Elastic")
-    
-    # Simulated simple parsing and signal generation for Phase 0 demonstration
-    try:
-        with open(args.input, 'r') as f:
-            for line in f:
-                event = parse_line(line)
-                if not event:
-                    continue
-                
-                # Convert event to SecuritySignal Pydantic model
-                user_idp = IdentityService.resolve_user(event['user'])
-                user_entity = UserEntity(
-                    username=event['user'],
-                    org_identity=user_idp["org_identity"],
-                    job_role=user_idp["job_role"]
-                )
-
-                if event['type'] == 'ssh_login':
-                    signal = SecuritySignal(
-                        tenant_id=args.tenant_id,
-                        signal_type="ssh_login",
-                        severity="Low",
-                        user=user_entity,
-                        host=HostEntity(hostname=event['hostname'], ip=event['ip']),
-                        network=NetworkEntity(source_ip=event['ip'])
-                    )
-                elif event['type'] == 'privilege_escalation':
-                    meta = categorize_command(event['command'])
-                    severity = "Medium" if meta['risk_weight'] < 0.5 else "High"
-                    signal = SecuritySignal(
-                        tenant_id=args.tenant_id,
-                        signal_type="privilege_escalation",
-                        severity=severity,
-                        user=user_entity,
-                        host=HostEntity(hostname=event['hostname']),
-                        process=ProcessEntity(name=event['command']),
-                        compliance_tags=[ComplianceTag(
-                            framework="SOC2", 
-                            control_id=meta['compliance']
-                        )] if meta['compliance'] != 'N/A' else []
-                    )
-                else:
-                    continue
-
-                signal.risk_score = calculate_risk_score(signal.signal_type, signal.severity)
-                enriched_signal = enrich_signal_with_ai(signal)
-                
-                # Ingest into persistent storage (Phase 2)
-                ch_storage.ingest(enriched_signal)
-                es_storage.ingest(enriched_signal)
-                
-                signals.append(enriched_signal)
-                print(enriched_signal.to_json())
-
-        if args.output:
-            with open(args.output, 'w') as f:
-                for s in signals:
-                    f.write(s.to_json() + "\n")
+DEFAULT_CHECKPOINT = "/var/tmp/sentra_auth_checkpoint.json"
 
-    except Exception as e:
-        print(f"Error: {e}")
+# Multiprocess ingestion: the log is split at newline boundaries and each
+# chunk is parsed in its own worker process. Lines are read through
+# log_reader, which drops non-auth programs before decoding.
+CHUNKS_PER_WORKER = 4
 
-if __name__ == "__main__":
-    main()
+def split_into_chunks(path, n_chunks, start=0, end=None):
+    """Returns (start, end) byte ranges covering [start, end) of path, each ending on a newline boundary."""
+    size = os.path.getsize(path) if end is None else end
+    offsets = [start]
+    with open(path, 'rb') as f:
+        for i in range(1, n_chunks):
+            target = start + (size - start) * i // n_chunks
+            if target <= offsets[-1]:
+                continue
+            f.seek(target)
+            f.readline()  # The line straddling the target belongs to the previous chunk
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > offsets[-1]:
+                offsets.append(pos)
+    offsets.append(size)
+    return [(lo, hi) for lo, hi in zip(offsets, offsets[1:]) if hi > lo]
 
-        elif 'authentication failure' in message or 'conversation failed' in message:
-            # Example: stpi : pam_unix(sudo:auth): authentication failure; logname=... user=stpi
-            # Or: stpi : pam_unix(sudo:auth): conversation failed
-            user_match = re.search(r'user=(\S+)', message)
-            if not user_match:
-                user_match = re.search(r'^\s*(\S+)\s+:', message)
-            
-            if user_match:
-                return {
-                    "type": "auth_failure",
-                    "timestamp": dt,
-                    "hostname": data['hostname'],
-                    "user": user_match.group(1),
-                    "source": "sudo",
-                    "confidence": "high"
-                }
-    
-    if program == 'su':
-        if 'session opened for user' in message:
-            # Example: pam_unix(su:session): session opened for user root by stpi(uid=1000)
-            match = re.search(r'user\s+(\S+)\s+by\s+(\S+)\(', message)
-            if match:
-                return {
-                    "type": "privilege_escalation",
-                    "timestamp": dt,
-                    "hostname": data['hostname'],
-                    "user": match.group(2),
-                    "target_user": match.group(1),
-                    "command": f"su to {match.group(1)}",
-                    "source": "su",
-                    "confidence": "medium" 
-                }
-        elif 'authentication failure' in message:
-            # Example: pam_unix(su:auth): authentication failure; logname=... user=root
-            user_match = re.search(r'user=(\S+)', message)
-            if user_match:
-                return {
-                    "type": "auth_failure",
-                    "timestamp": dt,
-                    "hostname": data['hostname'],
-                    "user": user_match.group(1),
-                    "source": "su",
-                    "confidence": "high"
-                }
+def _parse_chunk_events(path, start, end, event_types):
+    events = []
+    for line in iter_log_lines(path, PROGRAM_EXTRACTORS, start, end):
+        event = parse_line(line)
+        if event and event['type'] in event_types:
+            events.append(event)
+    return events
 
-    # 3) iam_change: user and group management
-    iam_programs = ['useradd', 'usermod', 'userdel', 'groupadd', 'groupmod', 'groupdel', 'chage']
-    if program in iam_programs:
-        return {
-            "type": "iam_change",
-            "timestamp": dt,
-            "hostname": data['hostname'],
-            "user": "root", # These usually run as root/sudo
-            "program": program,
-            "message": message,
-            "confidence": "high"
-        }
+def iter_parsed_events(path, workers=1, event_types=None, start=0, end=None):
+    """
+    Yields parsed events from the [start, end) byte range of path in file
+    order. With workers > 1 the chunks are parsed in a process pool; only
+    events whose type is in event_types are shipped back from the workers.
+    """
+    # Compressed rotations cannot be split by byte offset and are parsed serially
+    if workers <= 1 or is_compressed(path):
+        for line in iter_log_lines(path, PROGRAM_EXTRACTORS, start, end):
+            event = parse_line(line)
+            if event and (event_types is None or event['type'] in event_types):
+                yield event
+        return
 
-    return None
+    event_types = frozenset(event_types) if event_types is not None else frozenset(
+        ['ssh_login', 'ssh_failure', 'privilege_escalation', 'auth_failure', 'iam_change']
+    )
+    chunks = split_into_chunks(path, workers * CHUNKS_PER_WORKER, start, end)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for events in pool.map(
+            _parse_chunk_events,
+            [path] * len(chunks),
+            [start for start, _ in chunks],
+            [end for _, end in chunks],
+            [event_types] * len(chunks)
+        ):
+            yield from events
 
 def calculate_risk_score(signal_type, data):
     """
@@ -338,14 +370,36 @@ def calculate_risk_score(signal_type, data):
     
     return round(min(score * multiplier, 1.0), 2)
 
-def enrich_signal_with_ai(signal_type, signal_data):
+def enrich_signal_with_ai(signal_type, signal_data, tenant_id="default-tenant"):
     """
     Attempts to enrich the signal using LLM insight, falling back to 
     deterministic templates if necessary. Also indexes the signal in Vector DB.
     """
     # 1. Try AI enrichment
-    ai_narrative, ai_rec = AIEngine.consult_ai(signal_type, signal_data)
-    
+    ai_narrative, ai_rec, _ = AIEngine().consult_ai(tenant_id, signal_type, signal_data)
+    return apply_enrichment(signal_type, signal_data, ai_narrative, ai_rec, tenant_id)
+
+def enrich_signals_with_ai(signals, tenant_id="default-tenant", batch_size=AI_BATCH_SIZE,
+                           max_concurrency=AI_MAX_CONCURRENCY, timeout=AI_REQUEST_TIMEOUT):
+    """
+    Batched enrich_signal_with_ai: several signals share one LLM prompt and a
+    bounded number of prompts run concurrently. Signals whose prompt fails or
+    misses its deadline get the deterministic narrative instead.
+    """
+    answers = AIEngine().consult_ai_batch(
+        tenant_id, [(s["signal"], s) for s in signals], batch_size, max_concurrency, timeout
+    )
+    return [
+        apply_enrichment(signal_data["signal"], signal_data, ai_narrative, ai_rec, tenant_id)
+        for signal_data, (ai_narrative, ai_rec, _) in zip(signals, answers)
+    ]
+
+@lru_cache(maxsize=1)
+def playbook_engine():
+    return PlaybookEngine()
+
+def apply_enrichment(signal_type, signal_data, ai_narrative, ai_rec, tenant_id="default-tenant"):
+    """Stores the AI answer, or the deterministic templates where there is none."""
     if ai_narrative:
         signal_data["narrative"] = ai_narrative
     else:
@@ -355,10 +409,17 @@ def enrich_signal_with_ai(signal_type, signal_data):
         signal_data["recommendation"] = ai_rec
     else:
         signal_data["recommendation"] = generate_recommendation(signal_type, signal_data)
+
+    # Organizational identity of the user and the playbooks the signal triggers
+    identity = IdentityService.resolve_user(signal_data.get("user"))
+    signal_data.update({k: v for k, v in identity.items() if v})
+    playbooks = playbook_engine().get_recommendations(signal_type, signal_data.get("risk_score", 0.0))
+    if playbooks:
+        signal_data["recommended_playbooks"] = [pb.id for pb in playbooks]
     
     # 2. Index in Vector DB for correlation (Phase 2)
     try:
-        AIEngine.index_signal(signal_data)
+        AIEngine().index_signal(tenant_id, signal_data)
     except Exception as e:
         # Silently fail if DB is not available
         pass
@@ -538,207 +599,479 @@ def generate_multi_server_summary(summaries):
     }
     return summary
 
+# Windowed aggregation: tumbling windows in event time. A window closes once
+# the watermark (newest event time seen) passes its end plus the allowed
+# lateness; it is then emitted and evicted, so memory is bounded by the open
+# windows instead of the length of the log.
+WINDOW_SIZES = {
+    "ssh_access_groups": 3600,   # (user, host, window) -> set of IPs
+    "priv_groups": 600,          # (user, host, window) -> [commands]
+    "auth_failure_groups": 600   # (user, source, host, window) -> count
+}
+DEFAULT_ALLOWED_LATENESS = 300
+BRUTE_FORCE_THRESHOLD = 3
+BRUTE_FORCE_WINDOW = 3600
+
+def build_command_entry(event):
+    """Classifies a privilege escalation command (Phase 3) for its 10-min window."""
+    cmd = event['command']
+    meta = categorize_command(cmd)
+    return {
+        "command": cmd,
+        "risk": "high" if meta['risk_weight'] >= 0.4 else "normal",
+        "intent": meta['intent'],
+        "mitre": meta['mitre'],
+        "compliance": meta['compliance'],
+        "risk_weight": meta['risk_weight'],
+        "source": event.get("source", "unknown"),
+        "confidence": event.get("confidence", "high")
+    }
+
+class BruteForceDetector:
+    """
+    Sliding-window SSH brute-force detection per (user, ip, host). Each key
+    holds a deque of its failure times still inside the window, so a burst
+    is caught regardless of hour boundaries. A signal is raised the moment
+    the count reaches the threshold, in O(1) amortized time per event:
+    every timestamp is appended and expired exactly once, and idle keys are
+    evicted least recently active first. Failures that keep the burst going
+    are counted on its open incident, and once the burst ends (or on flush)
+    the signal is raised again with the same first_seen and the real
+    failure_count.
+    """
+    def __init__(self, threshold=BRUTE_FORCE_THRESHOLD, window_seconds=BRUTE_FORCE_WINDOW):
+        self.threshold = threshold
+        self.window_seconds = window_seconds
+        self.failures = OrderedDict()  # (user, ip, host) -> deque of failure times, least recently active first
+        self.alerted = {}              # key -> open incident {"first_seen", "failure_count", "reported"}
+        self.latest = None
+
+    def add(self, event):
+        """Records one ssh_failure event; returns the (key, alert) incidents it raised or updated."""
+        ts = event['timestamp'].timestamp()
+        if self.latest is None or ts > self.latest:
+            self.latest = ts
+        horizon = self.latest - self.window_seconds
+        alerts = self._evict_idle(horizon)
+        if ts <= horizon:
+            return alerts
+
+        key = (event['user'], event['ip'], event['hostname'])
+        times = self.failures.get(key)
+        if times is None:
+            times = self.failures[key] = deque()
+        else:
+            self.failures.move_to_end(key)
+
+        if times and ts < times[-1]:
+            bisect.insort(times, ts)  # Out-of-order event, rare in a single auth.log
+        else:
+            times.append(ts)
+        while times[0] <= horizon:
+            times.popleft()
+
+        incident = self.alerted.get(key)
+        if len(times) < self.threshold:
+            if incident is not None:
+                self._close(key, alerts)
+            return alerts
+        if incident is not None:
+            incident["failure_count"] += 1
+            return alerts
+        self.alerted[key] = {"first_seen": times[0], "failure_count": len(times), "reported": len(times)}
+        alerts.append((key, {"first_seen": times[0], "failure_count": len(times)}))
+        return alerts
+
+    def _report(self, key, incident, alerts):
+        if incident["failure_count"] > incident["reported"]:
+            incident["reported"] = incident["failure_count"]
+            alerts.append((key, {"first_seen": incident["first_seen"], "failure_count": incident["failure_count"]}))
+
+    def _close(self, key, alerts):
+        self._report(key, self.alerted.pop(key), alerts)
+
+    def _evict_idle(self, horizon):
+        alerts = []
+        while self.failures:
+            key, times = next(iter(self.failures.items()))
+            if times[-1] > horizon:
+                break
+            del self.failures[key]
+            if key in self.alerted:
+                self._close(key, alerts)
+        return alerts
+
+    def flush(self):
+        """Updates for the open incidents that grew since they were last reported."""
+        alerts = []
+        for key, incident in self.alerted.items():
+            self._report(key, incident, alerts)
+        return alerts
+
+    def snapshot(self):
+        return {
+            "latest": self.latest,
+            "failures": [[list(key), list(times)] for key, times in self.failures.items()],
+            "alerted": [[list(key), incident] for key, incident in self.alerted.items()]
+        }
+
+    @classmethod
+    def restore(cls, state, threshold=BRUTE_FORCE_THRESHOLD, window_seconds=BRUTE_FORCE_WINDOW):
+        detector = cls(threshold, window_seconds)
+        if not state:
+            return detector
+        detector.latest = state.get("latest")
+        for key, times in state.get("failures", []):
+            detector.failures[tuple(key)] = deque(times)
+        for entry in state.get("alerted", []):
+            # Older checkpoints hold bare keys without an incident
+            if len(entry) == 2 and isinstance(entry[1], dict):
+                detector.alerted[tuple(entry[0])] = entry[1]
+        return detector
+
+class WindowAggregator:
+    """
+    Event-time window aggregation for auth events, shared by the batch
+    parser and the StreamProcessor. add() returns the windows closed by
+    each event as (group, key, value) tuples; IAM changes are not windowed
+    and pass straight through as ("iam_events", None, event), and SSH
+    failures go to the sliding BruteForceDetector, whose alerts come back
+    as ("ssh_brute_force", key, alert) as soon as they are raised.
+    """
+    def __init__(self, allowed_lateness=DEFAULT_ALLOWED_LATENESS, brute_force=None):
+        self.allowed_lateness = allowed_lateness
+        self.brute_force = brute_force or BruteForceDetector()
+        self.groups = {name: {} for name in WINDOW_SIZES}
+        self.watermark = None
+        self.late_events = 0
+        self._deadlines = []  # heap of (close_at, group, key)
+
+    @staticmethod
+    def window_of(event):
+        """Returns the (group, key) an event aggregates into, or (None, None)."""
+        ts = event['timestamp'].timestamp()
+        if event['type'] == 'ssh_login':
+            # 1-hour window for access pattern
+            return "ssh_access_groups", (event['user'], event['hostname'], int(ts // 3600) * 3600)
+        if event['type'] == 'privilege_escalation':
+            return "priv_groups", (event['user'], event['hostname'], int(ts // 600) * 600)
+        if event['type'] == 'auth_failure':
+            # 10-min window for privilege auth failure
+            return "auth_failure_groups", (event['user'], event.get('source', 'unknown'), event['hostname'], int(ts // 600) * 600)
+        return None, None
+
+    def add(self, event):
+        """Folds one event into its window and returns every window that is now closed."""
+        if event['type'] == 'iam_change':
+            closed = [("iam_events", None, event)]
+        elif event['type'] == 'ssh_failure':
+            closed = [("ssh_brute_force",) + alert for alert in self.brute_force.add(event)]
+        else:
+            closed = []
+            name, key = self.window_of(event)
+            if name is not None:
+                self._fold(name, key, event)
+        return closed + self.advance(event['timestamp'].timestamp())
+
+    def _fold(self, name, key, event):
+        close_at = key[-1] + WINDOW_SIZES[name] + self.allowed_lateness
+        if self.watermark is not None and close_at <= self.watermark:
+            # The window was already emitted and evicted
+            self.late_events += 1
+            return
+
+        windows = self.groups[name]
+        if key not in windows:
+            windows[key] = set() if name == "ssh_access_groups" else [] if name == "priv_groups" else 0
+            heapq.heappush(self._deadlines, (close_at, name, key))
+
+        if name == "ssh_access_groups":
+            windows[key].add(event['ip'])
+        elif name == "priv_groups":
+            windows[key].append(build_command_entry(event))
+        else:
+            windows[key] += 1
+
+    def advance(self, ts):
+        """Moves the watermark forward to ts and evicts the windows it closes."""
+        if self.watermark is None or ts > self.watermark:
+            self.watermark = ts
+        closed = []
+        while self._deadlines and self._deadlines[0][0] <= self.watermark:
+            _, name, key = heapq.heappop(self._deadlines)
+            closed.append((name, key, self.groups[name].pop(key)))
+        return closed
+
+    def flush(self):
+        """Closes every open window, e.g. at the end of a batch input."""
+        closed = [("ssh_brute_force",) + alert for alert in self.brute_force.flush()]
+        while self._deadlines:
+            _, name, key = heapq.heappop(self._deadlines)
+            closed.append((name, key, self.groups[name].pop(key)))
+        return closed
+
+    @property
+    def open_windows(self):
+        return len(self._deadlines)
+
+    def snapshot(self):
+        """JSON-serializable state of the open windows, for checkpoints."""
+        return {
+            "watermark": self.watermark,
+            "late_events": self.late_events,
+            "brute_force": self.brute_force.snapshot(),
+            "windows": {
+                name: [[list(key), sorted(value) if isinstance(value, set) else value] for key, value in windows.items()]
+                for name, windows in self.groups.items()
+            }
+        }
+
+    @classmethod
+    def restore(cls, state, allowed_lateness=DEFAULT_ALLOWED_LATENESS,
+                brute_force_threshold=BRUTE_FORCE_THRESHOLD, brute_force_window=BRUTE_FORCE_WINDOW):
+        state = state or {}
+        brute_force = BruteForceDetector.restore(state.get("brute_force"), brute_force_threshold, brute_force_window)
+        aggregator = cls(allowed_lateness, brute_force)
+        if not state:
+            return aggregator
+        aggregator.watermark = state.get("watermark")
+        aggregator.late_events = state.get("late_events", 0)
+        for name, entries in state.get("windows", {}).items():
+            for key, value in entries:
+                key = tuple(key)
+                aggregator.groups[name][key] = set(value) if name == "ssh_access_groups" else value
+                close_at = key[-1] + WINDOW_SIZES[name] + allowed_lateness
+                heapq.heappush(aggregator._deadlines, (close_at, name, key))
+        return aggregator
+
+def build_window_signal(name, key, value):
+    """Turns a closed window, brute-force alert or IAM event into signal data."""
+    if name == "ssh_access_groups":
+        # 1) SSH Access Patterns (1-hour)
+        user, host, window = key
+        ips = value
+        pattern = "multi_ip_access" if len(ips) > 1 else "single_ip_access"
+        ts_iso = datetime.fromtimestamp(window).isoformat()
+        signal_data = {
+            "id": generate_signal_id("ssh_access_pattern", ts_iso, host, user),
+            "signal": "ssh_access_pattern",
+            "timestamp": ts_iso,
+            "hostname": host,
+            "user": user,
+            "unique_ips": list(ips),
+            "ip_count": len(ips),
+            "pattern": pattern,
+            "confidence": "high",
+            "status": "open"
+        }
+
+    elif name == "priv_groups":
+        # 2) Privilege Escalation (10-min)
+        user, host, window = key
+        entries = value
+        # Aggregate risk and metadata
+        max_intent_weight = max(e.get('risk_weight', 0.0) for e in entries)
+        primary_intent = next((e['intent'] for e in entries if e['risk_weight'] == max_intent_weight), "General Administration")
+        mitre_tags = list(set(e['mitre'] for e in entries if e['mitre'] != 'N/A'))
+        compliance_tags = list(set(e['compliance'] for e in entries if e['compliance'] != 'N/A'))
+        
+        collective_conf = "medium" if any(e.get('confidence') == 'medium' for e in entries) else "high"
+        ts_iso = datetime.fromtimestamp(window).isoformat()
+        signal_data = {
+            "id": generate_signal_id("privilege_escalation", ts_iso, host, user),
+            "signal": "privilege_escalation",
+            "timestamp": ts_iso,
+            "hostname": host,
+            "user": user,
+            "intent": primary_intent,
+            "intent_weight": max_intent_weight,
+            "mitre_tags": mitre_tags,
+            "compliance_tags": compliance_tags,
+            "confidence": collective_conf,
+            "commands": entries,
+            "status": "open"
+        }
+
+    elif name == "iam_events":
+        # 3) IAM Changes (Individual events)
+        event = value
+        ts_iso = event['timestamp'].isoformat()
+        meta = categorize_command(event['program'])
+        signal_data = {
+            "id": generate_signal_id("iam_change", ts_iso, event['hostname'], event['user']),
+            "signal": "iam_change",
+            "timestamp": ts_iso,
+            "hostname": event['hostname'],
+            "user": event['user'],
+            "program": event['program'],
+            "intent": meta['intent'],
+            "intent_weight": meta['risk_weight'],
+            "mitre_tags": [meta['mitre']] if meta['mitre'] != 'N/A' else [],
+            "compliance_tags": [meta['compliance']] if meta['compliance'] != 'N/A' else [],
+            "message": event['message'],
+            "confidence": event['confidence'],
+            "status": "open"
+        }
+
+    elif name == "ssh_brute_force":
+        # 4) SSH Brute Force (sliding window, raised as the threshold is crossed
+        # and raised again with the final count once the burst ends)
+        user, ip, host = key
+        count = value["failure_count"]
+        ts_iso = datetime.fromtimestamp(value["first_seen"]).isoformat()
+        signal_data = {
+            "id": generate_signal_id("ssh_brute_force", ts_iso, host, user, ip),
+            "signal": "ssh_brute_force",
+            "timestamp": ts_iso,
+            "hostname": host,
+            "user": user,
+            "ip": ip,
+            "failure_count": count,
+            "confidence": "high",
+            "status": "open"
+        }
+
+    elif name == "auth_failure_groups":
+        # 5) Auth Failures (Sudo/Su)
+        user, source, host, window = key
+        count = value
+        ts_iso = datetime.fromtimestamp(window).isoformat()
+        signal_data = {
+            "id": generate_signal_id("failed_auth", ts_iso, host, user, source),
+            "signal": "failed_auth",
+            "timestamp": ts_iso,
+            "hostname": host,
+            "user": user,
+            "source": source,
+            "failure_count": count,
+            "confidence": "high",
+            "status": "open"
+        }
+
+    else:
+        return None
+
+    signal_data["risk_score"] = calculate_risk_score(signal_data["signal"], signal_data)
+    return signal_data
+
 def main():
     parser = argparse.ArgumentParser(description="Sentra Security Log Parser - Phase 3 Enrichment")
     parser.add_argument("--input", default="/var/log/auth.log", help="Path to auth.log file")
-    parser.add_argument("--output", help="Optional path to save JSON signals (still prints to stdout)")
+    parser.add_argument("--tenant-id", default="default-tenant", help="Tenant ID for mSOC isolation")
+    parser.add_argument("--output", help="Optional path to save signals: JSON lines, or Parquet if it ends in .parquet (still prints to stdout)")
+    parser.add_argument("--workers", type=int, default=1, help="Parse the input in N worker processes")
+    parser.add_argument("--incremental", action="store_true", help="Only parse bytes appended since the last run")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file for --incremental")
+    parser.add_argument("--allowed-lateness", type=int, default=DEFAULT_ALLOWED_LATENESS,
+                        help="Seconds an out-of-order event may trail the newest event and still join its window")
+    parser.add_argument("--brute-force-threshold", type=int, default=BRUTE_FORCE_THRESHOLD,
+                        help="SSH failures per (user, ip, host) that raise an ssh_brute_force signal")
+    parser.add_argument("--brute-force-window", type=int, default=BRUTE_FORCE_WINDOW,
+                        help="Sliding window in seconds for --brute-force-threshold")
+    parser.add_argument("--ai-batch-size", type=int, default=AI_BATCH_SIZE, help="Signals packed into one LLM prompt")
+    parser.add_argument("--ai-concurrency", type=int, default=AI_MAX_CONCURRENCY, help="LLM prompts in flight at once")
+    parser.add_argument("--ai-timeout", type=float, default=AI_REQUEST_TIMEOUT,
+                        help="Seconds before a prompt falls back to the deterministic narrative")
+    parser.add_argument("--no-store", action="store_true",
+                        help="Do not write signals to ClickHouse/Elastic (stdout and --output only)")
+    parser.add_argument("--command-rules", help=f"JSON file of extra command intent rules (or ${COMMAND_RULES_ENV})")
     args = parser.parse_args()
+    if args.command_rules:
+        try:
+            load_command_rules(args.command_rules)
+        except (OSError, ValueError) as e:
+            parser.error(f"--command-rules: {e}")
 
     log_path = args.input
-    ssh_groups = {}        # (user, ip, host, window) -> count
-    ssh_access_groups = {} # (user, host, window) -> set of IPs
-    ssh_failure_groups = {}# (user, ip, host, window) -> count
-    priv_groups = {}       # (user, host, window) -> [commands]
-    auth_failure_groups = {}# (user, source, host, window) -> count
-    iam_events = []
+    checkpoint = TailCheckpoint(args.checkpoint, "windows") if args.incremental else None
 
     # High-risk command keywords
     HIGH_RISK_KEYWORDS = ['visudo', 'passwd', 'chmod', 'chown', 'rm -rf', 'tee /etc/sudoers', 'usermod', 'useradd', 'userdel']
 
     try:
-        with open(log_path, 'r') as f:
-            for line in f:
-                event = parse_line(line)
-                if not event:
-                    continue
-                
-                ts = event['timestamp']
-                
-                if event['type'] == 'ssh_login':
-                    # 5-min window
-                    win_5 = int(ts.timestamp() // 300) * 300
-                    key_5 = (event['user'], event['ip'], event['hostname'], win_5)
-                    ssh_groups[key_5] = ssh_groups.get(key_5, 0) + 1
-
-                    # 1-hour window for access pattern
-                    win_1h = int(ts.timestamp() // 3600) * 3600
-                    key_1h = (event['user'], event['hostname'], win_1h)
-                    if key_1h not in ssh_access_groups:
-                        ssh_access_groups[key_1h] = set()
-                    ssh_access_groups[key_1h].add(event['ip'])
-                
-                elif event['type'] == 'ssh_failure':
-                    # 1-hour window for brute force
-                    window = int(ts.timestamp() // 3600) * 3600
-                    key = (event['user'], event['ip'], event['hostname'], window)
-                    ssh_failure_groups[key] = ssh_failure_groups.get(key, 0) + 1
-
-                elif event['type'] == 'privilege_escalation':
-                    window = int(ts.timestamp() // 600) * 600
-                    key = (event['user'], event['hostname'], window)
-                    if key not in priv_groups:
-                        priv_groups[key] = []
-                    
-                    # Classify command (Phase 3)
-                    cmd = event['command']
-                    meta = categorize_command(cmd)
-                    priv_groups[key].append({
-                        "command": cmd,
-                        "risk": "high" if meta['risk_weight'] >= 0.4 else "normal",
-                        "intent": meta['intent'],
-                        "mitre": meta['mitre'],
-                        "compliance": meta['compliance'],
-                        "risk_weight": meta['risk_weight'],
-                        "source": event.get("source", "unknown"),
-                        "confidence": event.get("confidence", "high")
-                    })
-
-                elif event['type'] == 'auth_failure':
-                    # 10-min window for privilege auth failure
-                    window = int(ts.timestamp() // 600) * 600
-                    key = (event['user'], event.get('source', 'unknown'), event['hostname'], window)
-                    auth_failure_groups[key] = auth_failure_groups.get(key, 0) + 1
-                
-                elif event['type'] == 'iam_change':
-                    iam_events.append(event)
-
-        # Emit Aggregated Signals
+        if checkpoint:
+            # Resume the windows left open by the last run; they are emitted
+            # once they close, in this run or a later one.
+            saved = checkpoint.load()
+            segments, inode, offset = plan_incremental_reads(log_path, saved)
+            aggregator = WindowAggregator.restore(
+                saved.get("state"), args.allowed_lateness,
+                args.brute_force_threshold, args.brute_force_window
+            )
+        else:
+            segments = [(log_path, 0, None)]
+            aggregator = WindowAggregator(
+                args.allowed_lateness,
+                BruteForceDetector(args.brute_force_threshold, args.brute_force_window)
+            )
+
+        # Initialize Storage Engines
+        storages = [] if args.no_store else [StorageFactory.get_storage("ClickHouse"), StorageFactory.get_storage("Elastic")]
+
+        # Emit Aggregated Signals as their windows close
         all_signals = []
-        # 1) SSH Access Patterns (1-hour)
-        for (user, host, window), ips in ssh_access_groups.items():
-            pattern = "multi_ip_access" if len(ips) > 1 else "single_ip_access"
-            ts_iso = datetime.fromtimestamp(window).isoformat()
-            signal_data = {
-                "id": generate_signal_id("ssh_access_pattern", ts_iso, host, user),
-                "signal": "ssh_access_pattern",
-                "timestamp": ts_iso,
-                "hostname": host,
-                "user": user,
-                "unique_ips": list(ips),
-                "ip_count": len(ips),
-                "pattern": pattern,
-                "confidence": "high",
-                "status": "open"
-            }
-            signal_data["risk_score"] = calculate_risk_score("ssh_access_pattern", signal_data)
-            signal_data = enrich_signal_with_ai("ssh_access_pattern", signal_data)
-            all_signals.append(signal_data)
-            print(json.dumps(signal_data))
+        brute_force_at = {}  # id -> index in all_signals of a raised brute-force signal
+        # Closed windows are enriched in rounds that fill every concurrent prompt
+        pending = []
+        enrich_round = args.ai_batch_size * args.ai_concurrency
 
-        # 2) Privilege Escalation (10-min)
-        for (user, host, window), entries in priv_groups.items():
-            # Aggregate risk and metadata
-            max_intent_weight = max(e.get('risk_weight', 0.0) for e in entries)
-            primary_intent = next((e['intent'] for e in entries if e['risk_weight'] == max_intent_weight), "General Administration")
-            mitre_tags = list(set(e['mitre'] for e in entries if e['mitre'] != 'N/A'))
-            compliance_tags = list(set(e['compliance'] for e in entries if e['compliance'] != 'N/A'))
-            
-            collective_conf = "medium" if any(e.get('confidence') == 'medium' for e in entries) else "high"
-            ts_iso = datetime.fromtimestamp(window).isoformat()
-            signal_data = {
-                "id": generate_signal_id("privilege_escalation", ts_iso, host, user),
-                "signal": "privilege_escalation",
-                "timestamp": ts_iso,
-                "hostname": host,
-                "user": user,
-                "intent": primary_intent,
-                "intent_weight": max_intent_weight,
-                "mitre_tags": mitre_tags,
-                "compliance_tags": compliance_tags,
-                "confidence": collective_conf,
-                "commands": entries,
-                "status": "open"
-            }
-            signal_data["risk_score"] = calculate_risk_score("privilege_escalation", signal_data)
-            signal_data = enrich_signal_with_ai("privilege_escalation", signal_data)
-            all_signals.append(signal_data)
-            print(json.dumps(signal_data))
+        def emit(closed_windows, final=False):
+            for name, key, value in closed_windows:
+                signal_data = build_window_signal(name, key, value)
+                if signal_data:
+                    pending.append(signal_data)
+            if pending and (final or len(pending) >= enrich_round):
+                for signal_data in enrich_signals_with_ai(pending, args.tenant_id, args.ai_batch_size,
+                                                          args.ai_concurrency, args.ai_timeout):
+                    # Ingest into persistent storage (Phase 2)
+                    record = SignalRecord.from_signal_data(args.tenant_id, signal_data)
+                    for storage in storages:
+                        storage.ingest(record)
+                    burst = signal_data["id"]
+                    if signal_data["signal"] == "ssh_brute_force" and burst in brute_force_at:
+                        # Raised again with the burst's final count
+                        all_signals[brute_force_at[burst]] = signal_data
+                    else:
+                        if signal_data["signal"] == "ssh_brute_force":
+                            brute_force_at[burst] = len(all_signals)
+                        all_signals.append(signal_data)
+                    print(json.dumps(signal_data))
+                pending.clear()
 
-        # 3) IAM Changes (Individual events)
-        for event in iam_events:
-            ts_iso = event['timestamp'].isoformat()
-            meta = categorize_command(event['program'])
-            signal_data = {
-                "id": generate_signal_id("iam_change", ts_iso, event['hostname'], event['user']),
-                "signal": "iam_change",
-                "timestamp": ts_iso,
-                "hostname": event['hostname'],
-                "user": event['user'],
-                "program": event['program'],
-                "intent": meta['intent'],
-                "intent_weight": meta['risk_weight'],
-                "mitre_tags": [meta['mitre']] if meta['mitre'] != 'N/A' else [],
-                "compliance_tags": [meta['compliance']] if meta['compliance'] != 'N/A' else [],
-                "message": event['message'],
-                "confidence": event['confidence'],
-                "status": "open"
-            }
-            signal_data["risk_score"] = calculate_risk_score("iam_change", signal_data)
-            signal_data = enrich_signal_with_ai("iam_change", signal_data)
-            all_signals.append(signal_data)
-            print(json.dumps(signal_data))
-
-        # 4) SSH Brute Force
-        for (user, ip, host, window), count in ssh_failure_groups.items():
-            if count >= 3: # Threshold for brute force signal
-                ts_iso = datetime.fromtimestamp(window).isoformat()
-                signal_data = {
-                    "id": generate_signal_id("ssh_brute_force", ts_iso, host, user),
-                    "signal": "ssh_brute_force",
-                    "timestamp": ts_iso,
-                    "hostname": host,
-                    "user": user,
-                    "ip": ip,
-                    "failure_count": count,
-                    "confidence": "high",
-                    "status": "open"
-                }
-                signal_data["risk_score"] = calculate_risk_score("ssh_brute_force", signal_data)
-                signal_data = enrich_signal_with_ai("ssh_brute_force", signal_data)
-                all_signals.append(signal_data)
-                print(json.dumps(signal_data))
+        for segment_path, start, end in segments:
+            for event in iter_parsed_events(segment_path, args.workers, start=start, end=end):
+                emit(aggregator.add(event))
 
-        # 5) Auth Failures (Sudo/Su)
-        for (user, source, host, window), count in auth_failure_groups.items():
-            ts_iso = datetime.fromtimestamp(window).isoformat()
-            signal_data = {
-                "id": generate_signal_id("failed_auth", ts_iso, host, user),
-                "signal": "failed_auth",
-                "timestamp": ts_iso,
-                "hostname": host,
-                "user": user,
-                "source": source,
-                "failure_count": count,
-                "confidence": "high",
-                "status": "open"
-            }
-            signal_data["risk_score"] = calculate_risk_score("failed_auth", signal_data)
-            signal_data = enrich_signal_with_ai("failed_auth", signal_data)
-            all_signals.append(signal_data)
-            print(json.dumps(signal_data))
+        emit([] if checkpoint else aggregator.flush(), final=True)
+
+        # Drain the buffered writers before the checkpoint moves past these lines
+        stored = True
+        for storage in storages:
+            stored = storage.close() and stored
+
+        if aggregator.late_events:
+            print(f"Warning: dropped {aggregator.late_events} events older than the allowed lateness.", file=sys.stderr)
 
         # 6) Weekly Summary
         if all_signals:
             summary = generate_weekly_summary(all_signals)
             print(json.dumps(summary))
 
-        if args.output:
+        if args.output and is_parquet(args.output):
+            write_signals_parquet(args.output, all_signals, [summary] if all_signals else [])
+        elif args.output:
             with open(args.output, 'w') as f:
                 for s in all_signals:
                     f.write(json.dumps(s) + "\n")
                 if all_signals:
                     f.write(json.dumps(summary) + "\n")
 
+        if checkpoint and not stored:
+            print("Warning: some signals did not reach storage; the checkpoint is not moved, "
+                  "so the next run parses these lines again.", file=sys.stderr)
+        elif checkpoint:
+            checkpoint.save(log_path, inode, offset, aggregator.snapshot())
+
     except FileNotFoundError:
         print(f"Error: {log_path} not found.", file=sys.stderr)
     except PermissionError:
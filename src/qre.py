@@ -1,12 +1,79 @@
+import os
 import json
 import re
+import time
 import datetime
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, Any, List, Optional, Tuple
 from ai_engine import AIEngine
+from storage import StorageFactory, add_ingest_listener, ingest_marker, latency_percentiles
+from audit_log import AuditWriter
+
+# Query result cache: entries kept, seconds per time bucket (a cached result
+# never outlives the bucket it was computed in), and seconds a result stays
+# fresh per engine; 0 disables caching for that engine
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_BUCKET = 3600
+ENGINE_CACHE_TTLS = {
+    "ClickHouse": 300,
+    "Elastic": 60,
+    "VectorDB": 600,
+    "Kafka/Flink": 0,
+    "AI Control Plane": 900
+}
+
+# Intent classification: memoized queries, and LLM answers kept on disk so a
+# phrasing is only ever sent to the model once
+INTENT_MEMO_SIZE = 4096
+INTENT_CACHE_FILE = "sentra_intent_cache.jsonl"
+
+# Sub-query execution: engines queried at once, and how long a sub-query may
+# take, as a multiple of the engine's latency in HealthMonitor with a floor
+QUERY_WORKERS = 8
+DEADLINE_LATENCY_FACTOR = 4
+MIN_QUERY_DEADLINE = 0.5
+
+# Health monitor: seconds of query history per engine (at most
+# HEALTH_MAX_SAMPLES), successful samples needed before observed latency
+# replaces the baseline, and the p95/baseline ratio at which an engine
+# counts as degraded
+HEALTH_WINDOW = 300
+HEALTH_MAX_SAMPLES = 1000
+HEALTH_MIN_SAMPLES = 5
+DEGRADED_LATENCY_FACTOR = 3
+# Circuit breaker: opens on BREAKER_ERROR_RATE over at least BREAKER_MIN_CALLS
+# calls, or on consecutive failures; a probe is let through after the cooldown
+BREAKER_MIN_CALLS = 10
+BREAKER_ERROR_RATE = 0.5
+BREAKER_CONSECUTIVE_FAILURES = 5
+BREAKER_COOLDOWN = 30.0
+# Routing cost of one second of observed p95 latency, and of an error rate
+# of 1.0 (every recent call failed), in CostEstimator units
+LATENCY_COST_PER_SECOND = 10.0
+ERROR_RATE_COST = 20.0
 
 class HealthMonitor:
-    """Monitors the availability and latency of downstream engines."""
-    
+    """
+    Monitors the availability and latency of downstream engines.
+    Every storage query is recorded: latency percentiles and error rates are
+    computed over the last HEALTH_WINDOW seconds, and the registry shows the
+    live p50 (the static latencies below are the baseline until an engine
+    has samples). Each engine has a circuit breaker that opens on a high
+    error rate or a run of failures. After BREAKER_COOLDOWN it lets one
+    probe query through (half-open), whose outcome closes or reopens it.
+    """
+    # Where a sub-query goes when its engine is open or degraded
+    FALLBACKS = {
+        "ClickHouse": ["Elastic"],
+        "VectorDB": ["Elastic"],
+        "Kafka/Flink": ["ClickHouse", "Elastic"],
+        "AI Control Plane": ["Elastic"],
+        "Elastic": []
+    }
+    STATUS = {"CLOSED": "HEALTHY", "OPEN": "UNHEALTHY", "HALF_OPEN": "PROBING"}
+
     def __init__(self):
         self.registry = {
             "ClickHouse": {"status": "HEALTHY", "latency_ms": 10},
@@ -15,23 +82,147 @@ class HealthMonitor:
             "Kafka/Flink": {"status": "HEALTHY", "latency_ms": 5},
             "AI Control Plane": {"status": "HEALTHY", "latency_ms": 1200}
         }
+        self.baseline_ms = {engine: entry["latency_ms"] for engine, entry in self.registry.items()}
+        self.samples = {engine: deque(maxlen=HEALTH_MAX_SAMPLES) for engine in self.registry}  # (at, seconds, ok)
+        self.breakers = {engine: self._closed_breaker() for engine in self.registry}
+        # Re-entrant: routing holds it while CostEstimator reads latencies back
+        self.lock = threading.RLock()
 
-    def get_optimal_engine(self, primary_engine: str) -> str:
-        """Returns the primary engine if healthy, else finds a fallback."""
-        if self.registry.get(primary_engine, {}).get("status") == "HEALTHY":
-            return primary_engine
-        
-        # Simple fallback logic: if primary is down, use Elastic as catch-all
-        print(f"[QRE] Warning: Primary engine {primary_engine} is UNHEALTHY. Falling back to Elastic.")
-        return "Elastic"
+    @staticmethod
+    def _closed_breaker() -> Dict[str, Any]:
+        return {"state": "CLOSED", "failures": 0, "opened_at": 0.0, "probe_at": 0.0, "since": 0.0}
+
+    def _engine(self, engine: str):
+        """Registers an engine seen for the first time. Called with the lock held."""
+        if engine not in self.registry:
+            self.registry[engine] = {"status": "HEALTHY", "latency_ms": 1000}
+            self.baseline_ms[engine] = 1000
+            self.samples[engine] = deque(maxlen=HEALTH_MAX_SAMPLES)
+            self.breakers[engine] = self._closed_breaker()
+        return self.breakers[engine]
+
+    def _window(self, engine: str, since: float = 0.0):
+        cutoff = max(time.monotonic() - HEALTH_WINDOW, since)
+        return [sample for sample in self.samples[engine] if sample[0] >= cutoff]
+
+    def _set_state(self, engine: str, state: str):
+        breaker = self.breakers[engine]
+        if breaker["state"] != state:
+            print(f"[QRE] {engine} circuit breaker {breaker['state']} -> {state}")
+        breaker["state"] = state
+        now = time.monotonic()
+        if state == "OPEN":
+            breaker["opened_at"] = now
+        elif state == "HALF_OPEN":
+            breaker["probe_at"] = now
+        else:
+            # Errors from before the breaker closed no longer count
+            breaker["failures"] = 0
+            breaker["since"] = now
+        self.registry[engine]["status"] = self.STATUS[state]
+
+    def record(self, engine: str, seconds: float, ok: bool):
+        """Records one storage query and moves the engine's breaker."""
+        with self.lock:
+            breaker = self._engine(engine)
+            self.samples[engine].append((time.monotonic(), seconds, ok))
+            breaker["failures"] = 0 if ok else breaker["failures"] + 1
+            if breaker["state"] == "HALF_OPEN":
+                self._set_state(engine, "CLOSED" if ok else "OPEN")
+            elif breaker["state"] == "CLOSED" and not ok:
+                outcomes = [sample[2] for sample in self._window(engine, breaker["since"])]
+                error_rate = outcomes.count(False) / len(outcomes)
+                if breaker["failures"] >= BREAKER_CONSECUTIVE_FAILURES or \
+                        (len(outcomes) >= BREAKER_MIN_CALLS and error_rate >= BREAKER_ERROR_RATE):
+                    self._set_state(engine, "OPEN")
+            latencies = [sample[1] for sample in self._window(engine) if sample[2]]
+            if latencies:
+                self.registry[engine]["latency_ms"] = latency_percentiles(latencies)["latency_p50_ms"]
+
+    def stats(self, engine: str) -> Dict[str, Any]:
+        """Latency percentiles (ms), error rate and breaker state over the window."""
+        with self.lock:
+            breaker = self._engine(engine)
+            window = self._window(engine)
+            recent = self._window(engine, breaker["since"])
+            state = breaker["state"]
+        stats = latency_percentiles([sample[1] for sample in window if sample[2]])
+        stats["calls"] = len(window)
+        stats["successes"] = sum(1 for sample in window if sample[2])
+        stats["error_rate"] = round([s[2] for s in recent].count(False) / len(recent), 3) if recent else 0.0
+        stats["state"] = state
+        return stats
+
+    def latency(self, engine: str) -> float:
+        """Observed p95 in seconds, or the baseline while too few calls succeeded."""
+        stats = self.stats(engine)
+        # Failed calls have no latency sample; they count in the error rate
+        if stats["successes"] >= HEALTH_MIN_SAMPLES:
+            return stats["latency_p95_ms"] / 1000
+        return self.baseline_ms.get(engine, 1000) / 1000
+
+    def _usable(self, engine: str) -> bool:
+        """Closed, and not much slower than its baseline. Called with the lock held."""
+        return self.breakers[engine]["state"] == "CLOSED" and \
+            self.latency(engine) <= DEGRADED_LATENCY_FACTOR * self.baseline_ms[engine] / 1000
+
+    def get_optimal_engine(self, primary_engine: str, query: str = "") -> str:
+        """
+        Returns the primary engine if it is healthy. An open breaker whose
+        cooldown has passed gets this query as its probe. Otherwise the
+        cheapest usable fallback by CostEstimator (cost plus observed
+        latency) is used, and Elastic as the catch-all.
+        """
+        # One decision at a time, so a half-open breaker hands out a single probe
+        with self.lock:
+            breaker = self._engine(primary_engine)
+            now = time.monotonic()
+            state = breaker["state"]
+            if (state == "OPEN" and now - breaker["opened_at"] >= BREAKER_COOLDOWN) or \
+                    (state == "HALF_OPEN" and now - breaker["probe_at"] >= BREAKER_COOLDOWN):
+                self._set_state(primary_engine, "HALF_OPEN")
+                print(f"[QRE] Probing {primary_engine} with this query")
+                return primary_engine
+            if self._usable(primary_engine):
+                return primary_engine
+
+            candidates = [e for e in self.FALLBACKS.get(primary_engine, ["Elastic"]) if e in self.registry and self._usable(e)]
+            if state == "CLOSED":
+                # Degraded but up: stays in the running on cost
+                candidates.insert(0, primary_engine)
+            if not candidates:
+                print(f"[QRE] Warning: Primary engine {primary_engine} is {self.registry[primary_engine]['status']}. Falling back to Elastic.")
+                return "Elastic"
+            engine = min(candidates, key=lambda e: CostEstimator.estimate(e, query, self))
+            if engine != primary_engine:
+                print(f"[QRE] Warning: Primary engine {primary_engine} is {self.registry[primary_engine]['status']} "
+                      f"(p95 {self.latency(primary_engine) * 1000:.0f} ms). Routing to {engine}.")
+            return engine
 
     def update_status(self, engine: str, status: str, latency: int):
-        if engine in self.registry:
-            self.registry[engine]["status"] = status
+        """Manual override, e.g. from an external health check."""
+        with self.lock:
+            self._engine(engine)
+            self.baseline_ms[engine] = latency
             self.registry[engine]["latency_ms"] = latency
+            self._set_state(engine, "CLOSED" if status == "HEALTHY" else "OPEN")
+
+    def deadline(self, engine: str) -> float:
+        """Seconds a sub-query on engine may take before its answer is given up on."""
+        return max(MIN_QUERY_DEADLINE, DEADLINE_LATENCY_FACTOR * self.latency(engine))
+
+def normalize_query(query: str) -> str:
+    """Case, spacing and trailing punctuation do not change the answer."""
+    return " ".join(query.lower().split()).rstrip("?!. ")
 
 class IntentClassifier:
-    """Classifies query intent into one of the canonical QRE categories."""
+    """
+    Classifies query intent into one of the canonical QRE categories.
+    Keyword rules are compiled into one regex; queries they do not settle
+    go to the LLM. Results are memoized per normalized query in an LRU, and
+    LLM answers are also appended to cache_file, so a phrasing costs at
+    most one model call across runs. Build one and reuse it.
+    """
     
     INTENTS = {
         "EXACT": "Forensic / Precise matching",
@@ -41,31 +232,104 @@ class IntentClassifier:
         "DECISION": "Judgment / Synthesis"
     }
 
-    def __init__(self):
+    # Checked in order: the first intent with a keyword anywhere in the
+    # (lowercased) query wins
+    KEYWORD_RULES = [
+        ("ANALYTICAL", ["how many", "top", "average", "count", "trend"], 0.95),
+        ("SIMILARITY", ["similar", "like this", "matches pattern"], 0.95),
+        ("DECISION", ["is this", "should i", "risk of"], 0.85),
+    ]
+
+    def __init__(self, memo_size: int = INTENT_MEMO_SIZE, cache_file: Optional[str] = INTENT_CACHE_FILE):
         self.ai = AIEngine()
+        # One lookahead per intent, tried in rule order, like CommandClassifier
+        self.keywords = re.compile("|".join(
+            rf"(?=[\s\S]*?(?:{'|'.join(map(re.escape, words))}))(?P<{intent}>)"
+            for intent, words, _ in self.KEYWORD_RULES
+        ))
+        self.keyword_confidence = {intent: confidence for intent, _, confidence in self.KEYWORD_RULES}
+        self.memo_size = memo_size
+        self.memo = OrderedDict()
+        self.lock = threading.Lock()
+        self.cache_file = cache_file
+        self.llm_answers = self._load_llm_answers()
+        self.stats = {"memo_hits": 0, "keyword_matches": 0, "llm_cache_hits": 0, "llm_calls": 0}
+
+    def _load_llm_answers(self) -> Dict[str, Tuple[str, float]]:
+        answers = {}
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return answers
+        with open(self.cache_file, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    answers[entry["query"]] = (entry["intent"], entry["confidence"])
+                except (ValueError, KeyError):
+                    continue  # a torn last line
+        return answers
+
+    def _store_llm_answer(self, query: str, intent: str, confidence: float):
+        with self.lock:
+            self.llm_answers[query] = (intent, confidence)
+            if not self.cache_file:
+                return
+            try:
+                with open(self.cache_file, "a") as f:
+                    f.write(json.dumps({"query": query, "intent": intent, "confidence": confidence}) + "\n")
+            except OSError as e:
+                print(f"[QRE] Error writing intent cache: {e}")
 
     def classify(self, tenant_id: str, query: str) -> Tuple[str, float]:
         """
         Uses LLM to classify intent, with a rule-based fallback.
         """
+        key = normalize_query(query)
+        with self.lock:
+            result = self.memo.get(key)
+            if result is not None:
+                self.memo.move_to_end(key)
+                self.stats["memo_hits"] += 1
+                return result
+        result, final = self._classify(tenant_id, key)
+        # The default fallback after a failed LLM call is not memoized, so the
+        # query is sent again next time
+        if final:
+            with self.lock:
+                self.memo[key] = result
+                while len(self.memo) > self.memo_size:
+                    self.memo.popitem(last=False)
+        return result
+
+    def _classify(self, tenant_id: str, query: str) -> Tuple[Tuple[str, float], bool]:
+        """Returns ((intent, confidence), whether the answer may be memoized)."""
         # Rule-based fallback for common keywords
-        query_lower = query.lower()
-        if any(w in query_lower for w in ["how many", "top", "average", "count", "trend"]):
-            return "ANALYTICAL", 0.95
-        if any(w in query_lower for w in ["similar", "like this", "matches pattern"]):
-            return "SIMILARITY", 0.95
-        if any(w in query_lower for w in ["is this", "should I", "risk of"]):
-            return "DECISION", 0.85
-        
+        match = self.keywords.match(query)
+        if match:
+            self.stats["keyword_matches"] += 1
+            return (match.lastgroup, self.keyword_confidence[match.lastgroup]), True
+
+        with self.lock:
+            cached = self.llm_answers.get(query)
+        if cached:
+            self.stats["llm_cache_hits"] += 1
+            return cached, True
+
         # LLM classification via AI Engine
+        self.stats["llm_calls"] += 1
         intent, confidence = self.ai.classify_intent(tenant_id, query)
         if confidence > 0.0:
-            return intent, confidence
+            self._store_llm_answer(query, intent, confidence)
+            return (intent, confidence), True
         
-        return "EXACT", 0.70  # Default fallback
+        return ("EXACT", 0.70), False  # Default fallback
 
 class QueryDecomposer:
     """Decomposes compound queries into individual engine sub-queries."""
+
+    CONJUNCTIONS = re.compile(r' and | plus | as well as ', re.IGNORECASE)
+
+    def __init__(self, classifier: IntentClassifier = None):
+        self.classifier = classifier or IntentClassifier()
     
     def decompose(self, query: str) -> List[Dict[str, str]]:
         """
@@ -75,11 +339,10 @@ class QueryDecomposer:
         sub_queries = []
         
         # Split by common conjunctions
-        parts = re.split(r' and | plus | as well as ', query, flags=re.IGNORECASE)
+        parts = self.CONJUNCTIONS.split(query)
         
-        classifier = IntentClassifier()
         for part in parts:
-            intent, confidence = classifier.classify("system", part.strip())
+            intent, confidence = self.classifier.classify("system", part.strip())
             sub_queries.append({
                 "sub_query": part.strip(),
                 "intent": intent,
@@ -102,19 +365,108 @@ class CostEstimator:
     }
 
     @staticmethod
-    def estimate(engine: str, query: str) -> float:
+    def estimate(engine: str, query: str, health: HealthMonitor = None) -> float:
         """
-        Predicts cost based on engine type and query complexity.
+        Predicts cost based on engine type and query complexity, plus the
+        engine's observed p95 latency and error rate when a HealthMonitor is given.
         In a real system, this would inspect data volume or expected shard hits.
         """
         base_cost = CostEstimator.ENGINE_BASE_COSTS.get(engine, 1.0)
         
         # Complexity penalty
         complexity = len(query.split()) * 0.1
-        total_estimate = round(base_cost + complexity, 2)
+        latency = health.latency(engine) * LATENCY_COST_PER_SECOND if health else 0.0
+        errors = health.stats(engine)["error_rate"] * ERROR_RATE_COST if health else 0.0
+        total_estimate = round(base_cost + complexity + latency + errors, 2)
         
         return total_estimate
 
+class QueryResultCache:
+    """
+    Results of engine sub-queries, keyed on (tenant, engine, normalized
+    sub-query, time bucket) and kept for the engine's TTL. The least recently
+    used entry is evicted beyond max_entries. invalidate_tenant() drops a
+    tenant's results when new signals for it are ingested; a query that was
+    already running at that point does not store its (stale) result. Ingests
+    by other processes are seen through storage.ingest_marker: an entry is
+    only served while the tenant's marker is the one read before its query ran.
+    """
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE, ttls: Dict[str, float] = None,
+                 bucket_seconds: int = QUERY_CACHE_BUCKET):
+        self.max_entries = max_entries
+        self.ttls = dict(ENGINE_CACHE_TTLS, **(ttls or {}))
+        self.bucket_seconds = bucket_seconds
+        self.entries = OrderedDict()  # key -> (expires_at, results, ingest marker)
+        self.generations = {}         # tenant -> invalidation count
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _key(self, tenant_id: str, engine: str, sub_query: str):
+        return tenant_id, engine, normalize_query(sub_query), int(time.time() // self.bucket_seconds)
+
+    def enabled(self, engine: str) -> bool:
+        return self.ttls.get(engine, 0) > 0
+
+    @staticmethod
+    def _fresh(entry, marker: int) -> bool:
+        return entry is not None and entry[0] > time.monotonic() and entry[2] == marker
+
+    def peek(self, tenant_id: str, engine: str, sub_query: str) -> bool:
+        """Whether a fresh result is cached, without counting a hit or miss."""
+        marker = ingest_marker(tenant_id)
+        with self.lock:
+            return self._fresh(self.entries.get(self._key(tenant_id, engine, sub_query)), marker)
+
+    def get(self, tenant_id: str, engine: str, sub_query: str):
+        """Returns (results or None, token); pass the token to put() after a miss."""
+        key = self._key(tenant_id, engine, sub_query)
+        marker = ingest_marker(tenant_id)
+        with self.lock:
+            entry = self.entries.get(key)
+            if self._fresh(entry, marker):
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1], None
+            if entry is not None:
+                del self.entries[key]
+            self.stats["misses"] += 1
+            return None, (key, self.generations.get(tenant_id, 0), marker)
+
+    def put(self, token, results: List[Dict[str, Any]]):
+        key, generation, marker = token
+        tenant_id, engine = key[0], key[1]
+        ttl = self.ttls.get(engine, 0)
+        if ttl <= 0:
+            return
+        with self.lock:
+            if self.generations.get(tenant_id, 0) != generation:
+                return
+            self.entries[key] = (time.monotonic() + ttl, results, marker)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate_tenant(self, tenant_id: str):
+        with self.lock:
+            self.generations[tenant_id] = self.generations.get(tenant_id, 0) + 1
+            stale = [key for key in self.entries if key[0] == tenant_id]
+            for key in stale:
+                del self.entries[key]
+            self.stats["invalidations"] += 1
+
+    def on_ingest(self, engine: str, tenant_ids):
+        """Storage ingest listener (see storage.add_ingest_listener)."""
+        for tenant_id in tenant_ids:
+            self.invalidate_tenant(tenant_id)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats, entries=len(self.entries))
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
 class QueryRouter:
     """Routes queries to the optimal engine based on intent."""
 
@@ -128,15 +480,21 @@ class QueryRouter:
 
     def __init__(self):
         self.classifier = IntentClassifier()
-        self.decomposer = QueryDecomposer()
+        self.decomposer = QueryDecomposer(self.classifier)
         self.health = HealthMonitor()
         self.audit_log = "qre_audit.json"
+        # Appended by a background thread so routing never waits on the disk
+        self.audit = AuditWriter(self.audit_log)
+        self.cache = QueryResultCache()
+        self.storages = {}
+        self.storages_lock = threading.Lock()
+        # Signals written by this process make the tenant's cached results stale
+        add_ingest_listener(self.cache.on_ingest)
 
     def _log_decision(self, decision: Dict[str, Any]):
         """Persist routing decision for auditability (FR-4)."""
         try:
-            with open(self.audit_log, "a") as f:
-                f.write(json.dumps(decision) + "\n")
+            self.audit.write(decision)
         except Exception as e:
             print(f"[QRE] Error writing audit log: {e}")
 
@@ -149,10 +507,16 @@ class QueryRouter:
             primary_engine = self.ENGINE_MAPPING.get(sq["intent"], "Elastic")
             
             # Health-aware routing
-            engine = self.health.get_optimal_engine(primary_engine)
-            
-            cost_estimate = CostEstimator.estimate(engine, sq["sub_query"])
+            engine = self.health.get_optimal_engine(primary_engine, sq["sub_query"])
             
+            cost_estimate = CostEstimator.estimate(engine, sq["sub_query"], self.health)
+            if not self.cache.enabled(engine):
+                cache_status = "BYPASS"
+            elif self.cache.peek(tenant_id, engine, sq["sub_query"]):
+                cache_status = "HIT"
+            else:
+                cache_status = "MISS"
+
             decision = {
                 "original_query": query,
                 "sub_query": sq["sub_query"],
@@ -161,14 +525,134 @@ class QueryRouter:
                 "confidence": sq["confidence"],
                 "engine": engine,
                 "cost_estimate": cost_estimate,
+                "engine_health": self.health.stats(engine),
+                "cache": cache_status,
+                "cache_stats": self.cache.metrics(),
                 "timestamp": datetime.datetime.utcnow().isoformat()
             }
             decisions.append(decision)
             self._log_decision(decision)
-            print(f"[QRE] Route: '{sq['sub_query']}' -> {engine} ({sq['intent']}, Cost: {cost_estimate})")
+            print(f"[QRE] Route: '{sq['sub_query']}' -> {engine} ({sq['intent']}, Cost: {cost_estimate}, Cache: {cache_status})")
             
         return decisions
 
+    def _storage(self, engine: str):
+        with self.storages_lock:
+            if engine not in self.storages:
+                self.storages[engine] = StorageFactory.get_storage(engine)
+            return self.storages[engine]
+
+    def _query(self, tenant_id: str, engine: str, sub_query: str):
+        """storage.query, timed and recorded in the HealthMonitor."""
+        start = time.monotonic()
+        try:
+            results = self._storage(engine).query(tenant_id, sub_query)
+        except Exception:
+            self.health.record(engine, time.monotonic() - start, ok=False)
+            raise
+        self.health.record(engine, time.monotonic() - start, ok=True)
+        return results
+
+    def execute(self, tenant_id: str, decision: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Runs a routed sub-query on its engine, answering from the result cache when possible."""
+        engine = decision["engine"]
+        if not self.cache.enabled(engine):
+            decision["cache"] = "BYPASS"
+            return self._query(tenant_id, engine, decision["sub_query"])
+        results, token = self.cache.get(tenant_id, engine, decision["sub_query"])
+        if token is None:
+            decision["cache"] = "HIT"
+        else:
+            results = self._query(tenant_id, engine, decision["sub_query"])
+            self.cache.put(token, results)
+            decision["cache"] = "MISS"
+        decision["cache_stats"] = self.cache.metrics()
+        return results
+
+class QueryExecutor:
+    """
+    Runs the sub-queries of a routed question concurrently, one pool thread
+    each, so a compound question takes about as long as its slowest engine.
+    Each sub-query has a deadline from HealthMonitor.deadline(); stream()
+    yields every sub-query as soon as it finishes or its deadline passes, and
+    merge() combines them into one answer. A sub-query that missed its
+    deadline keeps running in the background and still fills the cache.
+    """
+    def __init__(self, router: QueryRouter, max_workers: int = QUERY_WORKERS):
+        self.router = router
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="qre-query")
+
+    def stream(self, tenant_id: str, decisions: List[Dict[str, Any]]):
+        """
+        Yields {"index", "decision", "status" (OK/ERROR/TIMEOUT), "results",
+        "latency_ms"} per sub-query, in completion order.
+        """
+        start = time.monotonic()
+        running = {}
+        for index, decision in enumerate(decisions):
+            future = self.pool.submit(self.router.execute, tenant_id, decision)
+            running[future] = (index, decision, start + self.router.health.deadline(decision["engine"]))
+
+        while running:
+            timeout = max(0.0, min(deadline for _, _, deadline in running.values()) - time.monotonic())
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future in list(running):
+                index, decision, deadline = running[future]
+                if future in done:
+                    try:
+                        results = future.result()
+                        part = {"status": "OK", "results": results if isinstance(results, list) else [results]}
+                    except Exception as e:
+                        part = {"status": "ERROR", "results": [], "error": str(e)}
+                elif now >= deadline:
+                    part = {"status": "TIMEOUT", "results": []}
+                else:
+                    continue
+                del running[future]
+                part["index"] = index
+                part["decision"] = decision
+                part["latency_ms"] = round((now - start) * 1000, 1)
+                yield part
+
+    @staticmethod
+    def merge(query: str, parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        One answer for the whole question: rows of every sub-query in the
+        order the question asked them, each tagged with its engine and
+        sub-query, and identical rows from different engines kept once.
+        """
+        parts = sorted(parts, key=lambda p: p["index"])
+        rows, seen = [], set()
+        for part in parts:
+            for row in part["results"]:
+                fingerprint = json.dumps(row, sort_keys=True, default=str)
+                if fingerprint in seen:
+                    continue
+                seen.add(fingerprint)
+                rows.append({"engine": part["decision"]["engine"], "sub_query": part["decision"]["sub_query"], "result": row})
+        return {
+            "query": query,
+            "complete": all(part["status"] == "OK" for part in parts),
+            "sub_queries": [{"sub_query": p["decision"]["sub_query"], "engine": p["decision"]["engine"],
+                             "status": p["status"], "latency_ms": p["latency_ms"],
+                             "cache": p["decision"].get("cache")} for p in parts],
+            "results": rows,
+            "latency_ms": max((p["latency_ms"] for p in parts), default=0.0)
+        }
+
+    def run(self, tenant_id: str, query: str, on_partial=None) -> Dict[str, Any]:
+        """Routes, executes and merges a question; on_partial(part) is called as each sub-query finishes."""
+        parts = []
+        for part in self.stream(tenant_id, self.router.route(tenant_id, query)):
+            parts.append(part)
+            if on_partial:
+                on_partial(part)
+        return self.merge(query, parts)
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+
 if __name__ == "__main__":
     # Quick test
     router = QueryRouter()
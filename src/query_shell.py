@@ -5,8 +5,7 @@ import os
 # Fix path to allow running from root
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from qre import QueryRouter
-from storage import StorageFactory
+from qre import QueryRouter, QueryExecutor
 
 def main():
     parser = argparse.ArgumentParser(description="Sentra Query Shell (QRE Beta)")
@@ -14,6 +13,7 @@ def main():
     args = parser.parse_args()
 
     router = QueryRouter()
+    executor = QueryExecutor(router)
     print("\n" + "="*50)
     print("      SENTRA AI-NATIVE QUERY SHELL (Q2)")
     print("="*50)
@@ -34,34 +34,32 @@ def main():
             decisions = router.route(args.tenant_id, query)
             
             for decision in decisions:
-                engine_name = decision['engine']
-                intent = decision['intent']
-                conf = decision['confidence']
-                cost = decision.get('cost_estimate', 0.0)
-                sub_q = decision.get('sub_query', query)
-                
                 print(f"\n[QRE Decision] ----------------------------------")
-                print(f"  Sub-Query:   \"{sub_q}\"")
-                print(f"  Intent:      {intent} (Confidence: {conf:.2f})")
-                print(f"  Engine:      {engine_name}")
-                print(f"  Route Cost:  {cost} units")
-                
-                # 2. Execute via Storage Layer
-                try:
-                    storage = StorageFactory.get_storage(engine_name)
-                    results = storage.query(args.tenant_id, sub_q)
-                    
-                    print(f"\n  [Results from {engine_name}]")
-                    if isinstance(results, list):
-                        for r in results:
-                            print(f"    - {r}")
-                    else:
-                        print(f"    - {results}")
-                except ValueError as ve:
-                    print(f"  [Error] Routing failed: {ve}")
-                except Exception as e:
-                    print(f"  [Error] Execution failed: {e}")
+                print(f"  Sub-Query:   \"{decision['sub_query']}\"")
+                print(f"  Intent:      {decision['intent']} (Confidence: {decision['confidence']:.2f})")
+                print(f"  Engine:      {decision['engine']}")
+                print(f"  Route Cost:  {decision.get('cost_estimate', 0.0)} units")
+            
+            # 2. Execute every sub-query at once; results are shown as each engine answers
+            # (repeated questions come from the result cache)
+            parts = []
+            for part in executor.stream(args.tenant_id, decisions):
+                parts.append(part)
+                decision = part['decision']
+                engine_name = decision['engine']
+                print(f"\n  [Results from {engine_name} for \"{decision['sub_query']}\"] "
+                      f"{part['status']} in {part['latency_ms']} ms, cache {decision.get('cache')}")
+                if part['status'] == "ERROR":
+                    print(f"  [Error] Execution failed: {part['error']}")
+                elif part['status'] == "TIMEOUT":
+                    print(f"  [Timeout] No answer within {router.health.deadline(engine_name):.1f}s")
+                for r in part['results']:
+                    print(f"    - {r}")
             
+            answer = executor.merge(query, parts)
+            stats = router.cache.metrics()
+            print(f"\n[Answer] {len(answer['results'])} results from {len(parts)} sub-queries in {answer['latency_ms']} ms"
+                  f"{'' if answer['complete'] else ' (partial)'} | cache hit rate {stats['hit_rate']:.0%}")
             print("-" * 50)
 
         except KeyboardInterrupt:
@@ -1,6 +1,9 @@
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field, IPvAnyAddress
 from datetime import datetime
+from functools import lru_cache
+import ipaddress
+import json
 import uuid
 
 SCHEMA_VERSION = "1.0.0"
@@ -68,3 +71,175 @@ class SecuritySignal(BaseModel):
 
     def to_json(self):
         return self.model_dump_json()
+
+
+def severity_for_risk(risk_score: float) -> str:
+    """Inverse of the Phase 0 severity -> risk mapping."""
+    if risk_score >= 0.9:
+        return "Critical"
+    if risk_score >= 0.7:
+        return "High"
+    if risk_score >= 0.4:
+        return "Medium"
+    return "Low"
+
+@lru_cache(maxsize=65536)
+def valid_ip(value: Optional[str]) -> Optional[str]:
+    """The address if it parses as IPv4/IPv6, else None. Cached: the same few IPs repeat all day."""
+    if not value:
+        return None
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        return None
+
+# Extra keys carried from an aggregated signal dict into extra_data
+EXTRA_DATA_KEYS = ("pattern", "unique_ips", "failure_count", "intent", "source", "program")
+
+class SignalRecord:
+    """
+    Compact, slotted form of SecuritySignal for the ingest hot path. Entities
+    are kept flat (as in the ClickHouse table) and nothing is validated
+    beyond the IP fields, so building one costs a fraction of the Pydantic
+    model. Convert with to_model() at API boundaries; to_row() and to_json()
+    serialize directly for storage.
+    """
+    __slots__ = ("id", "tenant_id", "schema_version", "timestamp", "signal_type", "severity", "risk_score",
+                 "username", "hostname", "process_name", "source_ip", "narrative", "recommendation",
+                 "ai_confidence", "compliance_controls", "mitre_ttps", "model_info", "org_identity", "job_role",
+                 "recommended_playbooks", "extra_data")
+
+    def __init__(self, id, tenant_id, timestamp, signal_type, severity, risk_score=0.0, username=None,
+                 hostname=None, process_name=None, source_ip=None, narrative=None, recommendation=None,
+                 ai_confidence=0.0, compliance_controls=(), mitre_ttps=(), model_info=None, org_identity=None,
+                 job_role=None, recommended_playbooks=(), extra_data=None):
+        self.id = id
+        self.tenant_id = tenant_id
+        self.schema_version = SCHEMA_VERSION
+        self.timestamp = timestamp
+        self.signal_type = signal_type
+        self.severity = severity
+        self.risk_score = risk_score
+        self.username = username
+        self.hostname = hostname
+        self.process_name = process_name
+        self.source_ip = source_ip
+        self.narrative = narrative
+        self.recommendation = recommendation
+        self.ai_confidence = ai_confidence
+        self.compliance_controls = list(compliance_controls)
+        self.mitre_ttps = list(mitre_ttps)
+        self.model_info = model_info or {}
+        self.org_identity = org_identity
+        self.job_role = job_role
+        self.recommended_playbooks = list(recommended_playbooks)
+        self.extra_data = extra_data or {}
+
+    @classmethod
+    def from_signal_data(cls, tenant_id: str, signal_data: Dict[str, Any]) -> "SignalRecord":
+        """Maps an aggregated signal dict (parse_auth_log.build_window_signal) onto a record."""
+        commands = signal_data.get("commands") or []
+        ip = signal_data.get("ip")
+        if not ip and signal_data.get("ip_count") == 1:
+            ip = signal_data["unique_ips"][0]
+        risk_score = signal_data.get("risk_score", 0.0)
+
+        return cls(
+            id=signal_data["id"],
+            tenant_id=tenant_id,
+            timestamp=datetime.fromisoformat(signal_data["timestamp"]),
+            signal_type=signal_data["signal"],
+            severity=severity_for_risk(risk_score),
+            risk_score=risk_score,
+            username=signal_data["user"],
+            hostname=signal_data["hostname"],
+            process_name=commands[0]["command"] if commands else None,
+            source_ip=valid_ip(ip),
+            narrative=signal_data.get("narrative"),
+            recommendation=signal_data.get("recommendation"),
+            compliance_controls=signal_data.get("compliance_tags", []),
+            mitre_ttps=signal_data.get("mitre_tags", []),
+            org_identity=signal_data.get("org_identity"),
+            job_role=signal_data.get("job_role"),
+            recommended_playbooks=signal_data.get("recommended_playbooks", []),
+            extra_data={k: v for k, v in signal_data.items() if k in EXTRA_DATA_KEYS}
+        )
+
+    def to_model(self) -> SecuritySignal:
+        return SecuritySignal(
+            id=self.id,
+            tenant_id=self.tenant_id,
+            timestamp=self.timestamp,
+            signal_type=self.signal_type,
+            severity=self.severity,
+            risk_score=self.risk_score,
+            user=UserEntity(username=self.username, org_identity=self.org_identity, job_role=self.job_role)
+            if self.username else None,
+            host=HostEntity(hostname=self.hostname) if self.hostname else None,
+            process=ProcessEntity(name=self.process_name) if self.process_name else None,
+            network=NetworkEntity(source_ip=self.source_ip) if self.source_ip else None,
+            narrative=self.narrative,
+            recommendation=self.recommendation,
+            ai_confidence=self.ai_confidence,
+            compliance_tags=[ComplianceTag(framework="SOC2", control_id=c) for c in self.compliance_controls],
+            mitre_ttps=self.mitre_ttps,
+            model_info=self.model_info,
+            recommended_playbooks=self.recommended_playbooks,
+            extra_data=self.extra_data
+        )
+
+    def to_row(self) -> Dict[str, Any]:
+        """Same flat row as storage.flatten_signal(self.to_model())."""
+        return {
+            "id": self.id,
+            "tenant_id": self.tenant_id,
+            "schema_version": self.schema_version,
+            "timestamp": self.timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            "signal_type": self.signal_type,
+            "severity": self.severity,
+            "risk_score": self.risk_score,
+            "user_username": self.username or "unknown",
+            "host_hostname": self.hostname or "unknown",
+            "host_ip": "0.0.0.0",
+            "process_name": self.process_name or "unknown",
+            "network_source_ip": self.source_ip or "0.0.0.0",
+            "ai_confidence": self.ai_confidence,
+            "model_name": self.model_info.get("model", "unknown"),
+            "mitre_ttps": self.mitre_ttps,
+            "compliance_controls": self.compliance_controls
+        }
+
+    def to_json(self) -> str:
+        """Same document as self.to_model().to_json(), without building the model."""
+        timestamp = self.timestamp.isoformat()
+        if timestamp.endswith("+00:00"):
+            timestamp = timestamp[:-6] + "Z"
+        doc = {
+            "id": self.id,
+            "tenant_id": self.tenant_id,
+            "schema_version": self.schema_version,
+            "timestamp": timestamp,
+            "signal_type": self.signal_type,
+            "severity": self.severity,
+            "risk_score": self.risk_score,
+            "user": dict(_USER_DEFAULTS, username=self.username, org_identity=self.org_identity,
+                         job_role=self.job_role) if self.username else None,
+            "host": dict(_HOST_DEFAULTS, hostname=self.hostname) if self.hostname else None,
+            "process": dict(_PROCESS_DEFAULTS, name=self.process_name) if self.process_name else None,
+            "network": dict(_NETWORK_DEFAULTS, source_ip=self.source_ip) if self.source_ip else None,
+            "narrative": self.narrative,
+            "recommendation": self.recommendation,
+            "ai_confidence": self.ai_confidence,
+            "compliance_tags": [{"framework": "SOC2", "control_id": c, "description": None} for c in self.compliance_controls],
+            "mitre_ttps": self.mitre_ttps,
+            "model_info": self.model_info,
+            "recommended_playbooks": self.recommended_playbooks,
+            "extra_data": self.extra_data
+        }
+        return json.dumps(doc, separators=(",", ":"), ensure_ascii=False, default=str)
+
+# Field defaults of the entity models, in declaration order, for SignalRecord.to_json
+_USER_DEFAULTS = {name: f.default for name, f in UserEntity.model_fields.items()}
+_HOST_DEFAULTS = {name: f.default for name, f in HostEntity.model_fields.items()}
+_PROCESS_DEFAULTS = {name: f.default for name, f in ProcessEntity.model_fields.items()}
+_NETWORK_DEFAULTS = {name: f.default for name, f in NetworkEntity.model_fields.items()}
@@ -1,64 +1,792 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+import os
+import re
 import json
+import time
+import fcntl
+import atexit
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from schema import SecuritySignal
+from requests.adapters import HTTPAdapter
+from schema import SecuritySignal, SignalRecord
+
+# ClickHouse writer: rows per INSERT, max seconds a row waits, rows buffered before ingest blocks
+CH_BATCH_SIZE = 5000
+CH_FLUSH_INTERVAL = 1.0
+CH_MAX_PENDING = 50000
+CH_MAX_RETRIES = 3
+CH_RETRY_BACKOFF = 0.5
+
+# Elastic bulk writer: docs per batch, bytes per _bulk payload, payloads in flight
+ES_BATCH_SIZE = 5000
+ES_FLUSH_INTERVAL = 1.0
+ES_MAX_PENDING = 50000
+ES_MAX_BULK_BYTES = 5 * 1024 * 1024
+ES_MAX_IN_FLIGHT = 4
+ES_MAX_RETRIES = 3
+ES_RETRY_BACKOFF = 0.5
+
+# Write-ahead spool in front of the batched engines: directory (unset disables),
+# bytes per segment file, disk budget per engine, seconds between fsyncs,
+# seconds between delivery attempts while an engine is down
+SPOOL_DIR = os.environ.get("SENTRA_SPOOL_DIR")
+SPOOL_SEGMENT_BYTES = 64 * 1024 * 1024
+SPOOL_MAX_BYTES = 1024 * 1024 * 1024
+SPOOL_FSYNC_INTERVAL = 0.2
+SPOOL_RETRY_INTERVAL = 5.0
+
+# Sink fan-out: records buffered per engine, and what a full buffer does
+SINK_BUFFER_SIZE = 10000
+SINK_POLICIES = ("block", "drop_oldest", "spill")
+DEFAULT_SINK_POLICIES = {"ClickHouse": "block", "Elastic": "spill"}
+SINK_SPILL_DIR = os.environ.get("SENTRA_SPILL_DIR", "/var/tmp/sentra_spill")
+
+# One file per tenant whose mtime is set after every accepted ingest, so query
+# result caches in other processes see new signals; empty disables
+INGEST_MARKER_DIR = os.environ.get("SENTRA_INGEST_MARKER_DIR", "/var/tmp/sentra_ingest")
+
+def latency_percentiles(latencies) -> Dict[str, float]:
+    """p50/p95/p99 in milliseconds of a sequence of durations in seconds."""
+    latencies = sorted(latencies)
+    return {
+        f"latency_{label}_ms": round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2) if latencies else 0.0
+        for label, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+    }
+
+# Called with (engine name, tenant ids) after an engine accepted new signals,
+# e.g. to invalidate cached query results in this process (other processes
+# watch ingest_marker)
+_ingest_listeners = []
+
+def add_ingest_listener(callback):
+    _ingest_listeners.append(callback)
+
+def _ingest_marker_path(tenant_id) -> str:
+    return os.path.join(INGEST_MARKER_DIR, re.sub(r"[^\w.-]", "_", str(tenant_id)))
+
+def ingest_marker(tenant_id) -> int:
+    """Time (ns) of the tenant's last ingest by any process, or 0 if none is known."""
+    if not INGEST_MARKER_DIR:
+        return 0
+    try:
+        return os.stat(_ingest_marker_path(tenant_id)).st_mtime_ns
+    except OSError:
+        return 0
+
+def _touch_ingest_marker(tenant_id):
+    path = _ingest_marker_path(tenant_id)
+    now = time.time_ns()
+    try:
+        os.makedirs(INGEST_MARKER_DIR, exist_ok=True)
+        with open(path, "a"):
+            pass
+        os.utime(path, ns=(now, now))
+    except OSError as e:
+        print(f"[Storage] Could not update ingest marker {path}: {e}")
+
+def notify_ingest(engine: str, tenant_ids):
+    if INGEST_MARKER_DIR:
+        for tenant_id in tenant_ids:
+            _touch_ingest_marker(tenant_id)
+    for callback in _ingest_listeners:
+        try:
+            callback(engine, tenant_ids)
+        except Exception as e:
+            print(f"[Storage] Ingest listener failed: {e}")
 
 class BaseStorage(ABC):
     @abstractmethod
     def ingest(self, signal: SecuritySignal):
+        """Accepts a SecuritySignal or its compact SignalRecord form."""
         pass
 
     @abstractmethod
     def query(self, tenant_id: str, query: str) -> List[Dict[str, Any]]:
         pass
 
-class ClickHouseStorage(BaseStorage):
-    """Handles analytical queries and high-volume signal ingestion."""
-    def __init__(self, host: str = "localhost", port: int = 8123):
-        self.url = f"http://{host}:{port}"
+    def flush(self) -> bool:
+        """
+        Writes out anything buffered by ingest. Returns False if some record
+        ingested since the last flush was given up on. Unbuffered engines
+        have nothing to do.
+        """
+        return True
+
+    def close(self) -> bool:
+        return self.flush()
+
+class WriteAheadSpool:
+    """
+    Append-only log of encoded records, one per line, in numbered segment
+    files. Appends are written sequentially and made durable in groups by
+    sync(); read() returns the next records after the acknowledged cursor,
+    and ack() moves the cursor past them once the engine has them, deleting
+    segments that are fully acknowledged. rewind() makes a failed read
+    available again. The cursor survives restarts, so records appended by
+    an earlier process are replayed first.
+    """
+    def __init__(self, directory: str, segment_bytes: int = SPOOL_SEGMENT_BYTES,
+                 max_bytes: int = SPOOL_MAX_BYTES, fsync_interval: float = SPOOL_FSYNC_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.stats = {"appended": 0, "delivered": 0, "fsyncs": 0, "segments_removed": 0, "dropped": 0}
+
+        # One process per spool directory
+        self.lock_file = open(os.path.join(directory, "lock"), "w")
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.lock_file.close()
+            raise RuntimeError(f"spool {directory} is in use by another process")
+
+        self.cursor_path = os.path.join(directory, "cursor.json")
+        try:
+            with open(self.cursor_path) as f:
+                self.acked = tuple(json.load(f))
+        except (OSError, ValueError):
+            self.acked = (0, 0)
+        segments = sorted(int(name[:-4]) for name in os.listdir(directory) if name.endswith(".log"))
+        for seq in segments:
+            if seq < self.acked[0]:
+                os.remove(self._path(seq))
+        self.segments = {seq: os.path.getsize(self._path(seq)) for seq in segments if seq >= self.acked[0]}
+        if not self.segments:
+            self.segments[self.acked[0]] = 0
+
+        # A crash can leave half a record at the end of the newest segment
+        self.active_seq = max(self.segments)
+        self.active = open(self._path(self.active_seq), "ab")
+        with open(self._path(self.active_seq), "rb") as f:
+            data = f.read()
+        if data and not data.endswith(b"\n"):
+            self.active.truncate(data.rfind(b"\n") + 1)
+            self.segments[self.active_seq] = data.rfind(b"\n") + 1
+
+        self.read_pos = self.acked
+        self.reader = None
+        self.reader_seq = None
+        self.pending = sum(self._count(seq, self.acked[1] if seq == self.acked[0] else 0) for seq in self.segments)
+        self.in_flight = 0  # read but not acked yet
+        self.dirty = False
+        self.last_sync = time.monotonic()
+
+    def _path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:010d}.log")
+
+    def _count(self, seq: int, offset: int = 0) -> int:
+        """Records in a segment from offset on."""
+        count = 0
+        with open(self._path(seq), "rb") as f:
+            f.seek(offset)
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                count += chunk.count(b"\n")
+        return count
+
+    @property
+    def unread(self) -> int:
+        return self.pending - self.in_flight
+
+    @property
+    def size(self) -> int:
+        return sum(self.segments.values())
+
+    def append(self, line: str):
+        data = line.encode("utf-8") + b"\n"
+        with self.lock:
+            if self.segments[self.active_seq] >= self.segment_bytes:
+                self._roll()
+            self.active.write(data)
+            self.segments[self.active_seq] += len(data)
+            self.pending += 1
+            self.dirty = True
+            self.stats["appended"] += 1
+
+    def _roll(self):
+        """Starts a new segment. Called with the lock held."""
+        self.active.flush()
+        os.fsync(self.active.fileno())
+        self.active.close()
+        self.active_seq += 1
+        self.active = open(self._path(self.active_seq), "ab")
+        self.segments[self.active_seq] = 0
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        while self.size > self.max_bytes and len(self.segments) > 1:
+            self._drop_oldest()
+
+    def _drop_oldest(self):
+        """Over the disk budget: gives up the oldest segment. Called with the lock held."""
+        seq = min(self.segments)
+        if self.reader_seq == seq:
+            self.reader.close()
+            self.reader = self.reader_seq = None
+        # The cursor is always in the oldest segment
+        lost = self._count(seq, self.acked[1] if self.acked[0] == seq else 0)
+        if self.read_pos[0] == seq:
+            self.in_flight = 0
+            self.read_pos = (seq + 1, 0)
+        else:
+            self.in_flight -= lost
+        self.pending -= lost
+        self.stats["dropped"] += lost
+        os.remove(self._path(seq))
+        del self.segments[seq]
+        self.acked = (seq + 1, 0)
+        self._save_cursor()
+        print(f"[Spool] {self.directory} is over {self.max_bytes} bytes, dropped {lost} records")
+
+    def sync_due(self) -> bool:
+        return self.dirty and time.monotonic() - self.last_sync >= self.fsync_interval
+
+    def sync(self):
+        """Makes every appended record durable with one fsync."""
+        with self.lock:
+            if not self.dirty:
+                return
+            self.active.flush()
+            fd = os.dup(self.active.fileno())
+            self.dirty = False
+            self.last_sync = time.monotonic()
+            self.stats["fsyncs"] += 1
+        # Outside the lock so appends are not held up by the disk
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def read(self, max_records: int):
+        """Returns (lines, position) of up to max_records records after the last read."""
+        with self.lock:
+            self.active.flush()
+            seq, offset = self.read_pos
+            lines = []
+            while len(lines) < max_records:
+                if self.reader_seq != seq:
+                    if self.reader:
+                        self.reader.close()
+                    self.reader = open(self._path(seq), "rb")
+                    self.reader_seq = seq
+                self.reader.seek(offset)
+                line = self.reader.readline()
+                if not line.endswith(b"\n"):
+                    if seq >= self.active_seq:
+                        break
+                    seq, offset = seq + 1, 0
+                    continue
+                lines.append(line[:-1].decode("utf-8"))
+                offset += len(line)
+            self.read_pos = (seq, offset)
+            self.in_flight += len(lines)
+            return lines, self.read_pos
+
+    def rewind(self):
+        """Makes the records read since the last ack available to read() again."""
+        with self.lock:
+            self.read_pos = self.acked
+            self.in_flight = 0
+
+    def ack(self, position):
+        """Everything up to position reached the engine: moves the cursor and deletes finished segments."""
+        with self.lock:
+            if position <= self.acked:
+                return
+            self.stats["delivered"] += self.in_flight
+            self.pending -= self.in_flight
+            self.in_flight = 0
+            self.acked = position
+            self._save_cursor()
+            for seq in [s for s in self.segments if s < position[0]]:
+                if self.reader_seq == seq:
+                    self.reader.close()
+                    self.reader = self.reader_seq = None
+                os.remove(self._path(seq))
+                del self.segments[seq]
+                self.stats["segments_removed"] += 1
+
+    def _save_cursor(self):
+        tmp = self.cursor_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(list(self.acked), f)
+        os.replace(tmp, self.cursor_path)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self.lock:
+            return dict(self.stats, pending=self.pending, segments=len(self.segments), bytes=self.size)
+
+    def close(self):
+        self.sync()
+        with self.lock:
+            self.active.close()
+            if self.reader:
+                self.reader.close()
+            self.lock_file.close()
+
+def flatten_signal(signal: SecuritySignal) -> Dict[str, Any]:
+    """Flat dictionary mapping to db_setup.sql columns."""
+    return {
+        "id": signal.id,
+        "tenant_id": signal.tenant_id,
+        "schema_version": signal.schema_version,
+        "timestamp": signal.timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+        "signal_type": signal.signal_type,
+        "severity": signal.severity,
+        "risk_score": signal.risk_score,
+        "user_username": signal.user.username if signal.user else "unknown",
+        "host_hostname": signal.host.hostname if signal.host else "unknown",
+        "host_ip": str(signal.host.ip) if signal.host and signal.host.ip else "0.0.0.0",
+        "process_name": signal.process.name if signal.process else "unknown",
+        "network_source_ip": str(signal.network.source_ip) if signal.network and signal.network.source_ip else "0.0.0.0",
+        "ai_confidence": signal.ai_confidence,
+        "model_name": signal.model_info.get("model", "unknown"),
+        "mitre_ttps": signal.mitre_ttps,
+        "compliance_controls": [tag.control_id for tag in signal.compliance_tags]
+    }
+
+class BufferedStorage(BaseStorage):
+    """
+    Base for engines written in batches. ingest only buffers the record; a
+    background thread hands the buffer to _send once it holds batch_size
+    records or its oldest record is flush_interval seconds old. ingest
+    blocks while max_pending records are waiting, so a slow engine
+    throttles the producer instead of growing memory.
+
+    With a spool_dir, records go through a WriteAheadSpool instead of the
+    in-memory buffer: ingest appends to it and the writer sends batches read
+    back from it. Batches the engine could not take stay in the spool and
+    are retried every SPOOL_RETRY_INTERVAL seconds, so an outage or an
+    ingest spike fills the disk rather than memory. flush() then returns
+    once the records are sent or durable in the spool. Without a spool,
+    records the engine could not be reached for are lost, and flush()
+    returns False to say so.
+    """
+    name = "storage"
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int,
+                 max_retries: int, retry_backoff: float, pool_size: int, spool_dir: str = None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.buffer = []
+        self.oldest = None
+        self.in_flight = 0
+        self.cond = threading.Condition()
+        self.closed = False
+        self.worker = None
+        self.spool_dir = spool_dir
+        self.spool = None
+        self.retry_at = 0.0  # while the engine is down, when the spool is tried next
+        self.lost = 0        # records given up on since the last flush
+
+    @abstractmethod
+    def _to_record(self, signal: SecuritySignal):
+        pass
+
+    @abstractmethod
+    def _send(self, records: List[Any]) -> List[Any]:
+        """Sends a batch; returns the records the engine could not be reached for."""
+        pass
+
+    def _encode(self, record) -> str:
+        """One spool line for a record."""
+        return json.dumps(record)
+
+    def _decode(self, line: str):
+        return json.loads(line)
+
+    def _tenant_of(self, record) -> str:
+        return record["tenant_id"]
+
+    def _start_worker(self):
+        # Started on first ingest so query-only users never spawn a thread
+        if self.spool_dir:
+            try:
+                self.spool = WriteAheadSpool(self.spool_dir)
+            except (OSError, RuntimeError) as e:
+                print(f"[{self.name}] Write-ahead spool unavailable, buffering in memory: {e}")
+        if self.spool and self.spool.pending:
+            print(f"[{self.name}] Replaying {self.spool.pending} spooled records")
+            self.oldest = time.monotonic() - self.flush_interval
+        self.worker = threading.Thread(target=self._run, name=f"{self.name}-writer", daemon=True)
+        self.worker.start()
+        atexit.register(self.close)
+
+    def _pending(self) -> int:
+        """Records waiting to be sent. Called with the lock held."""
+        return self.spool.unread if self.spool else len(self.buffer)
+
+    def _engine_down(self) -> bool:
+        return time.monotonic() < self.retry_at
 
     def ingest(self, signal: SecuritySignal):
+        record = self._to_record(signal)
+        with self.cond:
+            if self.worker is None:
+                self._start_worker()
+            if self.spool:
+                line = self._encode(record)
+                if not self.spool.unread:
+                    self.oldest = time.monotonic()
+                self.spool.append(line)
+                if self.spool.unread >= self.batch_size:
+                    self.cond.notify_all()
+                return
+            while len(self.buffer) >= self.max_pending and not self.closed:
+                self.cond.wait()
+            if not self.buffer:
+                self.oldest = time.monotonic()
+            self.buffer.append(record)
+            if len(self.buffer) >= self.batch_size:
+                self.cond.notify_all()
+
+    def _take_batch(self, force: bool = False):
+        """Pops the next batch if one is due. Called with the lock held."""
+        pending = self._pending()
+        if not pending or (self.spool and self._engine_down()):
+            return None
+        due = force or pending >= self.batch_size or time.monotonic() - self.oldest >= self.flush_interval
+        if not due:
+            return None
+        if self.spool:
+            batch = self.spool.read(self.batch_size)
+        else:
+            batch = self.buffer[:self.batch_size]
+            del self.buffer[:self.batch_size]
+        self.oldest = time.monotonic() if self._pending() else None
+        self.in_flight += 1
+        self.cond.notify_all()
+        return batch
+
+    def _wait_timeout(self) -> float:
+        now = time.monotonic()
+        timeout = self.flush_interval
+        if self.oldest is not None:
+            timeout = max(0.0, self.oldest + self.flush_interval - now)
+        if self.spool:
+            if now < self.retry_at:
+                timeout = max(timeout, self.retry_at - now)
+            if self.spool.dirty:
+                timeout = min(timeout, self.spool.fsync_interval)
+        return timeout
+
+    def _run(self):
+        while True:
+            # Group commit: one fsync for everything appended in the last interval
+            if self.spool and self.spool.sync_due():
+                self.spool.sync()
+            with self.cond:
+                batch = self._take_batch(force=self.closed)
+                if batch is None:
+                    if self.closed:
+                        return
+                    self.cond.wait(self._wait_timeout())
+                    continue
+            try:
+                self._deliver(batch)
+            finally:
+                with self.cond:
+                    self.in_flight -= 1
+                    self.cond.notify_all()
+
+    def _deliver(self, batch):
+        if self.spool:
+            lines, position = batch
+            records = [self._decode(line) for line in lines]
+        else:
+            records = batch
+        lost = 0
+        try:
+            undelivered = self._send(records)
+            if len(undelivered) < len(records):
+                notify_ingest(self.name, {self._tenant_of(record) for record in records})
+        except Exception as e:
+            print(f"[{self.name}] Batch of {len(records)} records lost: {e}")
+            undelivered, lost = [], len(records)
+        if not self.spool:
+            # Nothing keeps undelivered records without a spool
+            lost += len(undelivered)
+        if lost:
+            with self.cond:
+                self.lost += lost
+        if not self.spool:
+            return
+        if undelivered:
+            # Keep the whole batch; it is sent again, in order, once the engine answers
+            self.spool.rewind()
+            with self.cond:
+                self.retry_at = time.monotonic() + SPOOL_RETRY_INTERVAL
+                # Due as soon as the retry interval is over
+                self.oldest = time.monotonic() - self.flush_interval
+            print(f"[{self.name}] Engine unavailable, {self.spool.pending} records kept in the spool, "
+                  f"retrying in {SPOOL_RETRY_INTERVAL:g}s")
+        else:
+            self.spool.ack(position)
+            if self.retry_at:
+                with self.cond:
+                    self.retry_at = 0.0
+                print(f"[{self.name}] Engine is back, {self.spool.pending} spooled records left to replay")
+
+    def _backoff(self, attempt: int):
+        time.sleep(self.retry_backoff * (2 ** attempt))
+
+    def flush(self) -> bool:
+        """
+        Blocks until every record buffered so far has been sent (or given
+        up on). With a spool, returns early if the engine is down: the
+        records are then fsynced to the spool instead. Returns False if a
+        record ingested since the last flush was given up on.
+        """
+        with self.cond:
+            if self.worker is None:
+                return True
+            while (self._pending() or self.in_flight) and not (self.spool and self._engine_down()):
+                if self._pending():
+                    # Make the pending records due now
+                    self.oldest = time.monotonic() - self.flush_interval
+                    self.cond.notify_all()
+                self.cond.wait(0.1)
+        if self.spool:
+            self.spool.sync()
+        return self._take_lost()
+
+    def _take_lost(self) -> bool:
+        with self.cond:
+            lost, self.lost = self.lost, 0
+        return lost == 0
+
+    def close(self) -> bool:
+        """
+        Sends what is buffered; with a spool, whatever the engine cannot take
+        yet is kept for the next run. Returns False like flush().
+        """
+        with self.cond:
+            if self.closed or self.worker is None:
+                self.closed = True
+                return self._take_lost()
+            self.closed = True
+            self.cond.notify_all()
+        self.worker.join()
+        if self.spool:
+            self.spool.close()
+        self.session.close()
+        return self._take_lost()
+
+    def spool_metrics(self) -> Dict[str, Any]:
+        return self.spool.metrics() if self.spool else {}
+
+class ClickHouseStorage(BufferedStorage):
+    """
+    Handles analytical queries and high-volume signal ingestion.
+    Flattened rows are sent as one JSONEachRow INSERT per batch over a
+    keep-alive session, retried with exponential backoff on connection
+    errors and 5xx responses.
+    """
+    name = "ClickHouse"
+
+    def __init__(self, host: str = "localhost", port: int = 8123, table: str = "sentra.signals",
+                 batch_size: int = CH_BATCH_SIZE, flush_interval: float = CH_FLUSH_INTERVAL,
+                 max_pending: int = CH_MAX_PENDING, max_retries: int = CH_MAX_RETRIES,
+                 retry_backoff: float = CH_RETRY_BACKOFF, spool_dir: str = None):
+        super().__init__(batch_size, flush_interval, max_pending, max_retries, retry_backoff, pool_size=4,
+                         spool_dir=spool_dir)
+        self.url = f"http://{host}:{port}"
+        self.table = table
+        self.stats = {"rows_sent": 0, "batches_sent": 0, "rows_failed": 0, "retries": 0}
+
+    def _to_record(self, signal: SecuritySignal) -> Dict[str, Any]:
         """Phase 2: Ingest flattened signal into ClickHouse."""
-        # Flat dictionary mapping to db_setup.sql columns
-        flattened = {
-            "id": signal.id,
-            "tenant_id": signal.tenant_id,
-            "schema_version": signal.schema_version,
-            "timestamp": signal.timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
-            "signal_type": signal.signal_type,
-            "severity": signal.severity,
-            "risk_score": signal.risk_score,
-            "user_username": signal.user.username if signal.user else "unknown",
-            "host_hostname": signal.host.hostname if signal.host else "unknown",
-            "host_ip": str(signal.host.ip) if signal.host and signal.host.ip else "0.0.0.0",
-            "process_name": signal.process.name if signal.process else "unknown",
-            "network_source_ip": str(signal.network.source_ip) if signal.network and signal.network.source_ip else "0.0.0.0",
-            "ai_confidence": signal.ai_confidence,
-            "model_name": signal.model_info.get("model", "unknown"),
-            "mitre_ttps": signal.mitre_ttps,
-            "compliance_controls": [tag.control_id for tag in signal.compliance_tags]
-        }
-        
-        print(f"[ClickHouse] Ingesting signal {signal.id} for tenant {signal.tenant_id}")
-        # In a real setup, we'd use the ClickHouse HTTP interface or a dedicated client
-        # Example: requests.post(f"{self.url}/?query=INSERT INTO sentra.signals FORMAT JSONEachRow", json=flattened)
+        if isinstance(signal, SignalRecord):
+            row = signal.to_row()
+        else:
+            row = flatten_signal(signal)
+        # ReplacingMergeTree version: a signal raised again under the same id
+        # (a brute-force burst with its final count) replaces the earlier row
+        row["version"] = time.time_ns() // 1000000
+        return row
+
+    def _send(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        body = "\n".join(json.dumps(row) for row in rows).encode("utf-8")
+        params = {"query": f"INSERT INTO {self.table} FORMAT JSONEachRow"}
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(self.url, params=params, data=body, timeout=30)
+                if response.status_code < 500:
+                    response.raise_for_status()
+                    self.stats["rows_sent"] += len(rows)
+                    self.stats["batches_sent"] += 1
+                    print(f"[ClickHouse] Inserted {len(rows)} rows into {self.table}")
+                    return []
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+            except requests.HTTPError as e:
+                # 4xx: the batch itself is rejected, retrying will not help
+                print(f"[ClickHouse] Insert of {len(rows)} rows rejected: {e} {e.response.text[:200]}")
+                self.stats["rows_failed"] += len(rows)
+                return []
+            except requests.RequestException as e:
+                error = str(e)
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                self._backoff(attempt)
+        print(f"[ClickHouse] Giving up on {len(rows)} rows after {self.max_retries} retries: {error}")
+        if not self.spool:
+            self.stats["rows_failed"] += len(rows)
+        return rows
 
     def query(self, tenant_id: str, query: str) -> List[Dict[str, Any]]:
         print(f"[ClickHouse] Executing analytical query for {tenant_id}: {query}")
         return [{"metric": "count", "value": 120, "tenant_id": tenant_id}]
 
-class ElasticStorage(BaseStorage):
-    """Handles forensic queries (Keyword search / Full content)."""
-    def __init__(self, host: str = "localhost", port: int = 9200):
+class ElasticStorage(BufferedStorage):
+    """
+    Handles forensic queries (Keyword search / Full content).
+    Signals are indexed through _bulk: each batch is grouped by tenant index
+    and cut into NDJSON payloads of at most max_bulk_bytes, which are sent
+    max_in_flight at a time over a pooled session. Only the items a bulk
+    response reports as rejected with 429/5xx are retried; mapping errors
+    and other 4xx items are counted as failed.
+    """
+    name = "Elastic"
+
+    def __init__(self, host: str = "localhost", port: int = 9200,
+                 batch_size: int = ES_BATCH_SIZE, flush_interval: float = ES_FLUSH_INTERVAL,
+                 max_pending: int = ES_MAX_PENDING, max_bulk_bytes: int = ES_MAX_BULK_BYTES,
+                 max_in_flight: int = ES_MAX_IN_FLIGHT, max_retries: int = ES_MAX_RETRIES,
+                 retry_backoff: float = ES_RETRY_BACKOFF, spool_dir: str = None):
+        super().__init__(batch_size, flush_interval, max_pending, max_retries, retry_backoff, pool_size=max_in_flight,
+                         spool_dir=spool_dir)
         self.url = f"http://{host}:{port}"
+        self.max_bulk_bytes = max_bulk_bytes
+        self.max_in_flight = max_in_flight
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="elastic-bulk")
+        self.stats_lock = threading.Lock()
+        self.latencies = deque(maxlen=1000)
+        self.stats = {"docs_indexed": 0, "docs_failed": 0, "bulk_requests": 0, "bytes_sent": 0,
+                      "retries": 0, "send_seconds": 0.0}
 
-    def ingest(self, signal: SecuritySignal):
+    def _to_record(self, signal: SecuritySignal) -> Tuple[str, bytes]:
         """Phase 2: Ingest full signal JSON into Elastic for forensic search."""
         index = f"signals-{signal.tenant_id}"
-        doc = signal.model_dump()
-        print(f"[Elastic] Ingesting full signal {signal.id} into index {index}")
-        # Example: requests.post(f"{self.url}/{index}/_doc/{signal.id}", json=doc)
+        action = json.dumps({"index": {"_id": signal.id}})
+        return index, f"{action}\n{signal.to_json()}\n".encode("utf-8")
+
+    def _encode(self, record: Tuple[str, bytes]) -> str:
+        index, item = record
+        return json.dumps([index, item.decode("utf-8")])
+
+    def _decode(self, line: str) -> Tuple[str, bytes]:
+        index, item = json.loads(line)
+        return index, item.encode("utf-8")
+
+    def _tenant_of(self, record: Tuple[str, bytes]) -> str:
+        return record[0][len("signals-"):]
+
+    def _payloads(self, records: List[Tuple[str, bytes]]):
+        """Yields (index, [item, ...]) with each payload under max_bulk_bytes."""
+        by_index = {}
+        for index, item in records:
+            by_index.setdefault(index, []).append(item)
+        for index, items in by_index.items():
+            payload, size = [], 0
+            for item in items:
+                if payload and size + len(item) > self.max_bulk_bytes:
+                    yield index, payload
+                    payload, size = [], 0
+                payload.append(item)
+                size += len(item)
+            if payload:
+                yield index, payload
+
+    def _bulk(self, index: str, items: List[bytes]) -> List[bytes]:
+        """
+        Sends one _bulk payload, then retries only the items rejected as
+        retryable. Returns the items still not indexed after max_retries.
+        """
+        for attempt in range(self.max_retries + 1):
+            body = b"".join(items)
+            start = time.monotonic()
+            try:
+                response = self.session.post(f"{self.url}/{index}/_bulk", data=body, timeout=60,
+                                             headers={"Content-Type": "application/x-ndjson"})
+                elapsed = time.monotonic() - start
+                with self.stats_lock:
+                    self.stats["bulk_requests"] += 1
+                    self.stats["bytes_sent"] += len(body)
+                    self.stats["send_seconds"] += elapsed
+                    self.latencies.append(elapsed)
+
+                if response.status_code == 429 or response.status_code >= 500:
+                    retry = items
+                elif response.status_code >= 400:
+                    print(f"[Elastic] Bulk request to {index} rejected: HTTP {response.status_code} {response.text[:200]}")
+                    with self.stats_lock:
+                        self.stats["docs_failed"] += len(items)
+                    return []
+                else:
+                    result = response.json()
+                    retry, failed = [], 0
+                    if result.get("errors"):
+                        for item, outcome in zip(items, result.get("items", [])):
+                            status = next(iter(outcome.values())).get("status", 500)
+                            if status == 429 or status >= 500:
+                                retry.append(item)
+                            elif status >= 300:
+                                failed += 1
+                    with self.stats_lock:
+                        self.stats["docs_indexed"] += len(items) - len(retry) - failed
+                        self.stats["docs_failed"] += failed
+                    if not retry:
+                        return []
+            except requests.RequestException as e:
+                print(f"[Elastic] Bulk request to {index} failed: {e}")
+                retry = items
+
+            items = retry
+            if attempt < self.max_retries:
+                with self.stats_lock:
+                    self.stats["retries"] += len(items)
+                self._backoff(attempt)
+        print(f"[Elastic] Giving up on {len(items)} documents for {index} after {self.max_retries} retries")
+        if not self.spool:
+            with self.stats_lock:
+                self.stats["docs_failed"] += len(items)
+        return items
+
+    def _send(self, records: List[Tuple[str, bytes]]) -> List[Tuple[str, bytes]]:
+        payloads = list(self._payloads(records))
+        futures = [self.executor.submit(self._bulk, index, items) for index, items in payloads]
+        undelivered = [(index, item) for (index, _), future in zip(payloads, futures) for item in future.result()]
+        print(f"[Elastic] Sent {len(records) - len(undelivered)} signals in {len(futures)} bulk requests")
+        return undelivered
+
+    def metrics(self) -> Dict[str, Any]:
+        """Throughput (docs per second of request time) and bulk latency percentiles."""
+        with self.stats_lock:
+            stats = dict(self.stats)
+            latencies = sorted(self.latencies)
+        stats["docs_per_sec"] = round(stats["docs_indexed"] / stats["send_seconds"], 1) if stats["send_seconds"] else 0.0
+        stats.update(latency_percentiles(latencies))
+        if self.spool:
+            stats["spool"] = self.spool_metrics()
+        return stats
+
+    def close(self) -> bool:
+        stored = super().close()
+        self.executor.shutdown(wait=True)
+        return stored
 
     def query(self, tenant_id: str, query: str) -> List[Dict[str, Any]]:
         print(f"[Elastic] Executing forensic query for {tenant_id}: {query}")
@@ -83,13 +811,225 @@ class AIControlPlaneStorage(BaseStorage):
         # In a real setup, we'd call AIEngine here
         return [{"decision": "CONSENSUS_BLOCK", "risk_reduction": 0.85, "explanation": "Pattern matches coordinated credential stuffing."}]
 
+class StorageSink:
+    """
+    One branch of the fan-out: a bounded buffer in front of one engine,
+    drained into it by a worker thread of its own, so engines never wait on
+    each other. When the buffer is full the policy decides: "block" the
+    producer, "drop_oldest" buffered record, or "spill" to a JSON lines
+    file that is replayed, in order, as the engine catches up. Once a record
+    is lost on the way to the engine, every later commit is acked as not
+    delivered, so the stream's checkpoint stays before it.
+    """
+    def __init__(self, name: str, storage: BaseStorage, policy: str = "block",
+                 buffer_size: int = SINK_BUFFER_SIZE, spill_dir: str = SINK_SPILL_DIR):
+        if policy not in SINK_POLICIES:
+            raise ValueError(f"Unknown sink policy for {name}: {policy} (expected one of {', '.join(SINK_POLICIES)})")
+        self.name = name
+        self.storage = storage
+        self.policy = policy
+        self.buffer_size = buffer_size
+        self.buffer = deque()
+        self.cond = threading.Condition()
+        self.accepted = 0   # records handed to the sink
+        self.done = 0       # records delivered to the engine or dropped
+        self.commits = deque()  # (accepted count, ack callback)
+        self.latencies = deque(maxlen=1000)
+        self.stats = {"delivered": 0, "dropped": 0, "spilled": 0, "failed": 0}
+        self.started = time.monotonic()
+        self.held = False  # a record was lost: commits are acked as not delivered from now on
+
+        self.spill_path = None
+        self.spill_file = None  # opened on the first overflow
+        self.spill_pending = 0
+        self.spill_read_offset = 0
+        if policy == "spill":
+            self.spill_path = os.path.join(spill_dir, f"{name}.jsonl")
+            # Only records of this run are replayed; the stream's checkpoint
+            # re-reads anything an earlier run did not commit
+            if os.path.exists(self.spill_path):
+                os.remove(self.spill_path)
+
+        self.worker = threading.Thread(target=self._run, name=f"{name}-sink", daemon=True)
+        self.worker.start()
+
+    def put(self, tenant_id: str, signal_data: Dict[str, Any], record: SignalRecord):
+        item = (time.monotonic(), tenant_id, signal_data, record)
+        with self.cond:
+            self.accepted += 1
+            # Once spilling, every record goes to disk until it is replayed, to keep the order
+            spill = self.spill_pending or (self.policy == "spill" and len(self.buffer) >= self.buffer_size)
+            if spill and self.spill_file is None:
+                try:
+                    os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+                    self.spill_file = open(self.spill_path, "w+")
+                except OSError as e:
+                    print(f"[{self.name}] Cannot spill to {self.spill_path}, blocking instead: {e}")
+                    self.policy = "block"
+                    spill = False
+            if spill:
+                self.spill_file.seek(0, os.SEEK_END)
+                self.spill_file.write(json.dumps([item[0], tenant_id, signal_data]) + "\n")
+                self.spill_pending += 1
+                self.stats["spilled"] += 1
+            else:
+                while self.policy == "block" and len(self.buffer) >= self.buffer_size:
+                    self.cond.wait()
+                if self.policy == "drop_oldest" and len(self.buffer) >= self.buffer_size:
+                    self.buffer.popleft()
+                    self.stats["dropped"] += 1
+                    self.done += 1
+                self.buffer.append(item)
+            self.cond.notify_all()
+
+    def add_commit(self, ack):
+        """
+        ack(delivered) runs once every record accepted so far is handed to the
+        engine and the engine flushed; delivered is False if any was lost.
+        """
+        with self.cond:
+            self.commits.append((self.accepted, ack))
+            self.cond.notify_all()
+
+    def _refill_from_spill(self):
+        """Moves spilled records back into the buffer. Called with the lock held."""
+        self.spill_file.flush()
+        self.spill_file.seek(self.spill_read_offset)
+        while self.spill_pending and len(self.buffer) < self.buffer_size:
+            enqueued_at, tenant_id, signal_data = json.loads(self.spill_file.readline())
+            self.buffer.append((enqueued_at, tenant_id, signal_data, None))
+            self.spill_pending -= 1
+        self.spill_read_offset = self.spill_file.tell()
+        if not self.spill_pending:
+            # Fully replayed: the next overflow starts a new file
+            self.spill_file.close()
+            self.spill_file = None
+            self.spill_read_offset = 0
+            os.remove(self.spill_path)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.buffer and not self.spill_pending and not (self.commits and self.commits[0][0] <= self.done):
+                    self.cond.wait()
+                if not self.buffer and self.spill_pending:
+                    self._refill_from_spill()
+                item = self.buffer.popleft() if self.buffer else None
+                self.cond.notify_all()
+            if item is not None:
+                enqueued_at, tenant_id, signal_data, record = item
+                try:
+                    self.storage.ingest(record or SignalRecord.from_signal_data(tenant_id, signal_data))
+                    self.stats["delivered"] += 1
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    print(f"[{self.name}] Sink could not ingest signal: {e}")
+                    self._hold()
+                self.latencies.append(time.monotonic() - enqueued_at)
+                with self.cond:
+                    self.done += 1
+            self._ack_commits()
+
+    def _ack_commits(self):
+        while True:
+            with self.cond:
+                if not self.commits or self.commits[0][0] > self.done:
+                    return
+                _, ack = self.commits.popleft()
+            # The engine's own buffer is part of the commit
+            if not self.storage.flush():
+                self._hold()
+            ack(not self.held)
+
+    def _hold(self):
+        if not self.held:
+            print(f"[{self.name}] Signals did not reach the engine; holding the checkpoint so a restart re-reads them")
+        self.held = True
+
+    def close(self):
+        """Removes the spill file; call once the sink is drained."""
+        with self.cond:
+            if self.spill_file is None:
+                return
+            # Anything still pending is re-read from the stream's checkpoint
+            self.spill_file.close()
+            self.spill_file = None
+            self.spill_pending = 0
+            self.spill_read_offset = 0
+            os.remove(self.spill_path)
+
+    def metrics(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started
+        with self.cond:
+            stats = dict(self.stats, policy=self.policy, buffered=len(self.buffer), spill_pending=self.spill_pending,
+                         held=self.held)
+            latencies = list(self.latencies)
+        stats["records_per_sec"] = round(stats["delivered"] / elapsed, 1) if elapsed > 0 else 0.0
+        stats.update(latency_percentiles(latencies))
+        # Records the engine has not taken yet, held in its write-ahead spool
+        spool = getattr(self.storage, "spool", None)
+        stats["engine_spooled"] = spool.pending if spool else 0
+        return stats
+
+class SinkFanout:
+    """
+    Hands every signal to each StorageSink. commit(callback) runs
+    callback(delivered) once all sinks have handed over and flushed what
+    was given to them before the call; delivered is False if any sink lost
+    a record. Callbacks run in commit order, on a sink's thread.
+    """
+    def __init__(self, sinks: List[StorageSink]):
+        self.sinks = sinks
+        self.lock = threading.Lock()
+        self.pending = deque()  # [sinks still to ack, callback, delivered], oldest first
+
+    def ingest(self, tenant_id: str, signal_data: Dict[str, Any], record: SignalRecord):
+        for sink in self.sinks:
+            sink.put(tenant_id, signal_data, record)
+
+    def commit(self, callback):
+        entry = [len(self.sinks), callback, True]
+        with self.lock:
+            self.pending.append(entry)
+
+        def ack(delivered):
+            # Each sink acks in order, so a commit never completes before an
+            # older one; running callbacks under the lock keeps them in order too
+            with self.lock:
+                entry[0] -= 1
+                entry[2] = entry[2] and delivered
+                while self.pending and self.pending[0][0] == 0:
+                    _, done, all_delivered = self.pending.popleft()
+                    done(all_delivered)
+
+        for sink in self.sinks:
+            sink.add_commit(ack)
+
+    def flush(self):
+        """Blocks until every sink has delivered everything handed to it so far."""
+        drained = threading.Event()
+        self.commit(lambda delivered: drained.set())
+        drained.wait()
+
+    def close(self):
+        self.flush()
+        for sink in self.sinks:
+            sink.close()
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {sink.name: sink.metrics() for sink in self.sinks}
+
 class StorageFactory:
     @staticmethod
     def get_storage(engine_type: str) -> BaseStorage:
         if engine_type == "ClickHouse":
-            return ClickHouseStorage()
+            return ClickHouseStorage(os.environ.get("CLICKHOUSE_HOST", "localhost"),
+                                     int(os.environ.get("CLICKHOUSE_PORT", 8123)),
+                                     spool_dir=os.path.join(SPOOL_DIR, "clickhouse") if SPOOL_DIR else None)
         elif engine_type == "Elastic":
-            return ElasticStorage()
+            return ElasticStorage(os.environ.get("ELASTIC_HOST", "localhost"),
+                                  int(os.environ.get("ELASTIC_PORT", 9200)),
+                                  spool_dir=os.path.join(SPOOL_DIR, "elastic") if SPOOL_DIR else None)
         elif engine_type == "VectorDB":
             return VectorDBStorage()
         elif engine_type == "AI Control Plane":
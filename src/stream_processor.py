@@ -1,69 +1,370 @@
-import json
+import sys
 import time
+import queue
+import signal
+import argparse
+import threading
 from typing import Dict, Any
-from parse_auth_log import parse_line, enrich_signal_with_ai, calculate_risk_score
-from schema import SecuritySignal, UserEntity, HostEntity, ProcessEntity, NetworkEntity, ComplianceTag
-from storage import StorageFactory
+from parse_auth_log import (
+    parse_line, enrich_signals_with_ai, build_window_signal,
+    WindowAggregator, DEFAULT_ALLOWED_LATENESS, DEFAULT_CHECKPOINT
+)
+from ai_engine import AI_BATCH_SIZE, AI_MAX_CONCURRENCY, AI_REQUEST_TIMEOUT
+from log_reader import TailCheckpoint
+from schema import SecuritySignal, SignalRecord, severity_for_risk
+from storage import StorageFactory, StorageSink, SinkFanout, DEFAULT_SINK_POLICIES, SINK_POLICIES
+from stream_sources import IterableSource, StdinSource, SocketSource, FileTailSource
+
+# Consumer runtime: items per queue between stages, seconds between offset
+# commits and between metric reports
+STAGE_QUEUE_SIZE = 1000
+COMMIT_INTERVAL = 5.0
+REPORT_INTERVAL = 10.0
+CHECKPOINT_CONSUMER = "stream"
 
 class StreamProcessor:
     """
     Phase 1/2: Real-time signal processor.
     In production, this would be a Kafka consumer or Flink job.
+    Events are aggregated in event-time windows (see WindowAggregator) and a
+    signal is persisted as soon as its window closes. Each storage engine is
+    fed by its own StorageSink, so a slow engine only backs up its own buffer;
+    sink_policies maps an engine to what its full buffer does.
     """
-    def __init__(self, tenant_id: str):
+    def __init__(self, tenant_id: str, allowed_lateness: int = DEFAULT_ALLOWED_LATENESS,
+                 sink_policies: Dict[str, str] = None):
         self.tenant_id = tenant_id
         self.ch_storage = StorageFactory.get_storage("ClickHouse")
         self.es_storage = StorageFactory.get_storage("Elastic")
+        policies = dict(DEFAULT_SINK_POLICIES, **(sink_policies or {}))
+        self.sinks = SinkFanout([StorageSink("ClickHouse", self.ch_storage, policies["ClickHouse"]),
+                                 StorageSink("Elastic", self.es_storage, policies["Elastic"])])
+        self.aggregator = WindowAggregator(allowed_lateness)
+
+    def to_security_signal(self, signal_data: Dict[str, Any]) -> SecuritySignal:
+        """Maps an aggregated signal dict onto the v1 SecuritySignal schema."""
+        return SignalRecord.from_signal_data(self.tenant_id, signal_data).to_model()
+
+    def store(self, signal_data: Dict[str, Any]) -> SignalRecord:
+        # The storage writers serialize the compact record directly
+        signal = SignalRecord.from_signal_data(self.tenant_id, signal_data)
+
+        # Persist to multi-engine storage
+        self.sinks.ingest(self.tenant_id, signal_data, signal)
+        return signal
+
+    def _persist(self, closed_windows):
+        # Windows closed together are enriched together, in batched prompts
+        signals = [build_window_signal(name, key, value) for name, key, value in closed_windows]
+        signals = [signal_data for signal_data in signals if signal_data]
+        if not signals:
+            return
+        for signal_data in enrich_signals_with_ai(signals, self.tenant_id):
+            signal = self.store(signal_data)
+            print(f"[STREAM] Processed {signal.signal_type} for {self.tenant_id}")
 
     def process_message(self, raw_log_line: str):
-        """Processes a single log line into a signal and persists it."""
+        """Processes a single log line and persists the signals of any windows it closes."""
         event = parse_line(raw_log_line)
         if not event:
             return
+        self._persist(self.aggregator.add(event))
 
-        signal = None
-        if event['type'] == 'ssh_login':
-            signal = SecuritySignal(
-                tenant_id=self.tenant_id,
-                signal_type="ssh_login",
-                severity="Low",
-                user=UserEntity(username=event['user']),
-                host=HostEntity(hostname=event['hostname'], ip=event['ip']),
-                network=NetworkEntity(source_ip=event['ip'])
-            )
-        elif event['type'] == 'privilege_escalation':
-            # Simplified metadata for stream demonstration
-            signal = SecuritySignal(
-                tenant_id=self.tenant_id,
-                signal_type="privilege_escalation",
-                severity="Medium",
-                user=UserEntity(username=event['user']),
-                host=HostEntity(hostname=event['hostname']),
-                process=ProcessEntity(name=event.get('command', 'unknown'))
-            )
-
-        if signal:
-            signal.risk_score = calculate_risk_score(signal.signal_type, signal.severity)
-            enriched_signal = enrich_signal_with_ai(signal)
-            
-            # Persist to multi-engine storage
-            self.ch_storage.ingest(enriched_signal)
-            self.es_storage.ingest(enriched_signal)
-            
-            print(f"[STREAM] Processed {signal.signal_type} for {self.tenant_id}")
+    def flush(self):
+        """Persists every window still open, e.g. on shutdown."""
+        self._persist(self.aggregator.flush())
+        self.sinks.flush()
+
+    def close(self):
+        """Drains and closes the sinks, then the storage engines behind them."""
+        self.sinks.close()
+        self.ch_storage.close()
+        self.es_storage.close()
 
     def run_simulated(self, sample_logs: list):
         """Simulates ingestion from a stream."""
         print(f"Starting stream processor for tenant: {self.tenant_id}")
-        for line in sample_logs:
-            self.process_message(line)
-            time.sleep(0.5) # Simulate stream delay
+        ConsumerRuntime(self, IterableSource(sample_logs)).run()
+
+class _Commit:
+    """Marker sent down the pipeline behind the signals emitted up to `position`."""
+    __slots__ = ("position", "state")
+
+    def __init__(self, position, state):
+        self.position = position
+        self.state = state
+
+_END = object()
+
+class ConsumerRuntime:
+    """
+    Long-running consumer for a StreamProcessor. Lines flow source ->
+    parse/aggregate -> enrich -> store, each stage on its own thread with a
+    bounded queue in between, so a slow stage throttles the ones before it.
+
+    Offsets are committed at least once: every commit_interval the parse
+    stage sends a commit marker (source position and open windows) behind
+    the signals it has emitted. When the marker reaches the store stage it
+    is handed to the sinks, and the checkpoint is saved once every sink has
+    delivered and flushed the signals before it; the store stage itself
+    never waits on an engine.
+    """
+    def __init__(self, processor: StreamProcessor, source, checkpoint: TailCheckpoint = None,
+                 queue_size: int = STAGE_QUEUE_SIZE, commit_interval: float = COMMIT_INTERVAL,
+                 report_interval: float = REPORT_INTERVAL, ai_batch_size: int = AI_BATCH_SIZE,
+                 ai_concurrency: int = AI_MAX_CONCURRENCY, ai_timeout: float = AI_REQUEST_TIMEOUT):
+        self.processor = processor
+        self.source = source
+        # Only a resumable source (a file) can restart from a saved position
+        self.checkpoint = checkpoint if source.resumable else None
+        self.commit_interval = commit_interval
+        self.report_interval = report_interval
+        self.ai_batch_size = ai_batch_size
+        self.ai_concurrency = ai_concurrency
+        self.ai_timeout = ai_timeout
+        self.parse_queue = queue.Queue(queue_size)
+        self.enrich_queue = queue.Queue(queue_size)
+        self.store_queue = queue.Queue(queue_size)
+        self.stats = {"events": 0, "signals": 0, "stored": 0, "commits": 0, "commits_held": 0}
+        self.commit_lock = threading.Lock()
+        self.committed = None
+        self.error = None
+        self.started = None
+        self._rate_mark = (time.monotonic(), 0)
+
+    # ---- Stages ----
+
+    def _read_stage(self):
+        try:
+            for item in self.source:
+                self.parse_queue.put(item)
+        finally:
+            self.parse_queue.put(_END)
+
+    def _emit(self, closed_windows):
+        for name, key, value in closed_windows:
+            signal_data = build_window_signal(name, key, value)
+            if signal_data:
+                self.stats["signals"] += 1
+                self.enrich_queue.put(signal_data)
+
+    def _commit_marker(self, position):
+        return _Commit(position, self.processor.aggregator.snapshot() if self.checkpoint else None)
+
+    def _parse_stage(self):
+        aggregator = self.processor.aggregator
+        position = committed = None
+        next_commit = time.monotonic() + self.commit_interval
+        try:
+            while True:
+                try:
+                    item = self.parse_queue.get(timeout=self.commit_interval)
+                except queue.Empty:
+                    item = None
+                if item is _END:
+                    break
+                if item is not None:
+                    line, position = item
+                    self.stats["events"] += 1
+                    event = parse_line(line)
+                    if event:
+                        self._emit(aggregator.add(event))
+                # Commit on schedule, or as soon as the source goes idle
+                if position != committed and (item is None or time.monotonic() >= next_commit):
+                    self.enrich_queue.put(self._commit_marker(position))
+                    committed = position
+                    next_commit = time.monotonic() + self.commit_interval
+
+            if not self.checkpoint:
+                # Nothing to resume from: close the open windows, like the batch parser
+                self._emit(aggregator.flush())
+            if position is not None:
+                self.enrich_queue.put(self._commit_marker(position))
+        finally:
+            self.enrich_queue.put(_END)
+
+    def _enrich_stage(self):
+        # Signals already queued are enriched together, up to one round of prompts
+        round_size = self.ai_batch_size * self.ai_concurrency
+        marker = None
+        try:
+            while marker is not _END:
+                pending, marker = [], None
+                item = self.enrich_queue.get()
+                while True:
+                    if item is _END or isinstance(item, _Commit):
+                        marker = item
+                        break
+                    pending.append(item)
+                    if len(pending) >= round_size:
+                        break
+                    try:
+                        item = self.enrich_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if pending:
+                    for signal_data in enrich_signals_with_ai(pending, self.processor.tenant_id, self.ai_batch_size,
+                                                              self.ai_concurrency, self.ai_timeout):
+                        self.store_queue.put(signal_data)
+                if isinstance(marker, _Commit):
+                    self.store_queue.put(marker)
+        finally:
+            self.store_queue.put(_END)
+
+    def _store_stage(self):
+        while True:
+            item = self.store_queue.get()
+            if item is _END:
+                # Wait for the sinks, so every commit is acked before run() returns
+                self.processor.sinks.flush()
+                return
+            if isinstance(item, _Commit):
+                self._commit(item)
+                continue
+            self.processor.store(item)
+            self.stats["stored"] += 1
+
+    def _commit(self, marker):
+        def acked(delivered):
+            # Runs on a sink thread once every engine has flushed the signals before the marker
+            if not delivered:
+                # Some never reached an engine: a restart must read them again
+                self.stats["commits_held"] += 1
+                return
+            with self.commit_lock:
+                if self.checkpoint:
+                    log_path, inode, offset = self.source.checkpoint_fields(marker.position)
+                    self.checkpoint.save(log_path, inode, offset, marker.state)
+                self.committed = marker.position
+                self.stats["commits"] += 1
+
+        self.processor.sinks.commit(acked)
+
+    def _guard(self, stage):
+        try:
+            stage()
+        except Exception as e:
+            self.error = f"{stage.__name__.strip('_')}: {e}"
+            print(f"[STREAM] Stage failed, stopping without committing further: {self.error}", file=sys.stderr)
+            self.source.stop()
+
+    # ---- Lifecycle ----
+
+    def run(self):
+        """Consumes until the source ends or stop() / Ctrl-C; returns the final metrics."""
+        saved = self.checkpoint.load() if self.checkpoint else {}
+        if self.checkpoint:
+            self.processor.aggregator = WindowAggregator.restore(saved.get("state"),
+                                                                 self.processor.aggregator.allowed_lateness)
+        self.source.start(saved)
+        self.started = time.monotonic()
+        self._rate_mark = (self.started, 0)
+
+        stages = [threading.Thread(target=self._guard, args=(stage,), name=f"stream{stage.__name__}", daemon=True)
+                  for stage in (self._read_stage, self._parse_stage, self._enrich_stage, self._store_stage)]
+        for thread in stages:
+            thread.start()
+        store = stages[-1]
+        try:
+            while store.is_alive():
+                store.join(self.report_interval)
+                if store.is_alive():
+                    self.report()
+        except KeyboardInterrupt:
+            # Drain what was read, commit it and leave
+            print("[STREAM] Stopping...", file=sys.stderr)
+            self.stop()
+            store.join()
+        self.report()
+        return self.metrics()
+
+    def stop(self):
+        self.source.stop()
+
+    def metrics(self):
+        now = time.monotonic()
+        mark_time, mark_events = self._rate_mark
+        elapsed = now - mark_time
+        return {
+            **self.stats,
+            "events_per_sec": round((self.stats["events"] - mark_events) / elapsed, 1) if elapsed > 0 else 0.0,
+            "lag": self.source.lag(self.committed),
+            "lag_unit": self.source.unit,
+            "queued": {"parse": self.parse_queue.qsize(), "enrich": self.enrich_queue.qsize(),
+                       "store": self.store_queue.qsize()},
+            "open_windows": self.processor.aggregator.open_windows,
+            "sinks": self.processor.sinks.metrics(),
+            "uptime": round(now - self.started, 1) if self.started else 0.0,
+        }
+
+    def report(self):
+        """Prints the metrics; events/sec is measured since the previous report."""
+        m = self.metrics()
+        self._rate_mark = (time.monotonic(), self.stats["events"])
+        print(f"[STREAM] {m['events_per_sec']} events/s | lag {m['lag']} {m['lag_unit']} | "
+              f"queued {m['queued']['parse']}/{m['queued']['enrich']}/{m['queued']['store']} | "
+              f"{m['stored']} signals stored | {m['commits']} commits ({m['commits_held']} held) | "
+              f"{m['open_windows']} open windows")
+        for name, sink in m["sinks"].items():
+            print(f"[STREAM]   {name} ({sink['policy']}): {sink['records_per_sec']} records/s | "
+                  f"p95 {sink['latency_p95_ms']} ms | buffered {sink['buffered']} | "
+                  f"spilled {sink['spilled']} ({sink['spill_pending']} pending) | dropped {sink['dropped']} | "
+                  f"{sink['engine_spooled']} in engine spool")
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def _sink_policy(value):
+    """ENGINE=POLICY for --sink-policy."""
+    name, _, policy = value.partition("=")
+    if name not in DEFAULT_SINK_POLICIES or policy not in SINK_POLICIES:
+        raise argparse.ArgumentTypeError(f"expected ENGINE=POLICY with ENGINE in {', '.join(DEFAULT_SINK_POLICIES)} "
+                                         f"and POLICY in {', '.join(SINK_POLICIES)}")
+    return name, policy
 
 if __name__ == "__main__":
-    # Test sample
-    samples = [
-        "2026-02-11T12:00:00.123456+00:00 host1 sshd[123]: Accepted publickey for stpi from 1.2.3.4",
-        "2026-02-11T12:05:01.654321+00:00 host1 sudo: stpi : USER=root ; COMMAND=/usr/bin/apt update"
-    ]
-    processor = StreamProcessor(tenant_id="braoucloud-prod")
-    processor.run_simulated(samples)
+    parser = argparse.ArgumentParser(description="Sentra stream consumer")
+    parser.add_argument("--tenant-id", default="braoucloud-prod")
+    parser.add_argument("--source", choices=["sample", "file", "stdin", "socket"], default="sample",
+                        help="Where log lines come from (default: a built-in sample)")
+    parser.add_argument("--path", default="/var/log/auth.log", help="Log to follow for --source file")
+    parser.add_argument("--no-follow", action="store_true", help="Stop at the end of the file instead of tailing it")
+    parser.add_argument("--host", default="127.0.0.1", help="Listen address for --source socket")
+    parser.add_argument("--port", type=int, default=5140, help="Listen port for --source socket")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Offsets and open windows for --source file")
+    parser.add_argument("--commit-interval", type=float, default=COMMIT_INTERVAL)
+    parser.add_argument("--report-interval", type=float, default=REPORT_INTERVAL)
+    parser.add_argument("--queue-size", type=int, default=STAGE_QUEUE_SIZE, help="Items buffered between stages")
+    parser.add_argument("--allowed-lateness", type=int, default=DEFAULT_ALLOWED_LATENESS)
+    parser.add_argument("--sink-policy", type=_sink_policy, action="append", default=[], metavar="ENGINE=POLICY",
+                        help="What a full engine buffer does: block, drop_oldest or spill "
+                             "(default: ClickHouse=block, Elastic=spill)")
+    args = parser.parse_args()
+
+    processor = StreamProcessor(tenant_id=args.tenant_id, allowed_lateness=args.allowed_lateness,
+                                sink_policies=dict(args.sink_policy))
+    if args.source == "sample":
+        samples = [
+            "2026-02-11T12:00:00.123456+00:00 host1 sshd[123]: Accepted publickey for stpi from 1.2.3.4",
+            "2026-02-11T12:05:01.654321+00:00 host1 sudo: stpi : USER=root ; COMMAND=/usr/bin/apt update"
+        ]
+        try:
+            processor.run_simulated(samples)
+        finally:
+            processor.close()
+        sys.exit(0)
+
+    if args.source == "file":
+        source = FileTailSource(args.path, follow=not args.no_follow)
+    elif args.source == "stdin":
+        source = StdinSource()
+    else:
+        source = SocketSource(args.host, args.port)
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    runtime = ConsumerRuntime(processor, source, TailCheckpoint(args.checkpoint, CHECKPOINT_CONSUMER),
+                              args.queue_size, args.commit_interval, args.report_interval)
+    try:
+        runtime.run()
+    finally:
+        processor.close()
+    sys.exit(1 if runtime.error else 0)
@@ -0,0 +1,229 @@
+import os
+import sys
+import queue
+import select
+import socket
+import threading
+from log_reader import plan_incremental_reads
+
+# Seconds a source waits for input before it checks whether it was stopped
+POLL_INTERVAL = 0.5
+SOCKET_BACKLOG = 1000
+
+class StreamSource:
+    """
+    Where the consumer runtime reads log lines from. Iterating yields
+    (line, position) pairs; position is what the runtime commits once the
+    line's effects are stored, and lag(position) is how far the source has
+    moved past a committed position, in `unit`.
+    """
+    unit = "lines"
+    resumable = False
+
+    def __init__(self):
+        self.stopped = threading.Event()
+        self.received = 0
+
+    def start(self, saved=None):
+        pass
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def lag(self, position):
+        return self.received - (position or 0)
+
+    def stop(self):
+        self.stopped.set()
+
+class IterableSource(StreamSource):
+    """Lines from a list or any iterable, e.g. for simulations and tests."""
+    def __init__(self, lines):
+        super().__init__()
+        self.lines = lines
+
+    def __iter__(self):
+        for line in self.lines:
+            if self.stopped.is_set():
+                return
+            self.received += 1
+            yield line, self.received
+
+def _split_lines(fd_reader, stopped):
+    """Yields complete lines from a callable returning bytes chunks (b"" at EOF, None when idle)."""
+    pending = b""
+    while not stopped.is_set():
+        chunk = fd_reader()
+        if chunk is None:
+            continue
+        if not chunk:
+            break
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="replace")
+    if pending and not stopped.is_set():
+        yield pending.decode("utf-8", errors="replace")
+
+class StdinSource(StreamSource):
+    """Lines piped on stdin; the stream ends at EOF."""
+    def __iter__(self):
+        fd = sys.stdin.fileno()
+
+        def read():
+            ready, _, _ = select.select([fd], [], [], POLL_INTERVAL)
+            return os.read(fd, 65536) if ready else None
+
+        for line in _split_lines(read, self.stopped):
+            self.received += 1
+            yield line, self.received
+
+class SocketSource(StreamSource):
+    """
+    A local TCP listener standing in for a Kafka topic: producers connect
+    and write newline-delimited log lines. Each connection is read by its
+    own thread into a bounded queue, so a slow consumer pushes back on the
+    producers through TCP instead of growing memory.
+    """
+    def __init__(self, host="127.0.0.1", port=5140, max_buffered=SOCKET_BACKLOG):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.lines = queue.Queue(maxsize=max_buffered)
+        self.server = None
+
+    def start(self, saved=None):
+        self.server = socket.create_server((self.host, self.port))
+        self.server.settimeout(POLL_INTERVAL)
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._accept, name="socket-source", daemon=True).start()
+
+    def _accept(self):
+        while not self.stopped.is_set():
+            try:
+                conn, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self._read_connection, args=(conn,), daemon=True).start()
+
+    def _read_connection(self, conn):
+        conn.settimeout(POLL_INTERVAL)
+
+        def read():
+            try:
+                return conn.recv(65536)
+            except socket.timeout:
+                return None
+
+        with conn:
+            for line in _split_lines(read, self.stopped):
+                while not self.stopped.is_set():
+                    try:
+                        self.lines.put(line, timeout=POLL_INTERVAL)
+                        break
+                    except queue.Full:
+                        continue
+
+    def __iter__(self):
+        while not self.stopped.is_set():
+            try:
+                line = self.lines.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            self.received += 1
+            yield line, self.received
+
+    def stop(self):
+        super().stop()
+        if self.server:
+            self.server.close()
+
+class FileTailSource(StreamSource):
+    """
+    Follows a log file like `tail -F`, from a saved TailCheckpoint position.
+    Positions are (inode, offset) of the file being read, so a restart
+    resumes where the last commit left off; a logrotate rename is finished
+    from the old file and a copytruncate restarts at the beginning, as in
+    plan_incremental_reads. With follow=False the stream ends at EOF.
+    """
+    unit = "bytes"
+    resumable = True
+
+    def __init__(self, path, follow=True):
+        super().__init__()
+        self.path = path
+        self.follow = follow
+        self.segments = []
+        self.resume_offset = 0
+
+    def start(self, saved=None):
+        self.segments, _, self.resume_offset = plan_incremental_reads(self.path, saved or {})
+
+    def checkpoint_fields(self, position):
+        """(log_path, inode, offset) for TailCheckpoint.save."""
+        inode, offset = position
+        return self.path, inode, offset
+
+    def lag(self, position):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return 0
+        if position is None or position[0] != st.st_ino:
+            return st.st_size
+        return max(0, st.st_size - position[1])
+
+    def _read_lines(self, f, inode, end=None):
+        """Complete lines from the current position of f, up to end if given."""
+        while not self.stopped.is_set():
+            pos = f.tell()
+            if end is not None and pos >= end:
+                return
+            line = f.readline()
+            if not line.endswith(b"\n"):
+                # Partial line: wait for the writer to finish it
+                f.seek(pos)
+                return
+            self.received += 1
+            yield line.decode("utf-8", errors="replace").rstrip("\n"), (inode, f.tell())
+
+    def __iter__(self):
+        # Catch up on what was appended (or rotated away) since the checkpoint
+        current_start = self.resume_offset
+        for segment_path, start, end in self.segments:
+            inode = os.stat(segment_path).st_ino
+            if segment_path != self.path:
+                with open(segment_path, "rb") as f:
+                    f.seek(start)
+                    yield from self._read_lines(f, inode, end)
+            else:
+                current_start = start
+
+        f = open(self.path, "rb")
+        try:
+            inode = os.fstat(f.fileno()).st_ino
+            f.seek(current_start)
+            while not self.stopped.is_set():
+                yield from self._read_lines(f, inode)
+                if not self.follow:
+                    return
+                try:
+                    st = os.stat(self.path)
+                except FileNotFoundError:
+                    st = None
+                if st is not None and st.st_ino != inode:
+                    # Rotated: drain the old file, then start the new one
+                    yield from self._read_lines(f, inode)
+                    f.close()
+                    f = open(self.path, "rb")
+                    inode = os.fstat(f.fileno()).st_ino
+                    continue
+                if st is not None and st.st_size < f.tell():
+                    # copytruncate
+                    f.seek(0)
+                    continue
+                self.stopped.wait(POLL_INTERVAL)
+        finally:
+            f.close()